@@ -5,11 +5,12 @@ import shutil
 import tempfile
 
 import redis.exceptions
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.responses import JSONResponse
 
 from .schemas import ExecuteRequest, RawExecuteRequest, RawExecuteResponse
-from jobqueue.job import enqueue, get_job_status, queue_depth
+from jobqueue.job import enqueue, get_job_status, pool_stats, queue_depths
+from execution.executor import ExecutorFactory
 from execution.pipeline import ExecutionPipeline
 from config.limits import (
     FALLBACK_MAX_CONCURRENT,
@@ -47,16 +48,25 @@ _EXECUTE_TIMEOUT = 3600  # 1 hour — allows massive spikes to sit and wait grac
 
 
 @app.post("/execute")
-async def execute(req: ExecuteRequest):
+async def execute(
+    req: ExecuteRequest,
+    idempotency_key: str | None = Header(default=None, max_length=255),
+):
     """
     Enqueues the job into Redis, waits internally for the worker to finish,
     then returns the verdict directly.  Clients make one request and get one
     response — no polling required.
 
+    A request identical to one already queued or running, or carrying the
+    Idempotency-Key of an earlier request, waits for that job's result instead
+    of running again.
+
     Fallback path (Redis down) → runs the job synchronously in-process.
     """
     try:
-        job_id = await enqueue(req.model_dump())
+        job_id = await enqueue(req.model_dump(), idempotency_key)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
     except OverflowError:
         raise HTTPException(
             status_code=503,
@@ -67,8 +77,8 @@ async def execute(req: ExecuteRequest):
         log.warning("Redis unavailable (%s), falling back to direct execution", exc)
         return await _execute_direct(req)
 
-    from jobqueue.job import wait_for_job_result
-    # Internal wait using redis blpop — invisible to the caller
+    from jobqueue.results import wait_for_job_result
+    # Internal wait on the process-wide result dispatcher — invisible to the caller
     try:
         result = await wait_for_job_result(job_id, timeout=_EXECUTE_TIMEOUT)
     except _REDIS_ERRORS as exc:
@@ -110,17 +120,23 @@ async def _execute_direct(req: ExecuteRequest) -> JSONResponse:
 # ---------------------------------------------------------------------------
 
 @app.post("/execute/raw", response_model=RawExecuteResponse)
-async def execute_raw(req: RawExecuteRequest):
+async def execute_raw(
+    req: RawExecuteRequest,
+    idempotency_key: str | None = Header(default=None, max_length=255),
+):
     """
     Enqueues the job into Redis, waits internally for the worker to finish,
     then returns the verdict directly.  Clients make one request and get one
-    response — no polling required.
+    response — no polling required.  Identical in-flight requests are
+    coalesced as for /execute.
     """
     payload = req.model_dump()
     payload["is_raw"] = True
     
     try:
-        job_id = await enqueue(payload)
+        job_id = await enqueue(payload, idempotency_key)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
     except OverflowError:
         raise HTTPException(
             status_code=503,
@@ -131,7 +147,7 @@ async def execute_raw(req: RawExecuteRequest):
         log.warning("Redis unavailable (%s), falling back to direct execution", exc)
         return await _execute_direct(req, is_raw=True)
 
-    from jobqueue.job import wait_for_job_result
+    from jobqueue.results import wait_for_job_result
     try:
         result = await wait_for_job_result(job_id, timeout=_EXECUTE_TIMEOUT)
     except _REDIS_ERRORS as exc:
@@ -173,8 +189,14 @@ async def _execute_direct(req, is_raw: bool = False) -> JSONResponse:
 @app.get("/health")
 async def health():
     try:
-        depth = await queue_depth()
-        return {"ok": True, "redis": "up", "queue_depth": depth}
+        depths = await queue_depths(ExecutorFactory.languages())
+        return {
+            "ok": True,
+            "redis": "up",
+            "queue_depth": sum(depths.values()),
+            "queue_depth_by_language": depths,
+            "container_pool": await pool_stats(),
+        }
     except _REDIS_ERRORS:
         return JSONResponse(
             status_code=200,
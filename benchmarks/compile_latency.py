@@ -0,0 +1,186 @@
+"""
+Per-submission compile latency of the Java and Kotlin executors — the old
+full-template compile, the compiler on Solution.java / Solution.kt alone
+inside the sandbox, and the warm compile server — plus the compile server's
+throughput per core.
+
+Needs Docker Engine, a java-sandbox:latest image built from
+docker/java.Dockerfile and the usual HOST_SANDBOX_ROOT / CONTAINER_SANDBOX_ROOT.
+From the repository root:
+
+    python -m benchmarks.compile_latency [runs]
+
+Every run compiles a slightly different source in one already started
+sandbox container, so only the compile itself is timed.  Throughput keeps
+all COMPILE_SERVER_SESSIONS daemons of a language busy for `runs` compiles
+and divides by the compile container's COMPILE_SERVER_CPU_LIMIT.
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from config.limits import COMPILATION_TIMEOUT_SECONDS, COMPILE_SERVER_CPU_LIMIT, COMPILE_SERVER_SESSIONS
+from execution.compile_server import get_compile_server, start_compile_servers, stop_compile_servers
+from execution.container_pool import remove_sandbox, start_sandbox
+from execution.docker_client import get_docker
+from languages.java import JACKSON_CLASSPATH, JavaExecutor
+from languages.java_wrapper import JAVA_IMPORTS, JAVA_WRAPPER_TEMPLATE
+from languages.kotlin import KotlinExecutor
+from languages.kotlin_wrapper import KOTLIN_IMPORTS, KOTLIN_WRAPPER_TEMPLATE
+
+LANGUAGES = {
+    "java": {
+        "executor": JavaExecutor,
+        "tool": "javac",
+        "file": "Solution.java",
+        "imports": JAVA_IMPORTS,
+        "template": JAVA_WRAPPER_TEMPLATE,
+        "template_file": "Main.java",
+        "template_cmd": ["javac", "-cp", ".:/opt/libs/*", "Main.java"],
+        "source": """
+class Solution {
+    public int[] twoSum(int[] nums, int target) {
+        Map<Integer, Integer> seen = new HashMap<>();
+        for (int i = 0; i < nums.length; i++) {
+            Integer j = seen.get(target - nums[i]);
+            if (j != null) return new int[] { j, i };
+            seen.put(nums[i], i);
+        }
+        return new int[0];
+    }
+}
+""",
+    },
+    "kotlin": {
+        "executor": KotlinExecutor,
+        "tool": "kotlinc",
+        "file": "Solution.kt",
+        "imports": KOTLIN_IMPORTS,
+        "template": KOTLIN_WRAPPER_TEMPLATE,
+        "template_file": "Main.kt",
+        "template_cmd": [
+            "kotlinc", "Main.kt", "-cp", JACKSON_CLASSPATH, "-d", ".",
+            "-J-Xms64m", "-J-Xmx256m", "-J-XX:+UseSerialGC", "-J-XX:TieredStopAtLevel=1",
+        ],
+        "source": """
+class Solution {
+    fun twoSum(nums: IntArray, target: Int): IntArray {
+        val seen = HashMap<Int, Int>()
+        nums.forEachIndexed { i, n ->
+            seen[target - n]?.let { return intArrayOf(it, i) }
+            seen[n] = i
+        }
+        return IntArray(0)
+    }
+}
+""",
+    },
+}
+
+
+async def _exec(container_id: str, cmd: list[str]) -> None:
+    result = await get_docker().exec(container_id, cmd, timeout=COMPILATION_TIMEOUT_SECONDS)
+    if result.exit_code != 0:
+        raise RuntimeError(result.stderr.decode(errors="replace"))
+
+
+async def _template(language: str, container_id: str, workspace: str, source: str) -> None:
+    spec = LANGUAGES[language]
+    with open(os.path.join(workspace, spec["template_file"]), "w") as f:
+        f.write(spec["template"].replace("{source_code}", source))
+    await _exec(container_id, spec["template_cmd"])
+
+
+async def _solution_only(language: str, container_id: str, workspace: str, source: str) -> None:
+    spec = LANGUAGES[language]
+    with open(os.path.join(workspace, spec["file"]), "w") as f:
+        f.write(spec["imports"] + source)
+    await _exec(container_id, [spec["tool"], *spec["executor"].COMPILE_OPTIONS, "-d", ".", spec["file"]])
+
+
+async def _server(language: str, container_id: str, workspace: str, source: str) -> None:
+    spec = LANGUAGES[language]
+    with open(os.path.join(workspace, spec["file"]), "w") as f:
+        f.write(spec["imports"] + source)
+    server = get_compile_server(language)
+    async with server.staged(workspace) as path:
+        ok, output = await server.compile(
+            spec["tool"],
+            [*spec["executor"].COMPILE_OPTIONS, "-d", path],
+            [f"{path}/{spec['file']}"],
+            timeout=COMPILATION_TIMEOUT_SECONDS,
+        )
+    if not ok:
+        raise RuntimeError(output)
+
+
+async def _latency(language: str, sandbox, runs: int) -> None:
+    source = LANGUAGES[language]["source"]
+
+    for profile, compile_fn in (
+        ("template", _template),
+        ("solution", _solution_only),
+        ("server", _server),
+    ):
+        # One untimed compile each, so the server daemons finish warming up.
+        await compile_fn(language, sandbox.container_id, sandbox.temp_dir, source)
+
+        timings = []
+        for i in range(runs):
+            start = time.perf_counter()
+            await compile_fn(language, sandbox.container_id, sandbox.temp_dir, f"{source}// {profile} {i}\n")
+            timings.append((time.perf_counter() - start) * 1000)
+
+        timings.sort()
+        print(
+            f"{language:7} {profile:8} "
+            f"median {statistics.median(timings):7.1f} ms  "
+            f"p90 {timings[int(len(timings) * 0.9) - 1]:7.1f} ms  "
+            f"(n={runs})"
+        )
+
+
+async def _throughput(language: str, sandbox, runs: int) -> None:
+    source = LANGUAGES[language]["source"]
+    sessions = COMPILE_SERVER_SESSIONS[language]
+    remaining = iter(range(runs))
+
+    async def loop(slot: int) -> None:
+        # One workspace per daemon so concurrent compiles do not share files.
+        workspace = os.path.join(sandbox.temp_dir, f"throughput-{slot}")
+        os.makedirs(workspace, exist_ok=True)
+        for i in remaining:
+            await _server(language, sandbox.container_id, workspace, f"{source}// throughput {i}\n")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(loop(slot) for slot in range(sessions)))
+    per_second = runs / (time.perf_counter() - start)
+
+    print(
+        f"{language:7} server   "
+        f"{per_second:7.1f} compiles/s with {sessions} daemons, "
+        f"{per_second / float(COMPILE_SERVER_CPU_LIMIT):7.1f} per core "
+        f"({COMPILE_SERVER_CPU_LIMIT} cores)"
+    )
+
+
+async def main(runs: int) -> None:
+    await start_compile_servers({
+        language: (spec["executor"].IMAGE_NAME, spec["executor"].COMPILE_SERVER_COMMAND)
+        for language, spec in LANGUAGES.items()
+    })
+    sandbox = await start_sandbox(JavaExecutor.IMAGE_NAME)
+    try:
+        for language in LANGUAGES:
+            await _latency(language, sandbox, runs)
+            await _throughput(language, sandbox, runs)
+    finally:
+        await remove_sandbox(sandbox)
+        await stop_compile_servers()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
@@ -0,0 +1,77 @@
+"""
+Per-test startup of the JavaScript and TypeScript executors' one-process-per-
+test path (run(), used when TEST_HARNESS_ENABLED is off): the time from exec
+to the result of a trivial test, next to a bare `node -e ""` in the same
+container as the floor no wrapper can go below.
+
+Needs Docker Engine, a js-sandbox:latest image built from docker/js.Dockerfile
+and the usual HOST_SANDBOX_ROOT / CONTAINER_SANDBOX_ROOT.  From the
+repository root:
+
+    python -m benchmarks.js_startup [runs]
+"""
+
+import asyncio
+import json
+import statistics
+import sys
+import time
+
+from config.limits import EXECUTION_TIMEOUT_SECONDS
+from execution.docker_client import get_docker
+from languages.js import JavaScriptExecutor
+from languages.ts import TypeScriptExecutor
+
+JS_SOURCE = "function add(a, b) { return a + b; }"
+TS_SOURCE = "function add(a: number, b: number): number { return a + b; }"
+
+TEST_INPUT = {"a": 1, "b": 2}
+
+
+def _report(profile: str, timings: list[float]) -> None:
+    timings.sort()
+    print(
+        f"{profile:10} "
+        f"p50 {statistics.median(timings):6.1f} ms  "
+        f"p99 {timings[max(0, int(len(timings) * 0.99) - 1)]:6.1f} ms  "
+        f"(n={len(timings)})"
+    )
+
+
+async def _time(call, runs: int) -> list[float]:
+    await call()  # untimed, so the page cache is warm
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await call()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+async def main(runs: int) -> None:
+    for profile, executor in (
+        ("javascript", JavaScriptExecutor(JS_SOURCE, "add")),
+        ("typescript", TypeScriptExecutor(TS_SOURCE, "add")),
+    ):
+        try:
+            await executor.compile()
+            assert await executor.run(TEST_INPUT) == 3
+
+            if profile == "javascript":
+                payload = json.dumps(TEST_INPUT).encode()
+                _report("node -e", await _time(
+                    lambda: get_docker().exec(
+                        executor.container_id, ["node", "-e", ""],
+                        stdin=payload, timeout=EXECUTION_TIMEOUT_SECONDS,
+                    ),
+                    runs,
+                ))
+
+            _report(profile, await _time(lambda: executor.run(TEST_INPUT), runs))
+        finally:
+            await executor.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50))
@@ -0,0 +1,83 @@
+"""
+Per-test JVM launch time of the Java and Kotlin wrappers, with the old
+command line and with the CDS launch options.
+
+Needs Docker Engine, a java-sandbox:latest image built from
+docker/java.Dockerfile and the usual HOST_SANDBOX_ROOT / CONTAINER_SANDBOX_ROOT.
+From the repository root:
+
+    python -m benchmarks.jvm_startup [runs]
+
+Each submission is compiled once with the real executor, then the compiled
+wrapper is launched `runs` times per profile for a single test case (the
+non-harness path, i.e. what every test paid before the harness and what the
+harness pays once per submission).
+"""
+
+import asyncio
+import json
+import math
+import statistics
+import sys
+import time
+
+from execution.executor import ExecutorFactory
+from execution.docker_client import get_docker
+
+BASELINE = {
+    # The harness classes now come from the image's jar instead of the workspace.
+    "java": ["java", "-cp", ".:/opt/harness/java-harness.jar:/opt/libs/*", "Main"],
+    "kotlin": [
+        "java",
+        "-cp", ".:/opt/kotlinc/lib/kotlin-stdlib.jar:/opt/libs/jackson-core.jar:/opt/libs/jackson-databind.jar:/opt/libs/jackson-annotations.jar",
+        "Main",
+    ],
+}
+
+SOURCES = {
+    "java": "class Solution { public int add(int a, int b) { return a + b; } }",
+    "kotlin": "class Solution { fun add(a: Int, b: Int): Int = a + b }",
+}
+
+PAYLOAD = json.dumps({"function_name": "add", "input": {"a": 1, "b": 2}}).encode()
+
+
+async def _time_launches(container_id: str, cmd: list[str], runs: int) -> list[float]:
+    docker = get_docker()
+    timings = []
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = await docker.exec(container_id, cmd, stdin=PAYLOAD, timeout=30)
+        timings.append((time.perf_counter() - start) * 1000)
+
+        if result.exit_code != 0 or b'"result"' not in result.stdout:
+            raise RuntimeError(f"{cmd[0]} failed: {result.stderr.decode(errors='replace')}")
+
+    return timings
+
+
+async def main(runs: int) -> None:
+    for language, source in SOURCES.items():
+        executor = ExecutorFactory.get_executor(language, source, "add")
+        try:
+            await executor.compile()
+
+            # One untimed launch each so both profiles start from a warm page cache.
+            for cmd in (BASELINE[language], executor.RUN_COMMAND):
+                await _time_launches(executor.container_id, cmd, 1)
+
+            for profile, cmd in (("baseline", BASELINE[language]), ("cds", executor.RUN_COMMAND)):
+                timings = sorted(await _time_launches(executor.container_id, cmd, runs))
+                print(
+                    f"{language:7} {profile:8} "
+                    f"p50 {statistics.median(timings):7.1f} ms  "
+                    f"p99 {timings[max(0, math.ceil(len(timings) * 0.99) - 1)]:7.1f} ms  "
+                    f"(n={runs})"
+                )
+        finally:
+            await executor.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
@@ -0,0 +1,152 @@
+"""
+Per-submission compile latency of the Rust executor — the old cargo build in
+the image's shared target dir against direct rustc with the executor's
+options and a few other optimization levels — plus the run time of a
+CPU-bound solution built each way, to weigh compile latency against runtime.
+
+Needs Docker Engine, a rust-sandbox:latest image built from
+docker/rust.Dockerfile and the usual HOST_SANDBOX_ROOT / CONTAINER_SANDBOX_ROOT.
+From the repository root:
+
+    python -m benchmarks.rust_compile [runs]
+
+Every run compiles a slightly different source in one already started
+sandbox container, so only the compile itself is timed.
+"""
+
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+from config.limits import COMPILATION_TIMEOUT_SECONDS, EXECUTION_TIMEOUT_SECONDS
+from execution.container_pool import remove_sandbox, start_sandbox
+from execution.docker_client import get_docker
+from languages.rust import RustExecutor
+from languages.rust_wrapper import RUST_HARNESS_CRATE
+
+SOURCE = """
+fn count_primes(n: i32) -> i32 {
+    let n = n as usize;
+    let mut composite = vec![false; n + 1];
+    let mut count = 0;
+    for i in 2..=n {
+        if !composite[i] {
+            count += 1;
+            let mut j = i * i;
+            while j <= n {
+                composite[j] = true;
+                j += i;
+            }
+        }
+    }
+    count
+}
+"""
+
+PAYLOAD = json.dumps({"n": 20_000_000}).encode()
+
+# The pre-rustc build: Cargo project, vendored sources, shared target dir.
+CARGO_TOML = """
+[package]
+name = "runner"
+version = "0.1.0"
+edition = "2021"
+
+[dependencies]
+serde_json = "1"
+"""
+
+CARGO_CONFIG = """[source.crates-io]
+replace-with = "vendored-sources"
+
+[source.vendored-sources]
+directory = "/opt/cache/runner/vendor"
+"""
+
+CARGO_CMD = ["cargo", "build", "--release", "--offline", "--target-dir", "/opt/cache/runner/target"]
+
+
+def _rustc(**codegen: str) -> list[str]:
+    options = list(RustExecutor.RUSTC_OPTIONS)
+    for key, value in codegen.items():
+        index = next(i for i, option in enumerate(options) if option.startswith(f"{key}="))
+        options[index] = f"{key}={value}"
+    return ["rustc", *options, "-o", "runner", "main.rs"]
+
+
+RUSTC_PROFILES = {
+    "rustc": _rustc(),
+    "rustc-O3": _rustc(**{"opt-level": "3"}),
+    "rustc-O1": _rustc(**{"opt-level": "1"}),
+    "rustc-cgu16": _rustc(**{"codegen-units": "16"}),
+}
+
+
+async def _exec(container_id: str, cmd: list[str], **kwargs):
+    result = await get_docker().exec(container_id, cmd, **kwargs)
+    if result.exit_code != 0:
+        raise RuntimeError(result.stderr.decode(errors="replace"))
+    return result
+
+
+async def _cargo(container_id: str, workspace: str, wrapped: str) -> None:
+    # The harness crate inlined as a module: the single main.rs cargo built before.
+    os.makedirs(os.path.join(workspace, "src"), exist_ok=True)
+    os.makedirs(os.path.join(workspace, ".cargo"), exist_ok=True)
+    with open(os.path.join(workspace, "src", "main.rs"), "w") as f:
+        f.write(f"{wrapped}\nmod sandbox_harness {{\n{RUST_HARNESS_CRATE}\n}}\n")
+    with open(os.path.join(workspace, "Cargo.toml"), "w") as f:
+        f.write(CARGO_TOML)
+    with open(os.path.join(workspace, ".cargo", "config.toml"), "w") as f:
+        f.write(CARGO_CONFIG)
+
+    await _exec(container_id, CARGO_CMD, timeout=COMPILATION_TIMEOUT_SECONDS)
+    await _exec(container_id, ["cp", "/opt/cache/runner/target/release/runner", "runner"])
+
+
+async def _rustc_build(cmd: list[str], container_id: str, workspace: str, wrapped: str) -> None:
+    with open(os.path.join(workspace, "main.rs"), "w") as f:
+        f.write(wrapped)
+    await _exec(container_id, cmd, timeout=COMPILATION_TIMEOUT_SECONDS)
+
+
+async def main(runs: int) -> None:
+    wrapped = RustExecutor(SOURCE, "count_primes")._generate_wrapper()
+
+    profiles = {"cargo": _cargo}
+    for name, cmd in RUSTC_PROFILES.items():
+        profiles[name] = lambda *args, cmd=cmd: _rustc_build(cmd, *args)
+
+    sandbox = await start_sandbox(RustExecutor.IMAGE_NAME)
+    try:
+        for profile, build in profiles.items():
+            # One untimed build each, so the page cache is warm for all of them.
+            await build(sandbox.container_id, sandbox.temp_dir, wrapped)
+
+            timings = []
+            for i in range(runs):
+                start = time.perf_counter()
+                await build(sandbox.container_id, sandbox.temp_dir, f"{wrapped}// {profile} {i}\n")
+                timings.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            await _exec(sandbox.container_id, ["./runner"], stdin=PAYLOAD, timeout=EXECUTION_TIMEOUT_SECONDS)
+            runtime = (time.perf_counter() - start) * 1000
+
+            timings.sort()
+            print(
+                f"{profile:12} "
+                f"p50 {statistics.median(timings):7.1f} ms  "
+                f"p99 {timings[max(0, int(len(timings) * 0.99) - 1)]:7.1f} ms  "
+                f"run {runtime:7.1f} ms  "
+                f"(n={runs})"
+            )
+    finally:
+        await remove_sandbox(sandbox)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
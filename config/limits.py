@@ -12,8 +12,19 @@ DOCKER_CPU_LIMIT = "2"
 DOCKER_PIDS_LIMIT = "1536"
 DOCKER_NOFILE_LIMIT = "65535"
 
+# RLIMIT_CPU of every process running tests, per test it runs: the backstop
+# should killing a timed-out test fail.  More than DOCKER_CPU_LIMIT cores can
+# burn in EXECUTION_TIMEOUT_SECONDS, so it never cuts a test short.
+TEST_CPU_SECONDS_LIMIT = int(EXECUTION_TIMEOUT_SECONDS * float(DOCKER_CPU_LIMIT)) + 1
+
 TS_CPU_LIMIT = "2"
 
+# TypeScript is transpiled with esbuild, which strips types without checking
+# them.  The full `tsc --noEmit` type check is "off", "parallel" (runs next to
+# the tests, in a second sandbox; a type error still turns the verdict into
+# compilation_error) or "blocking" (must pass before any test runs).
+TS_TYPE_CHECK = "parallel"
+
 # Output limits
 MAX_STDOUT_BYTES = 1_000_000          # 1 MB
 MAX_COMPILE_ERROR_BYTES = 1000
@@ -21,6 +32,10 @@ MAX_COMPILE_ERROR_BYTES = 1000
 # Container behavior
 CONTAINER_SLEEP_SECONDS = 60
 
+# Size of a sandbox's /app with SANDBOX_WORKSPACE=tmpfs (see
+# execution/workspace.py).  Files in it count against DOCKER_MEMORY_LIMIT.
+SANDBOX_TMPFS_SIZE = "256m"
+
 # Worker concurrency — slots per worker process
 # Run multiple worker.py processes to scale out horizontally.
 WORKER_CONCURRENCY = 10
@@ -28,3 +43,99 @@ WORKER_CONCURRENCY = 10
 # Fallback concurrency used when Redis is unavailable.
 # Requests are executed synchronously under this semaphore instead of queued.
 FALLBACK_MAX_CONCURRENT = 20
+
+# Container pool — idle, pre-started sandbox containers kept per image in each
+# worker process so compile() does not pay for a cold `docker run`.
+CONTAINER_POOL_SIZES = {
+    "python-sandbox:latest": 2,
+    "js-sandbox:latest": 2,
+    "java-sandbox:latest": 2,
+    "cpp-sandbox:latest": 2,
+    "go-sandbox:latest": 1,
+    "rust-sandbox:latest": 1,
+    "csharp-sandbox:latest": 1,
+}
+CONTAINER_POOL_MAX_IDLE_SECONDS = 300        # idle containers older than this are replaced
+CONTAINER_POOL_REFILL_INTERVAL_SECONDS = 2
+
+# Sandbox cleanup — workers remove finished containers and workspaces in the
+# background (see execution/cleanup.py) instead of before returning the verdict.
+CLEANUP_CONCURRENCY = 4                   # removals in flight per worker process
+CLEANUP_MAX_ATTEMPTS = 5
+CLEANUP_RETRY_DELAY_SECONDS = 1           # doubled after every failed attempt
+CLEANUP_MAX_BACKLOG = 2 * WORKER_CONCURRENCY  # workers take no new jobs above this
+CLEANUP_DRAIN_TIMEOUT_SECONDS = 30        # on worker shutdown
+
+# Orphan reaper — periodic sweep for containers and workspaces left behind by
+# crashed workers, cancelled jobs and killed API processes (see
+# execution/orphans.py).  A leftover is removed once two sweeps in a row find
+# it orphaned, so the interval must exceed a worker heartbeat's TTL (30s).
+ORPHAN_REAPER_INTERVAL_SECONDS = 60
+# Containers of processes without a heartbeat (the API fallback path) and
+# workspaces no container mounts are only removed once older than this.
+ORPHAN_MIN_AGE_SECONDS = 900
+
+# Docker Engine API client (unix socket)
+DOCKER_API_MAX_CONNECTIONS = 64
+DOCKER_API_TIMEOUT_SECONDS = 30
+
+# Test harness — run all test cases of a submission through one long-lived
+# wrapper process (`--harness` mode) instead of one process per test case.
+TEST_HARNESS_ENABLED = True
+
+# Python harness forks a child per test case from a parent that has the
+# wrapper and user code loaded (`--zygote` mode): per-process isolation
+# between tests at ~1 ms instead of a fresh interpreter per test.
+PYTHON_ZYGOTE_ENABLED = True
+
+# Parallel test cases — number of harness processes per submission that run
+# test cases concurrently against the compiled artifact.  1 (or a language
+# missing here) keeps tests sequential.  Requires TEST_HARNESS_ENABLED.
+TEST_CONCURRENCY = {
+    "python": 2,
+    "javascript": 2,
+    "typescript": 2,
+    "java": 2,
+    "kotlin": 2,
+    "csharp": 2,
+    "cpp": 2,
+    "c": 2,
+    "go": 2,
+    "rust": 2,
+}
+
+# Compiled-artifact cache — binaries/class files/dlls/js of previous builds,
+# keyed by language, image id, generated sources and compiler flags.
+# Stored under $ARTIFACT_CACHE_DIR (default: <CONTAINER_SANDBOX_ROOT>/.artifact-cache).
+ARTIFACT_CACHE_ENABLED = True
+ARTIFACT_CACHE_MAX_BYTES = 2 * 1024 ** 3          # 2 GiB, LRU-trimmed
+ARTIFACT_CACHE_EVICT_INTERVAL_SECONDS = 60
+ARTIFACT_CACHE_IMAGE_ID_TTL_SECONDS = 60          # re-inspect images this often
+
+# Result memoization (opt-in with RESULT_CACHE_ENABLED=1) — per-test outputs
+# of identical (language, source, function, input) executions kept in Redis.
+RESULT_CACHE_TTL_SECONDS = 3600
+RESULT_CACHE_MAX_BYTES = 256 * 1024 ** 2      # 256 MiB across all entries
+RESULT_CACHE_MAX_ENTRY_BYTES = 64 * 1024      # larger outputs are not cached
+RESULT_CACHE_BUDGET_BUCKETS = 12              # time buckets used to account bytes
+
+# Warm-affinity routing — a worker orders its per-language queues at random,
+# weighting each language by 1 + WORKER_WARM_AFFINITY * warmth, where warmth is
+# the number of idle pooled containers for its image plus one if the image ran
+# a job on this worker within WORKER_WARM_WINDOW_SECONDS.
+WORKER_WARM_AFFINITY = 4
+WORKER_WARM_WINDOW_SECONDS = 120
+
+# Compile servers — per worker process, a long-lived compile container per
+# language running this many warm compiler daemons that compile submissions
+# in their workspaces (see execution/compile_server.py).  Languages missing
+# here, or a worker started with COMPILE_SERVER_ENABLED=0, compile inside the
+# submission's own sandbox.
+COMPILE_SERVER_SESSIONS = {
+    "java": 2,
+    "kotlin": 2,
+    "csharp": 2,
+    "go": 2,
+}
+COMPILE_SERVER_MEMORY_LIMIT = "2048m"     # per compile container
+COMPILE_SERVER_CPU_LIMIT = "2"
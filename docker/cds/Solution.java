@@ -0,0 +1,33 @@
+// Training submission for the Java class-data sharing archive (docker/java.Dockerfile).
+// Run through the prebuilt harness jar with java-training.ndjson — results, a
+// tree argument and an error frame — so the JDK, Jackson and harness classes a
+// real submission loads end up in the archive.
+
+import java.util.*;
+
+class Solution {
+
+    public List<Integer> twoSum(int[] nums, int target) {
+        Map<Integer, Integer> seen = new HashMap<>();
+        for (int i = 0; i < nums.length; i++) {
+            Integer j = seen.get(target - nums[i]);
+            if (j != null)
+                return Arrays.asList(j, i);
+            seen.put(nums[i], i);
+        }
+        throw new IllegalArgumentException("no solution");
+    }
+
+    public TreeNode invertTree(TreeNode root) {
+        if (root == null)
+            return null;
+        TreeNode left = invertTree(root.left);
+        root.left = invertTree(root.right);
+        root.right = left;
+        return root;
+    }
+
+    public String reverse(String s) {
+        return new StringBuilder(s).reverse().toString();
+    }
+}
@@ -0,0 +1,26 @@
+// Training submission for the Kotlin class-data sharing archive (docker/java.Dockerfile).
+// Run through the prebuilt harness jar with kotlin-training.ndjson — results, a
+// tree argument and an error frame — so the JDK, kotlin-stdlib, Jackson and
+// harness classes a real submission loads end up in the archive.
+
+class Solution {
+
+    fun twoSum(nums: IntArray, target: Int): List<Int> {
+        val seen = HashMap<Int, Int>()
+        nums.forEachIndexed { i, n ->
+            seen[target - n]?.let { return listOf(it, i) }
+            seen[n] = i
+        }
+        throw IllegalArgumentException("no solution")
+    }
+
+    fun invertTree(root: TreeNode?): TreeNode? {
+        if (root == null) return null
+        val left = invertTree(root.left)
+        root.left = invertTree(root.right)
+        root.right = left
+        return root
+    }
+
+    fun reverse(s: String): String = s.reversed()
+}
@@ -0,0 +1,148 @@
+// C# compiler daemon for execution/compile_server.py: Roslyn in process, in a
+// warm runtime, instead of MSBuild and a csc process per submission.
+//
+// Protocol: one JSON request per stdin line,
+//     {"tool": "csc", "options": [...], "sources": [...]}
+// answered by one JSON line on stdout,
+//     {"ok": true|false, "output": "<compiler errors>"}
+// Options are csc command-line options (response files included).  Requests
+// are handled one at a time; run several daemons for concurrency.
+//
+// Usage: dotnet exec --runtimeconfig <config> CSharpCompileServer.dll <warm-up csc options>
+
+using System;
+using System.Collections.Generic;
+using System.IO;
+using System.Linq;
+using System.Text.Json;
+using Microsoft.CodeAnalysis;
+using Microsoft.CodeAnalysis.CSharp;
+using Microsoft.CodeAnalysis.Text;
+
+public static class CSharpCompileServer {
+
+    // Reference assemblies are read once per daemon, not once per compile.
+    static readonly Dictionary<string, MetadataReference> references = new Dictionary<string, MetadataReference>();
+
+    const string WarmUp = @"
+using System;
+using System.Collections.Generic;
+using System.Linq;
+
+public class Solution {
+    public int[] TwoSum(int[] nums, int target) {
+        var seen = new Dictionary<int, int>();
+        for (int i = 0; i < nums.Length; i++) {
+            if (seen.TryGetValue(target - nums[i], out int j)) return new[] { j, i };
+            seen[nums[i]] = i;
+        }
+        return Array.Empty<int>();
+    }
+}
+
+public static class SandboxEntry {
+    public static void Main(string[] args) => Program.Main(args);
+}
+";
+
+    static MetadataReference Reference(string path) {
+        if (!references.TryGetValue(path, out var reference)) {
+            reference = MetadataReference.CreateFromFile(path);
+            references[path] = reference;
+        }
+        return reference;
+    }
+
+    // Paths under the working directory are reported relative to it, as
+    // given, so the caller can strip the workspace prefix from diagnostics.
+    static string DisplayPath(string path) {
+        string relative = Path.GetRelativePath(Directory.GetCurrentDirectory(), path);
+        return relative.StartsWith("..") ? path : relative;
+    }
+
+    static bool Compile(List<string> options, List<string> sources, StringWriter output) {
+        var args = CSharpCommandLineParser.Default.Parse(
+            options.Concat(sources), Directory.GetCurrentDirectory(), sdkDirectory: null);
+
+        var diagnostics = new List<Diagnostic>(args.Errors);
+        bool ok = !diagnostics.Any(d => d.Severity == DiagnosticSeverity.Error);
+
+        if (ok) {
+            var trees = args.SourceFiles.Select(file => CSharpSyntaxTree.ParseText(
+                SourceText.From(File.ReadAllText(file.Path)), args.ParseOptions, DisplayPath(file.Path)));
+
+            var metadata = args.MetadataReferences.Select(r => Reference(
+                Path.IsPathRooted(r.Reference) ? r.Reference : Path.Combine(args.BaseDirectory, r.Reference)));
+
+            var compilation = CSharpCompilation.Create(
+                args.CompilationName, trees, metadata, args.CompilationOptions);
+
+            using var image = new MemoryStream();
+            var result = compilation.Emit(image, options: args.EmitOptions);
+            diagnostics.AddRange(result.Diagnostics);
+            ok = result.Success;
+
+            if (ok)
+                File.WriteAllBytes(Path.Combine(args.OutputDirectory, args.OutputFileName), image.ToArray());
+        }
+
+        foreach (var diagnostic in diagnostics.Where(d => d.Severity == DiagnosticSeverity.Error))
+            output.WriteLine(diagnostic.ToString());
+
+        return ok;
+    }
+
+    // A few throwaway compiles with the submission options so the first real
+    // request does not pay for loading the references and JIT warm-up.
+    static void Warm(List<string> options) {
+        string dir = Directory.CreateTempSubdirectory("compile-server-warmup").FullName;
+        string source = Path.Combine(dir, "Solution.cs");
+        File.WriteAllText(source, WarmUp);
+
+        var warmOptions = new List<string>(options) { $"-out:{Path.Combine(dir, "Solution.dll")}" };
+        for (int i = 0; i < 5; i++)
+            Compile(warmOptions, new List<string> { source }, new StringWriter());
+    }
+
+    static Dictionary<string, object> Handle(string line) {
+        var reply = new Dictionary<string, object>();
+        var output = new StringWriter();
+
+        try {
+            using var request = JsonDocument.Parse(line);
+            var root = request.RootElement;
+
+            string tool = root.GetProperty("tool").GetString();
+            if (tool != "csc")
+                throw new ArgumentException($"unknown tool: {tool}");
+
+            reply["ok"] = Compile(
+                root.GetProperty("options").EnumerateArray().Select(e => e.GetString()).ToList(),
+                root.GetProperty("sources").EnumerateArray().Select(e => e.GetString()).ToList(),
+                output);
+
+        } catch (Exception e) {
+            output.Write(e.ToString());
+            reply["ok"] = false;
+        }
+
+        reply["output"] = output.ToString();
+        return reply;
+    }
+
+    public static void Main(string[] args) {
+        // Nothing but replies may reach stdout.
+        var replies = new StreamWriter(Console.OpenStandardOutput()) { AutoFlush = true };
+        Console.SetOut(Console.Error);
+
+        if (args.Length > 0)
+            Warm(args.ToList());
+
+        string line;
+        while ((line = Console.In.ReadLine()) != null) {
+            if (line.Trim().Length == 0)
+                continue;
+            replies.WriteLine(JsonSerializer.Serialize(Handle(line)));
+        }
+    }
+}
@@ -0,0 +1,158 @@
+// Compiler daemon for execution/compile_server.py, run in a long-lived compile
+// container so every submission is compiled by an already warm JVM.
+//
+// Protocol: one JSON request per stdin line,
+//     {"tool": "javac"|"kotlinc", "options": [...], "sources": [...]}
+// answered by one JSON line on stdout,
+//     {"ok": true|false, "output": "<compiler diagnostics>"}
+// Requests are handled one at a time; run several daemons for concurrency.
+//
+// Usage: java -cp <jackson>:/opt/compile-server[:<kotlin-compiler.jar>] CompileServer <tool> <warm-up classpath>
+//
+// kotlinc is the embedded K2JVMCompiler, loaded reflectively so the javac
+// daemon does not need the Kotlin compiler on its classpath.
+
+import java.io.*;
+import java.lang.reflect.Method;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.*;
+import java.util.*;
+import javax.tools.*;
+import com.fasterxml.jackson.databind.ObjectMapper;
+import com.fasterxml.jackson.core.type.TypeReference;
+
+public class CompileServer {
+
+    static final ObjectMapper mapper = new ObjectMapper();
+    static final JavaCompiler javac = ToolProvider.getSystemJavaCompiler();
+
+    // Shared across requests so jar indexes on the classpath are read once.
+    static final StandardJavaFileManager fileManager =
+        javac.getStandardFileManager(null, null, StandardCharsets.UTF_8);
+
+    static final String JAVA_WARM_UP =
+        "import java.util.*;\n"
+            + "class Solution {\n"
+            + "    public List<Integer> twoSum(int[] nums, int target) {\n"
+            + "        Map<Integer, Integer> seen = new HashMap<>();\n"
+            + "        for (int i = 0; i < nums.length; i++) {\n"
+            + "            Integer j = seen.get(target - nums[i]);\n"
+            + "            if (j != null) return Arrays.asList(j, i);\n"
+            + "            seen.put(nums[i], i);\n"
+            + "        }\n"
+            + "        return new ArrayList<>();\n"
+            + "    }\n"
+            + "}\n";
+
+    static final String KOTLIN_WARM_UP =
+        "class Solution {\n"
+            + "    fun twoSum(nums: IntArray, target: Int): List<Int> {\n"
+            + "        val seen = HashMap<Int, Int>()\n"
+            + "        nums.forEachIndexed { i, n ->\n"
+            + "            seen[target - n]?.let { return listOf(it, i) }\n"
+            + "            seen[n] = i\n"
+            + "        }\n"
+            + "        return emptyList()\n"
+            + "    }\n"
+            + "}\n";
+
+    static Object kotlinCompiler;
+    static Method kotlinExec;
+
+    static boolean runJavac(List<String> options, List<String> sources, Writer output) {
+        JavaCompiler.CompilationTask task = javac.getTask(
+            output, fileManager, null, options, null,
+            fileManager.getJavaFileObjectsFromStrings(sources));
+        return task.call();
+    }
+
+    static boolean runKotlinc(List<String> options, List<String> sources, Writer output) throws Exception {
+        if (kotlinCompiler == null) {
+            Class<?> compilerClass = Class.forName("org.jetbrains.kotlin.cli.jvm.K2JVMCompiler");
+            kotlinCompiler = compilerClass.getDeclaredConstructor().newInstance();
+            kotlinExec = compilerClass.getMethod("exec", PrintStream.class, String[].class);
+        }
+
+        List<String> args = new ArrayList<>(options);
+        args.addAll(sources);
+
+        ByteArrayOutputStream messages = new ByteArrayOutputStream();
+        Object exitCode = kotlinExec.invoke(
+            kotlinCompiler,
+            new PrintStream(messages, true, "UTF-8"),
+            (Object) args.toArray(new String[0]));
+
+        output.write(messages.toString(StandardCharsets.UTF_8));
+        return "OK".equals(String.valueOf(exitCode));
+    }
+
+    static boolean run(String tool, List<String> options, List<String> sources, Writer output) throws Exception {
+        switch (tool) {
+            case "javac":
+                return runJavac(options, sources, output);
+            case "kotlinc":
+                return runKotlinc(options, sources, output);
+            default:
+                throw new IllegalArgumentException("unknown tool: " + tool);
+        }
+    }
+
+    // A few throwaway compiles against the submission classpath so the first
+    // real request does not pay for class loading and JIT warm-up.
+    static void warmUp(String tool, String classpath) throws Exception {
+        Path dir = Files.createTempDirectory("compile-server-warmup");
+        boolean kotlin = tool.equals("kotlinc");
+
+        Path source = kotlin
+            ? Files.writeString(dir.resolve("Solution.kt"), KOTLIN_WARM_UP)
+            : Files.writeString(dir.resolve("Solution.java"), JAVA_WARM_UP);
+
+        List<String> options = kotlin
+            ? Arrays.asList("-no-stdlib", "-no-reflect", "-cp", classpath, "-d", dir.toString())
+            : Arrays.asList("-proc:none", "-cp", classpath, "-d", dir.toString());
+
+        for (int i = 0; i < 5; i++)
+            run(tool, options, List.of(source.toString()), new StringWriter());
+    }
+
+    static Map<String, Object> handle(String line) {
+        Map<String, Object> reply = new HashMap<>();
+        StringWriter output = new StringWriter();
+
+        try {
+            Map<String, Object> request =
+                mapper.readValue(line, new TypeReference<Map<String, Object>>() {});
+
+            reply.put("ok", run(
+                (String) request.get("tool"),
+                (List<String>) request.get("options"),
+                (List<String>) request.get("sources"),
+                output));
+
+        } catch (Exception e) {
+            output.write(String.valueOf(e));
+            reply.put("ok", false);
+        }
+
+        reply.put("output", output.toString());
+        return reply;
+    }
+
+    public static void main(String[] args) throws Exception {
+        // Nothing but replies may reach stdout.
+        PrintStream replies = new PrintStream(new FileOutputStream(FileDescriptor.out), true, "UTF-8");
+        System.setOut(System.err);
+
+        if (args.length > 1)
+            warmUp(args[0], args[1]);
+
+        BufferedReader reader = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+        String line;
+
+        while ((line = reader.readLine()) != null) {
+            if (line.trim().isEmpty())
+                continue;
+            replies.println(mapper.writeValueAsString(handle(line)));
+        }
+    }
+}
@@ -0,0 +1,83 @@
+// Go build daemon for execution/compile_server.py, run in a long-lived compile
+// container so every submission on a worker shares one warm GOCACHE.  Unlike
+// the sandboxes, no submitted code runs in that container, so the cache can be
+// written to safely.
+//
+// Protocol: one JSON request per stdin line,
+//     {"tool": "go", "options": [...], "sources": [...]}
+// answered by one JSON line on stdout,
+//     {"ok": true|false, "output": "<go build output>"}
+// `go build <options> <sources>` runs in the directory of the first source,
+// with the sources relative to it.  Requests are handled one at a time; run
+// several daemons for concurrency.
+
+package main
+
+import (
+	"bufio"
+	"encoding/json"
+	"os"
+	"os/exec"
+	"path/filepath"
+	"syscall"
+)
+
+type request struct {
+	Tool    string   `json:"tool"`
+	Options []string `json:"options"`
+	Sources []string `json:"sources"`
+}
+
+type reply struct {
+	Ok     bool   `json:"ok"`
+	Output string `json:"output"`
+}
+
+func build(req request) reply {
+	if req.Tool != "go" {
+		return reply{Output: "unknown tool: " + req.Tool}
+	}
+	if len(req.Sources) == 0 {
+		return reply{Output: "no sources"}
+	}
+
+	dir := filepath.Dir(req.Sources[0])
+	args := append([]string{"build"}, req.Options...)
+	for _, source := range req.Sources {
+		rel, err := filepath.Rel(dir, source)
+		if err != nil {
+			return reply{Output: err.Error()}
+		}
+		args = append(args, rel)
+	}
+
+	cmd := exec.Command("go", args...)
+	cmd.Dir = dir
+	// A daemon killed for a timeout takes its build with it.
+	cmd.SysProcAttr = &syscall.SysProcAttr{Pdeathsig: syscall.SIGKILL}
+
+	out, err := cmd.CombinedOutput()
+	if err != nil && len(out) == 0 {
+		out = []byte(err.Error())
+	}
+	return reply{Ok: err == nil, Output: string(out)}
+}
+
+func main() {
+	scanner := bufio.NewScanner(os.Stdin)
+	scanner.Buffer(make([]byte, 64*1024), 1024*1024)
+	encoder := json.NewEncoder(os.Stdout)
+
+	for scanner.Scan() {
+		if len(scanner.Bytes()) == 0 {
+			continue
+		}
+
+		var req request
+		if err := json.Unmarshal(scanner.Bytes(), &req); err != nil {
+			_ = encoder.Encode(reply{Output: err.Error()})
+			continue
+		}
+		_ = encoder.Encode(build(req))
+	}
+}
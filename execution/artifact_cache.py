@@ -0,0 +1,261 @@
+"""
+Content-addressed cache of compiled submission artifacts.
+
+Identical submissions (retries, rejudges, "Run" then "Submit") used to be
+recompiled every time.  Executors of compiled languages now look up a key
+derived from the language, the sandbox image id, the generated sources and
+the compiler command line; on a hit compile() copies the stored artifact
+(binary, class files, dll, js) into the workspace and skips the compiler.
+Compile errors are cached as negative entries and raised without starting
+a container at all.
+
+Entries live on the sandbox volume next to the per-submission workspaces
+(outside any container mount), so every worker process on the host shares
+them.  Each entry is a directory published with an atomic rename; recency is
+tracked by the mtime of its meta file and the cache is trimmed back below
+ARTIFACT_CACHE_MAX_BYTES oldest-first.
+
+Artifacts are stored right after compilation, before any submitted code has
+run, and are copied (never linked) into workspaces, so a running submission
+cannot alter a cache entry.
+"""
+
+import asyncio
+import glob
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from dataclasses import dataclass
+
+from config.limits import (
+    ARTIFACT_CACHE_ENABLED,
+    ARTIFACT_CACHE_MAX_BYTES,
+    ARTIFACT_CACHE_EVICT_INTERVAL_SECONDS,
+    ARTIFACT_CACHE_IMAGE_ID_TTL_SECONDS,
+)
+from execution.docker_client import get_docker
+from execution.exceptions import DockerError
+
+log = logging.getLogger(__name__)
+
+# Bump when the entry layout or key composition changes.
+CACHE_FORMAT_VERSION = 1
+
+_META = "meta.json"
+_FILES = "files"
+
+
+@dataclass
+class CachedBuild:
+    path: str
+    error: str | None = None
+
+
+class ArtifactCache:
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._last_evict = 0.0
+        self._evicting = False
+
+    def lookup(self, key: str) -> CachedBuild | None:
+        path = self._entry_path(key)
+        try:
+            with open(os.path.join(path, _META)) as f:
+                meta = json.load(f)
+            os.utime(os.path.join(path, _META))
+        except (OSError, ValueError):
+            return None
+
+        return CachedBuild(path=path, error=meta.get("error"))
+
+    def restore(self, build: CachedBuild, workspace: str) -> bool:
+        """Copy a cached artifact into `workspace`; False if it vanished meanwhile."""
+        files = os.path.join(build.path, _FILES)
+        try:
+            shutil.copytree(files, workspace, dirs_exist_ok=True)
+        except (OSError, shutil.Error) as e:
+            log.warning(f"Artifact cache restore from {build.path} failed: {e}")
+            return False
+        return True
+
+    def store(self, key: str, workspace: str, patterns: list[str]) -> None:
+        def copy_files(staging: str) -> None:
+            files = os.path.join(staging, _FILES)
+            os.makedirs(files)
+            for pattern in patterns:
+                for src in glob.glob(os.path.join(workspace, pattern)):
+                    dest = os.path.join(files, os.path.relpath(src, workspace))
+                    os.makedirs(os.path.dirname(dest), exist_ok=True)
+                    if os.path.isdir(src):
+                        shutil.copytree(src, dest)
+                    else:
+                        shutil.copy2(src, dest)
+
+        self._publish(key, {}, copy_files)
+
+    def store_error(self, key: str, message: str) -> None:
+        self._publish(key, {"error": message}, None)
+
+    def evict(self) -> None:
+        entries = []
+        total = 0
+
+        for path in glob.glob(os.path.join(self.root, "??", "*")):
+            try:
+                mtime = os.stat(os.path.join(path, _META)).st_mtime
+            except OSError:
+                continue
+            size = _tree_size(path)
+            entries.append((mtime, size, path))
+            total += size
+
+        if total <= self.max_bytes:
+            return
+
+        # Trim to 90% so a busy cache does not evict on every store.
+        target = self.max_bytes * 0.9
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def _publish(self, key: str, meta: dict, fill) -> None:
+        staging = os.path.join(self.root, "tmp", uuid.uuid4().hex)
+        final = self._entry_path(key)
+
+        try:
+            os.makedirs(staging)
+            if fill is not None:
+                fill(staging)
+            with open(os.path.join(staging, _META), "w") as f:
+                json.dump({**meta, "created_at": time.time()}, f)
+
+            os.makedirs(os.path.dirname(final), exist_ok=True)
+            # Another worker may have published the same key first; either copy is fine.
+            os.rename(staging, final)
+        except OSError as e:
+            if not os.path.isdir(final):
+                log.warning(f"Artifact cache store for {key} failed: {e}")
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def _maybe_evict(self) -> None:
+        now = time.monotonic()
+        if self._evicting or now - self._last_evict < ARTIFACT_CACHE_EVICT_INTERVAL_SECONDS:
+            return
+        self._last_evict = now
+        self._evicting = True
+
+        async def run() -> None:
+            try:
+                await asyncio.to_thread(self.evict)
+            except Exception as e:
+                log.warning(f"Artifact cache eviction failed: {e}")
+            finally:
+                self._evicting = False
+
+        try:
+            asyncio.get_running_loop().create_task(run())
+        except RuntimeError:
+            self._evicting = False
+
+
+def _tree_size(path: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+_cache: ArtifactCache | None = None
+_image_ids: dict[str, tuple[str, float]] = {}
+
+
+def get_artifact_cache() -> ArtifactCache | None:
+    global _cache
+    if not ARTIFACT_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        root = os.environ.get("ARTIFACT_CACHE_DIR") or os.path.join(
+            os.environ.get("CONTAINER_SANDBOX_ROOT", "/sandbox"), ".artifact-cache",
+        )
+        _cache = ArtifactCache(root, ARTIFACT_CACHE_MAX_BYTES)
+    return _cache
+
+
+async def image_id(image: str) -> str | None:
+    cached = _image_ids.get(image)
+    if cached and time.monotonic() - cached[1] < ARTIFACT_CACHE_IMAGE_ID_TTL_SECONDS:
+        return cached[0]
+
+    try:
+        info = await get_docker().inspect_image(image)
+    except DockerError as e:
+        log.warning(f"Could not inspect {image}, skipping artifact cache: {e}")
+        return None
+
+    _image_ids[image] = (info["Id"], time.monotonic())
+    return info["Id"]
+
+
+async def artifact_key(
+    language: str,
+    image: str,
+    sources: list[str],
+    flags: list[str],
+) -> str | None:
+    """Cache key for one build, or None when caching is off or the image is unknown."""
+    if get_artifact_cache() is None:
+        return None
+
+    digest = await image_id(image)
+    if digest is None:
+        return None
+
+    material = json.dumps(
+        [CACHE_FORMAT_VERSION, language, digest, sources, flags],
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+# The helpers below copy files on the shared sandbox volume, so they run in a
+# thread rather than block the worker's event loop (and its other job slots).
+
+async def lookup_artifact(key: str | None) -> CachedBuild | None:
+    cache = get_artifact_cache()
+    if key is None or cache is None:
+        return None
+    return await asyncio.to_thread(cache.lookup, key)
+
+
+async def restore_artifact(build: CachedBuild, workspace: str) -> bool:
+    return await asyncio.to_thread(get_artifact_cache().restore, build, workspace)
+
+
+async def store_artifact(key: str | None, workspace: str, patterns: list[str]) -> None:
+    cache = get_artifact_cache()
+    if key is not None and cache is not None:
+        await asyncio.to_thread(cache.store, key, workspace, patterns)
+        cache._maybe_evict()
+
+
+async def store_compile_error(key: str | None, message: str) -> None:
+    cache = get_artifact_cache()
+    if key is not None and cache is not None:
+        await asyncio.to_thread(cache.store_error, key, message)
+        cache._maybe_evict()
@@ -1,9 +1,33 @@
+import asyncio
+import json
+import logging
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator, Callable, Iterable
+
+from config.limits import (
+    EXECUTION_TIMEOUT_SECONDS,
+    MAX_STDOUT_BYTES,
+    TEST_CPU_SECONDS_LIMIT,
+    TEST_HARNESS_ENABLED,
+)
+from execution.docker_client import ExecSession, get_docker
+from execution.exceptions import DockerError, RuntimeExecutionError
+
+log = logging.getLogger(__name__)
 
 
 class BaseExecutor(ABC):
 
+    # Command that starts the compiled wrapper in harness mode: it reads one
+    # JSON payload per stdin line and answers each with one line holding
+    # {"result": ...} or {"error": ...}.  None means only run() is available.
+    HARNESS_COMMAND: list[str] | None = None
+
+    # Compiler daemon run in the language's compile server (see
+    # execution/compile_server.py).  None means compile() always compiles
+    # inside the submission's sandbox.
+    COMPILE_SERVER_COMMAND: list[str] | None = None
+
     def __init__(self, code: str, function_name: str):
         self.code = code
         self.function_name = function_name
@@ -19,3 +43,194 @@ class BaseExecutor(ABC):
     @abstractmethod
     async def cleanup(self) -> None:
         pass
+
+    async def verify(self) -> None:
+        """
+        Wait for checks compile() left running alongside the tests (see
+        TypeScriptExecutor) and raise CompileError if one of them failed.
+        """
+        return None
+
+    def harness_payload(self, test_input: Dict[str, Any]) -> Dict[str, Any]:
+        return {"function_name": self.function_name, "input": test_input}
+
+    async def run_tests(
+        self,
+        test_inputs: Iterable[Dict[str, Any]],
+        concurrency: int = 1,
+        check: Callable[[int, Any], bool] | None = None,
+    ) -> AsyncIterator[Any]:
+        """
+        Yield the output of each test input in order, raising
+        RuntimeExecutionError at the first test that fails to run.
+
+        With a HARNESS_COMMAND every test goes through one process.  An input
+        is only sent once the previous output has been consumed, so a caller
+        that stops iterating (e.g. on a wrong answer) runs no further tests.
+
+        With concurrency > 1 up to that many harness processes pull tests in
+        parallel.  `check(index, output)` tells which outputs count as
+        failures; as soon as test i fails, tests after i are cancelled and
+        their processes killed while tests before i run to completion, so the
+        first failure seen by the caller is the same as in a sequential run.
+        """
+        if not self.HARNESS_COMMAND or not TEST_HARNESS_ENABLED:
+            for test_input in test_inputs:
+                yield await self.run(test_input)
+            return
+
+        if not self.container_id:
+            raise RuntimeExecutionError("Container not initialized")
+
+        test_inputs = list(test_inputs)
+        concurrency = min(concurrency, len(test_inputs))
+
+        if concurrency > 1:
+            async for output in self._run_tests_parallel(test_inputs, concurrency, check):
+                yield output
+            return
+
+        session = await self._start_harness(len(test_inputs))
+        running = False
+        try:
+            for test_input in test_inputs:
+                running = True
+                output = await self._harness_call(session, test_input)
+                running = False
+                yield output
+        finally:
+            session.close()
+            # Left mid-test (it failed or was cancelled): the process may
+            # still be running it.
+            if running:
+                await self._stop_harness(session)
+
+    async def _run_tests_parallel(
+        self,
+        test_inputs: list[Dict[str, Any]],
+        concurrency: int,
+        check: Callable[[int, Any], bool] | None,
+    ) -> AsyncIterator[Any]:
+        loop = asyncio.get_running_loop()
+        results = [loop.create_future() for _ in test_inputs]
+        next_index = 0
+        stop_at = len(test_inputs)
+        current: dict[int, int] = {}
+        workers: dict[int, asyncio.Task] = {}
+
+        def fail(index: int) -> None:
+            nonlocal stop_at
+            stop_at = min(stop_at, index)
+            for slot, running in list(current.items()):
+                if running > index:
+                    workers[slot].cancel()
+
+        async def worker(slot: int, session: ExecSession) -> None:
+            nonlocal next_index
+            try:
+                while next_index < stop_at:
+                    index = next_index
+                    next_index += 1
+                    current[slot] = index
+
+                    try:
+                        output = await self._harness_call(session, test_inputs[index])
+                    except RuntimeExecutionError as e:
+                        results[index].set_exception(e)
+                        fail(index)
+                        return
+                    except Exception as e:
+                        results[index].set_exception(RuntimeExecutionError(str(e) or "Runtime error"))
+                        fail(index)
+                        return
+
+                    del current[slot]
+                    results[index].set_result(output)
+
+                    if check is not None and not check(index, output):
+                        fail(index)
+                        return
+            finally:
+                session.close()
+                # Still holding a test: it failed or was cancelled, and the
+                # process may be burning CPU the remaining tests need.
+                if slot in current:
+                    await self._stop_harness(session)
+
+        sessions = await asyncio.gather(
+            *(self._start_harness(len(test_inputs)) for _ in range(concurrency)),
+            return_exceptions=True,
+        )
+        errors = [s for s in sessions if isinstance(s, BaseException)]
+        if errors:
+            for s in sessions:
+                if isinstance(s, ExecSession):
+                    s.close()
+            raise errors[0]
+
+        for slot, session in enumerate(sessions):
+            workers[slot] = asyncio.create_task(worker(slot, session))
+
+        try:
+            for index, result in enumerate(results):
+                if index > stop_at and not result.done():
+                    return
+                yield await result
+        finally:
+            for task in workers.values():
+                task.cancel()
+            await asyncio.gather(*workers.values(), return_exceptions=True)
+            for result in results:
+                if result.done() and not result.cancelled():
+                    result.exception()  # mark retrieved
+
+    async def _start_harness(self, tests: int) -> ExecSession:
+        # Tracked, so a test that times out can be killed from a second exec;
+        # the Engine API has no way to signal an exec'd process.
+        return await get_docker().open_exec(
+            self.container_id,
+            self.HARNESS_COMMAND,
+            stderr_limit=MAX_STDOUT_BYTES,
+            cpu_seconds=TEST_CPU_SECONDS_LIMIT * tests,
+        )
+
+    async def _stop_harness(self, session: ExecSession) -> None:
+        try:
+            await session.kill()
+        except DockerError as e:
+            log.warning(f"Could not stop the harness in {self.container_id}: {e}")
+
+    async def _harness_call(self, session: ExecSession, test_input: Dict[str, Any]) -> Any:
+        payload = json.dumps(self.harness_payload(test_input), separators=(",", ":"))
+        await session.send(payload.encode() + b"\n")
+
+        try:
+            line = await asyncio.wait_for(
+                session.readline(MAX_STDOUT_BYTES),
+                timeout=EXECUTION_TIMEOUT_SECONDS,
+            )
+        except asyncio.TimeoutError:
+            # Left running, the test would keep the sandbox's CPUs busy until
+            # cleanup(); only report the timeout once it is gone (with the
+            # container, if need be).  DockerError if that cannot be confirmed.
+            await session.kill()
+            raise RuntimeExecutionError("Execution timed out")
+
+        if line is None:
+            message = session.stderr.decode(errors="replace").strip()
+            raise RuntimeExecutionError(message or "Runtime error")
+
+        if len(line) > MAX_STDOUT_BYTES:
+            # The rest of the output may still be coming.
+            await session.kill()
+            raise RuntimeExecutionError("Output limit exceeded")
+
+        try:
+            frame = json.loads(line)
+            if "error" in frame:
+                raise RuntimeExecutionError(frame["error"] or "Runtime error")
+            return frame["result"]
+        except RuntimeExecutionError:
+            raise
+        except Exception:
+            raise RuntimeExecutionError("Invalid output format")
@@ -0,0 +1,181 @@
+"""
+Background removal of finished sandboxes.
+
+Removing a submission's container (`docker rm -f`) and its workspace takes
+longer than most short submissions run, and nothing in the verdict depends on
+it.  With the reaper started, executor cleanup() hands its container and
+workspace to release_sandbox(), which queues them and returns at once; up to
+CLEANUP_CONCURRENCY removals then run in the background, and one that fails is
+retried with a doubling delay up to CLEANUP_MAX_ATTEMPTS times.
+
+backlog() counts sandboxes not yet removed (queued, being removed or waiting
+for a retry); worker.py stops taking jobs while it exceeds CLEANUP_MAX_BACKLOG.
+
+The reaper is per process.  worker.py starts it; any process that never calls
+start_cleanup_reaper() (e.g. the API fallback path) removes sandboxes inline
+in release_sandbox(), as before.
+"""
+
+import asyncio
+import logging
+import shutil
+from dataclasses import dataclass
+
+from config.limits import (
+    CLEANUP_CONCURRENCY,
+    CLEANUP_MAX_ATTEMPTS,
+    CLEANUP_RETRY_DELAY_SECONDS,
+    CLEANUP_DRAIN_TIMEOUT_SECONDS,
+)
+from execution.docker_client import get_docker
+from execution.exceptions import DockerError
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class _Removal:
+    container_id: str | None
+    temp_dir: str | None
+    attempts: int = 0
+
+
+class CleanupReaper:
+
+    def __init__(self, concurrency: int = CLEANUP_CONCURRENCY):
+        self.concurrency = max(1, concurrency)
+
+        self._queue: asyncio.Queue[_Removal] = asyncio.Queue()
+        self._active = 0
+        self._waiting_retry = 0
+        self._removed = 0
+        self._retries = 0
+        self._failures = 0
+
+        self._changed = asyncio.Condition()
+        self._retry_timers: set[asyncio.Task] = set()
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        """Finish the backlog (for up to CLEANUP_DRAIN_TIMEOUT_SECONDS), then stop."""
+        try:
+            await asyncio.wait_for(self.wait_for_backlog(0), timeout=CLEANUP_DRAIN_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            log.error(f"Cleanup reaper stopped with {self.backlog()} sandboxes not removed")
+
+        for task in [*self._tasks, *self._retry_timers]:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._retry_timers, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, container_id: str | None, temp_dir: str | None) -> None:
+        if container_id or temp_dir:
+            self._queue.put_nowait(_Removal(container_id, temp_dir))
+
+    def backlog(self) -> int:
+        return self._queue.qsize() + self._active + self._waiting_retry
+
+    async def wait_for_backlog(self, limit: int) -> None:
+        """Return once no more than `limit` sandboxes are waiting to be removed."""
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.backlog() <= limit)
+
+    def stats(self) -> dict:
+        return {
+            "backlog": self.backlog(),
+            "removed": self._removed,
+            "retries": self._retries,
+            "failures": self._failures,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            removal = await self._queue.get()
+            self._active += 1
+            try:
+                await self._remove(removal)
+                self._removed += 1
+            except Exception as e:
+                removal.attempts += 1
+                if removal.attempts < CLEANUP_MAX_ATTEMPTS:
+                    self._retries += 1
+                    self._retry_later(removal)
+                else:
+                    self._failures += 1
+                    log.error(
+                        f"Giving up removing container {removal.container_id}"
+                        f" / {removal.temp_dir} after {removal.attempts} attempts: {e!r}"
+                    )
+            finally:
+                self._active -= 1
+                async with self._changed:
+                    self._changed.notify_all()
+
+    def _retry_later(self, removal: _Removal) -> None:
+        async def requeue() -> None:
+            try:
+                await asyncio.sleep(CLEANUP_RETRY_DELAY_SECONDS * 2 ** (removal.attempts - 1))
+            finally:
+                self._waiting_retry -= 1
+            self._queue.put_nowait(removal)
+
+        self._waiting_retry += 1
+        task = asyncio.create_task(requeue())
+        self._retry_timers.add(task)
+        task.add_done_callback(self._retry_timers.discard)
+
+    async def _remove(self, removal: _Removal) -> None:
+        # Each part is forgotten once done, so a retry only redoes what failed.
+        if removal.container_id:
+            await get_docker().remove_container(removal.container_id)
+            removal.container_id = None
+
+        if removal.temp_dir:
+            # Workspaces can hold whole build trees; keep the event loop free.
+            try:
+                await asyncio.to_thread(shutil.rmtree, removal.temp_dir)
+            except FileNotFoundError:
+                pass
+            removal.temp_dir = None
+
+
+_reaper: CleanupReaper | None = None
+
+
+def get_cleanup_reaper() -> CleanupReaper | None:
+    return _reaper
+
+
+async def start_cleanup_reaper(concurrency: int = CLEANUP_CONCURRENCY) -> CleanupReaper:
+    global _reaper
+    if _reaper is None:
+        _reaper = CleanupReaper(concurrency)
+        await _reaper.start()
+    return _reaper
+
+
+async def stop_cleanup_reaper() -> None:
+    global _reaper
+    if _reaper is not None:
+        reaper, _reaper = _reaper, None
+        await reaper.stop()
+
+
+async def release_sandbox(container_id: str | None, temp_dir: str | None) -> None:
+    """Remove a finished sandbox's container and workspace, in the background when possible."""
+    if _reaper is not None:
+        _reaper.submit(container_id, temp_dir)
+        return
+
+    if container_id:
+        try:
+            await get_docker().remove_container(container_id)
+        except DockerError:
+            pass
+
+    if temp_dir:
+        shutil.rmtree(temp_dir, ignore_errors=True)
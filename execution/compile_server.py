@@ -0,0 +1,283 @@
+"""
+Warm compiler daemons in long-lived compile containers.
+
+Starting a compiler (a fresh JVM for javac, worse for kotlinc) costs more
+than compiling a typical submission.  A worker process started with compile servers keeps,
+per language with a COMPILE_SERVER_COMMAND and an entry in
+COMPILE_SERVER_SESSIONS, one container of the language's sandbox image and
+runs up to that many compiler daemons in it.  The container mounts only its
+own staging directory under the sandbox root (.compile-<language>-<worker>)
+at /staging, never the submissions' workspaces or the artifact cache:
+staged() copies a workspace's sources into a fresh directory there and the
+compiler's output back.  compile() hands an idle daemon one request line
+naming the sources and output directory relative to /staging and reads back
+one reply line:
+
+    {"tool": "javac"|"kotlinc", "options": [...], "sources": [...]}
+    {"ok": true|false, "output": "<diagnostics>"}
+
+The submission's own container never starts the compiler: its memory limit
+and lifetime are sized for one submission, while a daemon is only worth
+keeping if it outlives many.  Compilers do not run submitted code, and the
+compile container gets the standard sandbox hardening apart from a larger
+memory limit.
+
+A daemon that exceeds the compile timeout is killed and replaced.  When the
+container or a daemon fails, compile() raises CompileServerError and the
+executor compiles inside its sandbox as before; the next request starts a
+new container.  Like the container pool, servers exist only in processes
+that call start_compile_servers() (worker.py).
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import tempfile
+from contextlib import asynccontextmanager
+
+from config.limits import (
+    COMPILE_SERVER_SESSIONS,
+    COMPILE_SERVER_MEMORY_LIMIT,
+    COMPILE_SERVER_CPU_LIMIT,
+    MAX_STDOUT_BYTES,
+)
+from execution.container_pool import sandbox_host_config
+from execution.docker_client import ExecSession, get_docker
+from execution.exceptions import CompileServerError, DockerError
+from execution.ownership import ROLE_COMPILE_SERVER, WORKER_ID, owner_labels
+from execution.sandbox_paths import get_sandbox_roots
+
+log = logging.getLogger(__name__)
+
+STAGING_MOUNT = "/staging"
+STAGING_PREFIX = ".compile-"   # staging directories under the sandbox root
+
+_START_TIMEOUT = 30.0
+
+
+class CompileServer:
+
+    def __init__(self, language: str, image: str, command: list[str], sessions: int):
+        self.language = language
+        self.image = image
+        self.command = command
+        self.sessions = sessions
+        self.container_id: str | None = None
+
+        container_root, host_root = get_sandbox_roots()
+        staging = f"{STAGING_PREFIX}{language}-{WORKER_ID}"
+        self._staging_root = os.path.join(container_root, staging)
+        self._host_staging_root = f"{host_root}/{staging}"
+        self._container_lock = asyncio.Lock()
+        self._slots = asyncio.Semaphore(sessions)
+        self._idle: list[tuple[int, ExecSession]] = []
+        self._free = list(range(sessions))
+
+    @asynccontextmanager
+    async def staged(self, workspace: str):
+        """
+        Copy `workspace` into a new directory the daemons can see and yield
+        its path relative to their working directory.  Compilers report
+        relative paths as given, so diagnostics can be rewritten to name
+        bare file names.  Unless the block raises, whatever the compiler
+        left there is copied back into `workspace`; the copy is removed
+        either way.  The copying runs in a thread, off the event loop.
+        """
+        staging = await asyncio.to_thread(self._new_staging)
+        try:
+            await asyncio.to_thread(shutil.copytree, workspace, staging, dirs_exist_ok=True)
+            yield os.path.basename(staging)
+            await asyncio.to_thread(shutil.copytree, staging, workspace, dirs_exist_ok=True)
+        finally:
+            await asyncio.to_thread(shutil.rmtree, staging, ignore_errors=True)
+
+    def _new_staging(self) -> str:
+        os.makedirs(self._staging_root, exist_ok=True)
+        return tempfile.mkdtemp(dir=self._staging_root)
+
+    async def compile(
+        self,
+        tool: str,
+        options: list[str],
+        sources: list[str],
+        timeout: float,
+    ) -> tuple[bool, str]:
+        """
+        Run `tool` on `sources` with `options` (paths under one yielded by staged());
+        returns (succeeded, diagnostics).  Raises asyncio.TimeoutError when the
+        daemon does not answer within `timeout`, CompileServerError when no
+        daemon could take or answer the request.
+        """
+        request = json.dumps({"tool": tool, "options": options, "sources": sources})
+
+        async with self._slots:
+            slot, session = await self._acquire()
+            try:
+                await session.send(request.encode() + b"\n")
+                line = await asyncio.wait_for(session.readline(MAX_STDOUT_BYTES), timeout=timeout)
+            except asyncio.TimeoutError:
+                await self._discard(slot, session, kill=True)
+                raise
+            except OSError as e:
+                await self._discard(slot, session, kill=True)
+                raise CompileServerError(f"{self.language} compile server connection lost: {e!r}")
+            except BaseException:
+                await self._discard(slot, session, kill=True)
+                raise
+
+            if line is None:
+                message = session.stderr.decode(errors="replace").strip()
+                await self._discard(slot, session, kill=False)
+                raise CompileServerError(message or f"{self.language} compile server exited")
+
+            try:
+                reply = json.loads(line)
+                outcome = bool(reply["ok"]), str(reply.get("output", ""))
+            except Exception:
+                await self._discard(slot, session, kill=True)
+                raise CompileServerError(f"{self.language} compile server sent an invalid reply")
+
+            self._idle.append((slot, session))
+            return outcome
+
+    async def warm_up(self) -> None:
+        """Start every daemon so the first submissions find them warm."""
+        started = await asyncio.gather(
+            *(self._acquire() for _ in range(len(self._free))),
+            return_exceptions=True,
+        )
+        for result in started:
+            if isinstance(result, BaseException):
+                log.warning(f"Starting {self.language} compile server failed: {result}")
+            else:
+                self._idle.append(result)
+
+    async def stop(self) -> None:
+        for _, session in self._idle:
+            session.close()
+        self._idle.clear()
+        self._free = list(range(self.sessions))
+
+        if self.container_id:
+            try:
+                await get_docker().remove_container(self.container_id)
+            except DockerError as e:
+                log.warning(f"Failed to remove compile container {self.container_id}: {e}")
+            self.container_id = None
+
+        await asyncio.to_thread(shutil.rmtree, self._staging_root, ignore_errors=True)
+
+    async def _acquire(self) -> tuple[int, ExecSession]:
+        if self._idle:
+            return self._idle.pop()
+
+        slot = self._free.pop()
+        try:
+            container_id = await self._container()
+            # Record the daemon's pid so it can be killed from a second exec.
+            session = await get_docker().open_exec(
+                container_id,
+                ["sh", "-c", 'echo $$ > "$0" && exec "$@"', self._pid_file(slot), *self.command],
+                stderr_limit=MAX_STDOUT_BYTES,
+            )
+        except DockerError as e:
+            self._free.append(slot)
+            await self._reset()
+            raise CompileServerError(f"{self.language} compile server unavailable: {e}")
+        except BaseException:
+            self._free.append(slot)
+            raise
+
+        return slot, session
+
+    async def _discard(self, slot: int, session: ExecSession, kill: bool) -> None:
+        session.close()
+        if kill and self.container_id:
+            try:
+                await get_docker().exec(
+                    self.container_id,
+                    ["sh", "-c", 'kill -9 "$(cat "$0")"', self._pid_file(slot)],
+                    timeout=5,
+                )
+            except (asyncio.TimeoutError, DockerError):
+                pass
+        self._free.append(slot)
+
+    async def _container(self) -> str:
+        async with self._container_lock:
+            if self.container_id is None:
+                os.makedirs(self._staging_root, exist_ok=True)
+                host_config = sandbox_host_config(
+                    self._host_staging_root,
+                    cpus=COMPILE_SERVER_CPU_LIMIT,
+                    memory=COMPILE_SERVER_MEMORY_LIMIT,
+                    memory_swap=COMPILE_SERVER_MEMORY_LIMIT,
+                    mount=STAGING_MOUNT,
+                )
+
+                try:
+                    self.container_id = await asyncio.wait_for(
+                        get_docker().run_detached(
+                            self.image,
+                            ["sleep", "infinity"],
+                            host_config,
+                            working_dir=STAGING_MOUNT,
+                            labels=owner_labels(ROLE_COMPILE_SERVER, self._staging_root),
+                        ),
+                        timeout=_START_TIMEOUT,
+                    )
+                except asyncio.TimeoutError:
+                    raise DockerError("timed out starting the compile container")
+                log.info(f"Started {self.language} compile container {self.container_id[:12]}")
+
+            return self.container_id
+
+    async def _reset(self) -> None:
+        # The container is gone or unusable: drop its daemons and start a
+        # fresh one on the next request.
+        idle, self._idle = self._idle, []
+        for slot, session in idle:
+            session.close()
+            self._free.append(slot)
+
+        async with self._container_lock:
+            if self.container_id:
+                try:
+                    await get_docker().remove_container(self.container_id)
+                except DockerError:
+                    pass
+                self.container_id = None
+
+    def _pid_file(self, slot: int) -> str:
+        return f"/tmp/.compile-server-{self.language}-{slot}.pid"
+
+
+_servers: dict[str, CompileServer] = {}
+
+
+def get_compile_server(language: str) -> CompileServer | None:
+    return _servers.get(language)
+
+
+async def start_compile_servers(commands: dict[str, tuple[str, list[str]]]) -> dict[str, CompileServer]:
+    """
+    Start servers for `commands` (language -> (image, daemon command)) that
+    have sessions configured in COMPILE_SERVER_SESSIONS.  Daemons are started
+    in the background; a language whose container fails to start still gets
+    a server and retries on its first request.
+    """
+    for language, (image, command) in commands.items():
+        sessions = COMPILE_SERVER_SESSIONS.get(language, 0)
+        if sessions > 0 and language not in _servers:
+            _servers[language] = CompileServer(language, image, command, sessions)
+
+    await asyncio.gather(*(server.warm_up() for server in _servers.values()))
+    return _servers
+
+
+async def stop_compile_servers() -> None:
+    servers = list(_servers.values())
+    _servers.clear()
+    await asyncio.gather(*(server.stop() for server in servers), return_exceptions=True)
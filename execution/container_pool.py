@@ -0,0 +1,309 @@
+"""
+Pre-warmed sandbox container pool.
+
+Starting a sandbox container (`docker run -d ... sleep`) and removing it again
+dominates wall time for short submissions.  The pool keeps a few idle
+containers per sandbox image, already started with the standard hardening
+flags and bound to their own empty workspace directory, and hands one to an
+executor on compile().  Containers are never reused: the executor removes its
+container in cleanup() as before and the pool starts a replacement in the
+background.
+
+The pool is per process.  worker.py starts it; any process that never calls
+start_container_pool() (e.g. the API fallback path) transparently gets a cold
+container from acquire_sandbox().
+"""
+
+import asyncio
+import logging
+import shutil
+import tempfile
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+from config.limits import (
+    DOCKER_MEMORY_LIMIT,
+    DOCKER_MEMORY_SWAP,
+    DOCKER_CPU_LIMIT,
+    DOCKER_PIDS_LIMIT,
+    DOCKER_NOFILE_LIMIT,
+    CONTAINER_SLEEP_SECONDS,
+    CONTAINER_POOL_SIZES,
+    CONTAINER_POOL_MAX_IDLE_SECONDS,
+    CONTAINER_POOL_REFILL_INTERVAL_SECONDS,
+)
+from execution.docker_client import get_docker
+from execution.exceptions import DockerError, RuntimeExecutionError
+from execution.ownership import ROLE_SANDBOX, owner_labels
+from execution.sandbox_paths import build_host_temp_dir, get_sandbox_roots
+from execution.workspace import TMPFS_WORKSPACES, workspace_tmpfs
+
+log = logging.getLogger(__name__)
+
+_START_TIMEOUT = 30.0
+
+
+@dataclass
+class Sandbox:
+    container_id: str
+    temp_dir: str
+    host_temp_dir: str
+    created_at: float = field(default_factory=time.monotonic)
+
+
+# -------------------------
+# Container lifecycle
+# -------------------------
+
+def _parse_bytes(value: str) -> int:
+    units = {"k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+    suffix = value[-1].lower()
+    if suffix in units:
+        return int(float(value[:-1]) * units[suffix])
+    return int(value)
+
+
+def sandbox_host_config(
+    host_temp_dir: str | None,
+    cpus: str = DOCKER_CPU_LIMIT,
+    auto_remove: bool = True,
+    memory: str = DOCKER_MEMORY_LIMIT,
+    memory_swap: str = DOCKER_MEMORY_SWAP,
+    mount: str = "/app",
+    tmpfs: dict[str, str] | None = None,
+) -> dict:
+    """
+    HostConfig with the standard sandbox hardening, `host_temp_dir` (if any)
+    bound at `mount` and the `tmpfs` mounts (see workspace_tmpfs()).
+    """
+    return {
+        "Binds": [f"{host_temp_dir}:{mount}"] if host_temp_dir else [],
+        "Tmpfs": tmpfs or {},
+        "Memory": _parse_bytes(memory),
+        "MemorySwap": _parse_bytes(memory_swap),
+        "NanoCpus": int(float(cpus) * 1e9),
+        "PidsLimit": int(DOCKER_PIDS_LIMIT),
+        "Ulimits": [{
+            "Name": "nofile",
+            "Soft": int(DOCKER_NOFILE_LIMIT),
+            "Hard": int(DOCKER_NOFILE_LIMIT),
+        }],
+        "NetworkMode": "none",
+        "CapDrop": ["ALL"],
+        "SecurityOpt": ["no-new-privileges"],
+        "AutoRemove": auto_remove,
+    }
+
+
+async def start_sandbox(
+    image: str,
+    cpus: str = DOCKER_CPU_LIMIT,
+    sleep_seconds: int = CONTAINER_SLEEP_SECONDS,
+) -> Sandbox:
+    """
+    Create a workspace and start a hardened container with it mounted at /app,
+    or, with tmpfs workspaces, as the staging area of its tmpfs /app.
+    """
+    container_sandbox_root, host_sandbox_root = get_sandbox_roots()
+
+    temp_dir = tempfile.mkdtemp(dir=container_sandbox_root)
+    host_temp_dir = build_host_temp_dir(host_sandbox_root, temp_dir)
+
+    if TMPFS_WORKSPACES:
+        host_config = sandbox_host_config(None, cpus=cpus, tmpfs=workspace_tmpfs())
+    else:
+        host_config = sandbox_host_config(host_temp_dir, cpus=cpus)
+
+    try:
+        container_id = await asyncio.wait_for(
+            get_docker().run_detached(
+                image,
+                ["sleep", str(sleep_seconds)],
+                host_config,
+                labels=owner_labels(ROLE_SANDBOX, temp_dir),
+            ),
+            timeout=_START_TIMEOUT,
+        )
+    except asyncio.TimeoutError:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise RuntimeExecutionError("Docker daemon timed out and hung while starting the container")
+    except DockerError:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise RuntimeExecutionError("Failed to start execution container")
+
+    return Sandbox(
+        container_id=container_id,
+        temp_dir=temp_dir,
+        host_temp_dir=host_temp_dir,
+    )
+
+
+async def remove_sandbox(sandbox: Sandbox) -> None:
+    try:
+        await get_docker().remove_container(sandbox.container_id)
+    except DockerError as e:
+        log.warning(f"Failed to remove container {sandbox.container_id}: {e}")
+
+    shutil.rmtree(sandbox.temp_dir, ignore_errors=True)
+
+
+# -------------------------
+# Pool
+# -------------------------
+
+class ContainerPool:
+
+    def __init__(self, sizes: dict[str, int]):
+        self.sizes = {image: size for image, size in sizes.items() if size > 0}
+
+        self._idle: dict[str, deque[Sandbox]] = {image: deque() for image in self.sizes}
+        self._starting: dict[str, int] = {image: 0 for image in self.sizes}
+        self._hits: dict[str, int] = {image: 0 for image in self.sizes}
+        self._misses: dict[str, int] = {}
+        self._refill_failures: dict[str, int] = {image: 0 for image in self.sizes}
+        self._refill_last_ms: dict[str, float] = {}
+        self._refill_avg_ms: dict[str, float] = {}
+
+        self._wakeup = asyncio.Event()
+        self._refills: set[asyncio.Task] = set()
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._refill_loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        for task in list(self._refills):
+            task.cancel()
+        await asyncio.gather(*self._refills, return_exceptions=True)
+
+        idle = [sb for queue in self._idle.values() for sb in queue]
+        for queue in self._idle.values():
+            queue.clear()
+        await asyncio.gather(*(remove_sandbox(sb) for sb in idle), return_exceptions=True)
+
+    async def acquire(self, image: str, cpus: str = DOCKER_CPU_LIMIT) -> Sandbox:
+        queue = self._idle.get(image)
+
+        # Pooled containers are started with the default CPU limit only.
+        if queue is not None and cpus == DOCKER_CPU_LIMIT:
+            while queue:
+                sandbox = queue.popleft()
+                if self._is_stale(sandbox):
+                    self._spawn(remove_sandbox(sandbox))
+                    continue
+                self._hits[image] += 1
+                self._wakeup.set()
+                return sandbox
+
+        self._misses[image] = self._misses.get(image, 0) + 1
+        self._wakeup.set()
+        return await start_sandbox(image, cpus=cpus)
+
+    def idle_count(self, image: str) -> int:
+        return len(self._idle.get(image, ()))
+
+    def stats(self) -> dict:
+        images = sorted(set(self.sizes) | set(self._misses))
+        return {
+            image: {
+                "target": self.sizes.get(image, 0),
+                "idle": len(self._idle.get(image, ())),
+                "starting": self._starting.get(image, 0),
+                "hits": self._hits.get(image, 0),
+                "misses": self._misses.get(image, 0),
+                "refill_failures": self._refill_failures.get(image, 0),
+                "refill_last_ms": round(self._refill_last_ms.get(image, 0.0), 1),
+                "refill_avg_ms": round(self._refill_avg_ms.get(image, 0.0), 1),
+            }
+            for image in images
+        }
+
+    def _is_stale(self, sandbox: Sandbox) -> bool:
+        return time.monotonic() - sandbox.created_at > CONTAINER_POOL_MAX_IDLE_SECONDS
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._refills.add(task)
+        task.add_done_callback(self._refills.discard)
+
+    async def _refill_loop(self) -> None:
+        while True:
+            for image, target in self.sizes.items():
+                queue = self._idle[image]
+
+                while queue and self._is_stale(queue[0]):
+                    self._spawn(remove_sandbox(queue.popleft()))
+
+                deficit = target - len(queue) - self._starting[image]
+                for _ in range(deficit):
+                    self._starting[image] += 1
+                    self._spawn(self._refill_one(image))
+
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(),
+                    timeout=CONTAINER_POOL_REFILL_INTERVAL_SECONDS,
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _refill_one(self, image: str) -> None:
+        started = time.monotonic()
+        try:
+            # Idle time counts against the container's lifetime, so pooled
+            # containers sleep long enough to still give the executor the
+            # usual CONTAINER_SLEEP_SECONDS after the longest allowed idle.
+            sandbox = await start_sandbox(
+                image,
+                sleep_seconds=CONTAINER_POOL_MAX_IDLE_SECONDS + CONTAINER_SLEEP_SECONDS,
+            )
+        except Exception as e:
+            self._refill_failures[image] += 1
+            log.warning(f"Container pool refill for {image} failed: {e}")
+            return
+        finally:
+            self._starting[image] -= 1
+
+        elapsed_ms = (time.monotonic() - started) * 1000
+        self._refill_last_ms[image] = elapsed_ms
+        previous = self._refill_avg_ms.get(image)
+        self._refill_avg_ms[image] = elapsed_ms if previous is None else 0.8 * previous + 0.2 * elapsed_ms
+
+        self._idle[image].append(sandbox)
+
+
+_pool: ContainerPool | None = None
+
+
+def get_container_pool() -> ContainerPool | None:
+    return _pool
+
+
+async def start_container_pool(sizes: dict[str, int] | None = None) -> ContainerPool:
+    global _pool
+    if _pool is None:
+        _pool = ContainerPool(CONTAINER_POOL_SIZES if sizes is None else sizes)
+        await _pool.start()
+    return _pool
+
+
+async def stop_container_pool() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.stop()
+        _pool = None
+
+
+async def acquire_sandbox(image: str, cpus: str = DOCKER_CPU_LIMIT) -> Sandbox:
+    """Return a running sandbox container for `image`, pooled when possible."""
+    if _pool is None:
+        return await start_sandbox(image, cpus=cpus)
+    return await _pool.acquire(image, cpus=cpus)
@@ -0,0 +1,663 @@
+"""
+Async Docker Engine API client over the daemon's unix socket.
+
+Replaces spawning the `docker` CLI for every container operation.  Plain
+requests (create/start/kill/remove/inspect) share a pooled httpx client;
+exec and attach streams need a hijacked connection, so each of those opens
+one raw unix socket connection and demultiplexes the stdout/stderr frames
+itself.  ExecSession keeps such a stream open for processes that exchange
+one line per request with the caller (the test harness).
+
+Closing an exec's stream does not stop the process, so execs that run
+submitted code are tracked: given `cpu_seconds` they record their pid and
+run under that RLIMIT_CPU, and kill_exec() takes down their process tree
+inside the container.  stop_exec() retries that and, should it still fail,
+removes the whole container, so a timeout is only reported once the
+timed-out process is gone.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import struct
+import time
+import uuid
+from dataclasses import dataclass
+from urllib.parse import urlencode
+
+import httpx
+
+from config.limits import DOCKER_API_MAX_CONNECTIONS, DOCKER_API_TIMEOUT_SECONDS
+from execution.exceptions import DockerError
+
+log = logging.getLogger(__name__)
+
+API_VERSION = "v1.41"
+DEFAULT_SOCKET = "/var/run/docker.sock"
+
+_STDOUT = 1
+_STDERR = 2
+
+# Runs "$@" with its pid recorded in $0 and RLIMIT_CPU $1 as a backstop.
+# runc starts every exec in a new session, so that pid is also the process
+# group of whatever the command spawns.
+_TRACKED_EXEC = 'echo $$ > "$0" && ulimit -t "$1" && shift && exec "$@"'
+
+# SIGKILLs the process recorded in $0, everything in its process group and
+# all their descendants, including those that moved to a group of their own
+# (the Python zygote's children), until none is left; exits 1 if something
+# is still alive after ~2 s.  Zombies count as gone: the container's init
+# (`sleep`) never reaps orphans.
+_KILL_TRACKED_EXEC = """
+root=$(cat "$0" 2>/dev/null) || exit 0
+groups=" $root "
+pass=0
+while :; do
+    out=$(cat /proc/[0-9]*/stat 2>/dev/null | awk -v root="$root" -v groups="$groups" '
+        {
+            pid = $1
+            sub(/^.*\\) /, "")
+            state[pid] = $1; ppid[pid] = $2; pgrp[pid] = $3
+        }
+        END {
+            do {
+                grown = 0
+                for (p in state) {
+                    if (p in hit) continue
+                    if (p == root || index(groups, " " pgrp[p] " ") || (ppid[p] in hit)) {
+                        hit[p] = 1
+                        grown = 1
+                        if (!index(groups, " " pgrp[p] " ")) groups = groups pgrp[p] " "
+                    }
+                }
+            } while (grown)
+            printf "%s|", groups
+            for (p in hit) if (state[p] != "Z" && state[p] != "X") printf " %s", p
+        }')
+    groups=${out%%|*}
+    pids=${out#*|}
+    [ -z "$pids" ] && exit 0
+    [ "$pass" -ge 100 ] && exit 1
+    kill -9 $pids 2>/dev/null
+    pass=$((pass + 1))
+    sleep 0.02
+done
+"""
+
+_KILL_TIMEOUT = 10.0
+_KILL_ATTEMPTS = 2   # then stop_exec() removes the container
+
+
+def _socket_path() -> str:
+    docker_host = os.environ.get("DOCKER_HOST", "")
+    if docker_host.startswith("unix://"):
+        return docker_host[len("unix://"):]
+    return DEFAULT_SOCKET
+
+
+@dataclass
+class ExecResult:
+    exit_code: int | None
+    stdout: bytes
+    stderr: bytes
+
+
+class DockerClient:
+
+    def __init__(self, socket_path: str | None = None):
+        self.socket_path = socket_path or _socket_path()
+        self._http = httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(
+                uds=self.socket_path,
+                limits=httpx.Limits(
+                    max_connections=DOCKER_API_MAX_CONNECTIONS,
+                    max_keepalive_connections=DOCKER_API_MAX_CONNECTIONS,
+                ),
+            ),
+            base_url=f"http://docker/{API_VERSION}",
+            timeout=DOCKER_API_TIMEOUT_SECONDS,
+        )
+
+    async def close(self) -> None:
+        await self._http.aclose()
+
+    # -------------------------
+    # Containers
+    # -------------------------
+
+    async def create_container(
+        self,
+        image: str,
+        cmd: list[str],
+        host_config: dict,
+        working_dir: str = "/app",
+        open_stdin: bool = False,
+        labels: dict[str, str] | None = None,
+    ) -> str:
+        body = {
+            "Image": image,
+            "Cmd": cmd,
+            "WorkingDir": working_dir,
+            "HostConfig": host_config,
+            "NetworkDisabled": host_config.get("NetworkMode") == "none",
+            "Labels": labels or {},
+            "AttachStdin": open_stdin,
+            "AttachStdout": True,
+            "AttachStderr": True,
+            "OpenStdin": open_stdin,
+            "StdinOnce": open_stdin,
+            "Tty": False,
+        }
+        resp = await self._request("POST", "/containers/create", body=body)
+        return resp.json()["Id"]
+
+    async def start_container(self, container_id: str) -> None:
+        await self._request("POST", f"/containers/{container_id}/start")
+
+    async def run_detached(
+        self,
+        image: str,
+        cmd: list[str],
+        host_config: dict,
+        working_dir: str = "/app",
+        labels: dict[str, str] | None = None,
+    ) -> str:
+        """Equivalent of `docker run -d`; removes the container if start fails."""
+        container_id = await self.create_container(
+            image, cmd, host_config, working_dir=working_dir, labels=labels,
+        )
+        try:
+            await self.start_container(container_id)
+        except DockerError:
+            await self.remove_container(container_id)
+            raise
+        return container_id
+
+    async def kill_container(self, container_id: str, signal: str = "KILL") -> None:
+        await self._request(
+            "POST", f"/containers/{container_id}/kill",
+            params={"signal": signal},
+            ignore=(404, 409),
+        )
+
+    async def remove_container(self, container_id: str, force: bool = True) -> None:
+        # 404: already gone (AutoRemove), 409: removal already in progress.
+        await self._request(
+            "DELETE", f"/containers/{container_id}",
+            params={"force": "true" if force else "false"},
+            ignore=(404, 409),
+        )
+
+    async def list_containers(self, label: str | None = None) -> list[dict]:
+        """`docker ps -a`, optionally only containers that carry `label`."""
+        params = {"all": "true"}
+        if label:
+            params["filters"] = json.dumps({"label": [label]})
+        resp = await self._request("GET", "/containers/json", params=params)
+        return resp.json()
+
+    async def wait_container(self, container_id: str) -> int:
+        resp = await self._request(
+            "POST", f"/containers/{container_id}/wait", timeout=None,
+        )
+        return resp.json().get("StatusCode", -1)
+
+    async def attach(
+        self,
+        container_id: str,
+        stdin: bytes | None = None,
+    ) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        """Hijack an attach stream; call before start_container() to see all output."""
+        query = urlencode({
+            "stream": 1,
+            "stdin": int(stdin is not None),
+            "stdout": 1,
+            "stderr": 1,
+        })
+        return await self._hijack("POST", f"/containers/{container_id}/attach?{query}")
+
+    async def run(
+        self,
+        image: str,
+        cmd: list[str],
+        host_config: dict,
+        stdin: bytes | None = None,
+        working_dir: str = "/app",
+        timeout: float | None = None,
+        limit: int | None = None,
+        labels: dict[str, str] | None = None,
+    ) -> ExecResult:
+        """
+        Equivalent of `docker run -i --rm`: create, attach, start, feed stdin,
+        collect output and remove.  Raises asyncio.TimeoutError after killing
+        the container if it runs longer than `timeout`.
+        """
+        container_id = await self.create_container(
+            image, cmd, host_config,
+            working_dir=working_dir,
+            open_stdin=stdin is not None,
+            labels=labels,
+        )
+        try:
+            reader, writer = await self.attach(container_id, stdin=stdin)
+            try:
+                await self.start_container(container_id)
+                stdout, stderr = await asyncio.wait_for(
+                    self._communicate(reader, writer, stdin, limit),
+                    timeout=timeout,
+                )
+            finally:
+                writer.close()
+
+            exit_code = await asyncio.wait_for(
+                self.wait_container(container_id),
+                timeout=DOCKER_API_TIMEOUT_SECONDS,
+            )
+            return ExecResult(exit_code=exit_code, stdout=stdout, stderr=stderr)
+
+        except asyncio.TimeoutError:
+            await self.kill_container(container_id)
+            raise
+        finally:
+            await self.remove_container(container_id)
+
+    # -------------------------
+    # Exec
+    # -------------------------
+
+    async def exec(
+        self,
+        container_id: str,
+        cmd: list[str],
+        stdin: bytes | None = None,
+        workdir: str | None = None,
+        env: dict[str, str] | None = None,
+        timeout: float | None = None,
+        limit: int | None = None,
+        cpu_seconds: int | None = None,
+    ) -> ExecResult:
+        """
+        Equivalent of `docker exec [-i]`.  Output beyond `limit` bytes per
+        stream is not collected (the returned stdout is then limit + 1 bytes
+        long and the exit code is None).  Raises asyncio.TimeoutError when the
+        command does not finish within `timeout`; with `cpu_seconds` (see
+        track_exec) only once stop_exec() stopped it, DockerError if it could not.
+        """
+        pid_file = None
+        if cpu_seconds is not None:
+            cmd, pid_file = track_exec(cmd, cpu_seconds)
+
+        exec_id = await self.create_exec(container_id, cmd, stdin is not None, workdir, env)
+        reader, writer = await self.start_exec(exec_id)
+        try:
+            stdout, stderr = await asyncio.wait_for(
+                self._communicate(reader, writer, stdin, limit),
+                timeout=timeout,
+            )
+        except asyncio.TimeoutError:
+            if pid_file:
+                await self.stop_exec(container_id, pid_file)
+            raise
+        finally:
+            writer.close()
+
+        if limit is not None and (len(stdout) > limit or len(stderr) > limit):
+            return ExecResult(exit_code=None, stdout=stdout, stderr=stderr)
+
+        return ExecResult(
+            exit_code=await self.exec_exit_code(exec_id),
+            stdout=stdout,
+            stderr=stderr,
+        )
+
+    async def open_exec(
+        self,
+        container_id: str,
+        cmd: list[str],
+        workdir: str | None = None,
+        env: dict[str, str] | None = None,
+        stderr_limit: int | None = None,
+        cpu_seconds: int | None = None,
+    ) -> "ExecSession":
+        """
+        Start `cmd` with stdin left open for a line-oriented conversation.
+        With `cpu_seconds` (see track_exec) the session can be kill()ed.
+        """
+        pid_file = None
+        if cpu_seconds is not None:
+            cmd, pid_file = track_exec(cmd, cpu_seconds)
+
+        exec_id = await self.create_exec(container_id, cmd, True, workdir, env)
+        reader, writer = await self.start_exec(exec_id)
+        return ExecSession(self, exec_id, reader, writer, stderr_limit, container_id, pid_file)
+
+    async def create_exec(
+        self,
+        container_id: str,
+        cmd: list[str],
+        attach_stdin: bool = False,
+        workdir: str | None = None,
+        env: dict[str, str] | None = None,
+    ) -> str:
+        body = {
+            "Cmd": cmd,
+            "AttachStdin": attach_stdin,
+            "AttachStdout": True,
+            "AttachStderr": True,
+            "Tty": False,
+        }
+        if workdir:
+            body["WorkingDir"] = workdir
+        if env:
+            body["Env"] = [f"{key}={value}" for key, value in env.items()]
+
+        resp = await self._request("POST", f"/containers/{container_id}/exec", body=body)
+        return resp.json()["Id"]
+
+    async def start_exec(self, exec_id: str) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        return await self._hijack(
+            "POST", f"/exec/{exec_id}/start",
+            body={"Detach": False, "Tty": False},
+        )
+
+    async def kill_exec(self, container_id: str, pid_file: str) -> bool:
+        """
+        Kill the process tree of a tracked exec (see track_exec).  True once
+        nothing of it is left running; False if that could not be confirmed.
+        """
+        try:
+            result = await self.exec(
+                container_id, ["sh", "-c", _KILL_TRACKED_EXEC, pid_file],
+                timeout=_KILL_TIMEOUT,
+            )
+        except (asyncio.TimeoutError, DockerError):
+            return False
+        return result.exit_code == 0
+
+    async def stop_exec(self, container_id: str, pid_file: str | None) -> None:
+        """
+        Make sure a tracked exec no longer runs: kill_exec() it, and if that
+        cannot be confirmed after _KILL_ATTEMPTS tries (or the exec is not
+        tracked), remove its container.  Raises DockerError if that fails too.
+        """
+        if pid_file:
+            for _ in range(_KILL_ATTEMPTS):
+                if await self.kill_exec(container_id, pid_file):
+                    return
+
+        log.warning(f"Could not kill a timed-out exec in {container_id[:12]}, removing the container")
+        await self.remove_container(container_id)
+
+    async def inspect_exec(self, exec_id: str) -> dict:
+        resp = await self._request("GET", f"/exec/{exec_id}/json")
+        return resp.json()
+
+    async def exec_exit_code(self, exec_id: str) -> int | None:
+        # The stream can close a moment before the daemon records the exit.
+        deadline = time.monotonic() + 1.0
+        while True:
+            info = await self.inspect_exec(exec_id)
+            if not info.get("Running") or time.monotonic() > deadline:
+                return info.get("ExitCode")
+            await asyncio.sleep(0.01)
+
+    # -------------------------
+    # Images
+    # -------------------------
+
+    async def inspect_image(self, image: str) -> dict:
+        resp = await self._request("GET", f"/images/{image}/json")
+        return resp.json()
+
+    # -------------------------
+    # Transport
+    # -------------------------
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        params: dict | None = None,
+        body: dict | None = None,
+        ignore: tuple[int, ...] = (),
+        timeout=httpx.USE_CLIENT_DEFAULT,
+    ) -> httpx.Response:
+        try:
+            resp = await self._http.request(method, path, params=params, json=body, timeout=timeout)
+        except httpx.HTTPError as e:
+            raise DockerError(f"Docker API unreachable: {e!r}") from e
+
+        if resp.status_code >= 400 and resp.status_code not in ignore:
+            try:
+                message = resp.json().get("message", resp.text)
+            except ValueError:
+                message = resp.text
+            raise DockerError(f"Docker API error {resp.status_code}: {message}")
+
+        return resp
+
+    async def _hijack(
+        self,
+        method: str,
+        path: str,
+        body: dict | None = None,
+    ) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        payload = json.dumps(body).encode() if body is not None else b""
+        head = (
+            f"{method} /{API_VERSION}{path} HTTP/1.1\r\n"
+            "Host: docker\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            "Connection: Upgrade\r\n"
+            "Upgrade: tcp\r\n"
+            "\r\n"
+        ).encode()
+
+        try:
+            reader, writer = await asyncio.open_unix_connection(self.socket_path)
+        except OSError as e:
+            raise DockerError(f"Docker API unreachable: {e!r}") from e
+
+        try:
+            writer.write(head + payload)
+            await writer.drain()
+
+            status_line = await reader.readline()
+            try:
+                status = int(status_line.split()[1])
+            except (IndexError, ValueError):
+                raise DockerError(f"Malformed Docker API response: {status_line!r}")
+
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                key, _, value = line.decode("latin-1").partition(":")
+                headers[key.strip().lower()] = value.strip()
+
+            if status not in (101, 200):
+                length = int(headers.get("content-length", "0"))
+                raw = await reader.readexactly(length) if length else b""
+                try:
+                    message = json.loads(raw).get("message", raw.decode(errors="replace"))
+                except ValueError:
+                    message = raw.decode(errors="replace")
+                raise DockerError(f"Docker API error {status}: {message}")
+
+        except (OSError, asyncio.IncompleteReadError) as e:
+            writer.close()
+            raise DockerError(f"Docker API stream failed: {e!r}") from e
+        except BaseException:
+            writer.close()
+            raise
+
+        return reader, writer
+
+    async def _communicate(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        stdin: bytes | None,
+        limit: int | None,
+    ) -> tuple[bytes, bytes]:
+        if stdin is not None:
+            # The transport buffers the payload and half-closes once it is flushed,
+            # which is what signals EOF to the process inside the container.
+            writer.write(stdin)
+            if writer.can_write_eof():
+                writer.write_eof()
+
+        out = {_STDOUT: bytearray(), _STDERR: bytearray()}
+        while True:
+            frame = await read_frame(reader)
+            if frame is None:
+                break
+            stream, data = frame
+            buf = out.get(stream)
+            if buf is None:
+                continue
+            buf += data
+            if limit is not None and len(buf) > limit:
+                del buf[limit + 1:]
+                break
+
+        return bytes(out[_STDOUT]), bytes(out[_STDERR])
+
+
+class ExecSession:
+    """
+    A running exec whose stdin stays open.  Input is written with send();
+    stdout is read back one line at a time while stderr is collected on
+    the side (up to `stderr_limit` bytes).
+    """
+
+    def __init__(
+        self,
+        docker: DockerClient,
+        exec_id: str,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        stderr_limit: int | None = None,
+        container_id: str | None = None,
+        pid_file: str | None = None,
+    ):
+        self.exec_id = exec_id
+        self._docker = docker
+        self._container_id = container_id
+        self._pid_file = pid_file
+        self._reader = reader
+        self._writer = writer
+        self._stderr_limit = stderr_limit
+        self._stdout = bytearray()
+        self._scanned = 0
+        self._stderr = bytearray()
+        self._eof = False
+        self._killed = False
+
+    @property
+    def stderr(self) -> bytes:
+        return bytes(self._stderr)
+
+    async def send(self, data: bytes) -> None:
+        try:
+            self._writer.write(data)
+            await self._writer.drain()
+        except ConnectionError:
+            # The process is gone; the next readline() reports end of stream.
+            pass
+
+    async def readline(self, limit: int | None = None) -> bytes | None:
+        """
+        Return the next stdout line without its newline, or None once the
+        process has exited.  A line longer than `limit` is returned cut to
+        limit + 1 bytes.
+        """
+        while True:
+            end = self._stdout.find(b"\n", self._scanned)
+            if end != -1:
+                line = bytes(self._stdout[:end])
+                del self._stdout[:end + 1]
+                self._scanned = 0
+                return line
+
+            self._scanned = len(self._stdout)
+            if limit is not None and len(self._stdout) > limit:
+                line = bytes(self._stdout[:limit + 1])
+                self._stdout.clear()
+                self._scanned = 0
+                return line
+
+            if self._eof:
+                if not self._stdout:
+                    return None
+                line = bytes(self._stdout)
+                self._stdout.clear()
+                self._scanned = 0
+                return line
+
+            frame = await read_frame(self._reader)
+            if frame is None:
+                self._eof = True
+                continue
+
+            stream, data = frame
+            if stream == _STDOUT:
+                self._stdout += data
+            elif stream == _STDERR:
+                if self._stderr_limit is None:
+                    self._stderr += data
+                else:
+                    self._stderr += data[:max(0, self._stderr_limit - len(self._stderr))]
+
+    async def exit_code(self) -> int | None:
+        return await self._docker.exec_exit_code(self.exec_id)
+
+    async def kill(self) -> None:
+        """Stop the session's process tree, once; see DockerClient.stop_exec."""
+        if self._killed:
+            return
+        await self._docker.stop_exec(self._container_id, self._pid_file)
+        self._killed = True
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+def track_exec(cmd: list[str], cpu_seconds: int) -> tuple[list[str], str]:
+    """
+    Wrap an exec command that runs submitted code: it records its pid in a
+    file under /tmp (returned alongside, for kill_exec) and runs with
+    RLIMIT_CPU `cpu_seconds`, the backstop should a kill fail.
+    """
+    pid_file = f"/tmp/.exec-{uuid.uuid4().hex}.pid"
+    return ["sh", "-c", _TRACKED_EXEC, pid_file, str(cpu_seconds), *cmd], pid_file
+
+
+async def read_frame(reader: asyncio.StreamReader) -> tuple[int, bytes] | None:
+    """Read one multiplexed stdout/stderr frame; None at end of stream."""
+    try:
+        header = await reader.readexactly(8)
+    except asyncio.IncompleteReadError:
+        return None
+
+    stream = header[0]
+    (size,) = struct.unpack(">I", header[4:8])
+
+    try:
+        data = await reader.readexactly(size)
+    except asyncio.IncompleteReadError as e:
+        data = e.partial
+
+    return stream, data
+
+
+_docker: DockerClient | None = None
+
+
+def get_docker() -> DockerClient:
+    global _docker
+    if _docker is None:
+        _docker = DockerClient()
+    return _docker
@@ -11,3 +11,13 @@ class RuntimeExecutionError(Exception):
 class ExecutionTimeoutError(Exception):
     """Raised when execution exceeds time limit."""
     pass
+
+
+class DockerError(RuntimeExecutionError):
+    """Raised when the Docker Engine API rejects a request or is unreachable."""
+    pass
+
+
+class CompileServerError(DockerError):
+    """Raised when a compile server cannot take or answer a request."""
+    pass
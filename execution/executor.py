@@ -26,6 +26,18 @@ class ExecutorFactory:
         "rust": RustExecutor
     }
 
+    @staticmethod
+    def languages() -> list[str]:
+        return list(ExecutorFactory._registry)
+
+    @staticmethod
+    def image_for(language: str) -> str:
+        return ExecutorFactory._registry[language].IMAGE_NAME
+
+    @staticmethod
+    def compile_server_command(language: str) -> list[str] | None:
+        return ExecutorFactory._registry[language].COMPILE_SERVER_COMMAND
+
     @staticmethod
     def get_executor(language: str, source_code: str, function_name: str):
         executor_class = ExecutorFactory._registry.get(language)
@@ -0,0 +1,238 @@
+"""
+Orphan reaper — removes sandbox containers and workspaces nobody will clean up.
+
+A crashed worker, a cancelled job or a killed API process can leave behind
+containers (compile containers even run `sleep infinity`) and `tmp*`
+workspace directories under the sandbox root.  Each sweep lists the
+containers labelled by execution/ownership.py and checks their owners and
+jobs in Redis.  A container is orphaned when:
+
+  - its owner's heartbeat (see jobqueue/job.py) has expired and the container
+    is older than ORPHAN_MIN_AGE_SECONDS (processes that never heartbeat, like
+    the API fallback path, only run short jobs);
+  - or it is a submission's container whose job is no longer queued or running;
+  - or it is a submission's container that has exited.
+
+Its workspace (a compile container's: its staging directory) goes with it.
+A workspace no remaining container mounts is orphaned once its mtime is
+ORPHAN_MIN_AGE_SECONDS old.
+
+Anything found orphaned is only removed if the previous sweep found it
+orphaned too, so a heartbeat lost in a Redis restart, or a container the
+owner's cleanup is about to remove, is left alone.  No sweep runs while Redis
+cannot be read.
+
+worker.py runs the reaper in-process; reaper.py runs it standalone.  Either
+way it only sees the local Docker daemon and sandbox root.
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import time
+
+from config.limits import ORPHAN_REAPER_INTERVAL_SECONDS, ORPHAN_MIN_AGE_SECONDS
+from execution.compile_server import STAGING_PREFIX
+from execution.docker_client import get_docker
+from execution.exceptions import DockerError
+from execution.ownership import (
+    OWNER_LABEL,
+    JOB_LABEL,
+    ROLE_LABEL,
+    WORKSPACE_LABEL,
+    ROLE_COMPILE_SERVER,
+)
+from execution.sandbox_paths import get_sandbox_roots
+from jobqueue.job import live_jobs, live_workers
+
+log = logging.getLogger(__name__)
+
+
+def _orphaned(container: dict, workers: set[str], jobs: set[str]) -> str | None:
+    """Why `container` is orphaned, or None while it may still be in use."""
+    labels = container.get("Labels") or {}
+
+    if labels.get(OWNER_LABEL) not in workers:
+        if time.time() - container.get("Created", 0) > ORPHAN_MIN_AGE_SECONDS:
+            return "owner gone"
+        return None
+
+    if labels.get(ROLE_LABEL) == ROLE_COMPILE_SERVER:
+        return None
+
+    if container.get("State") in ("exited", "dead"):
+        return "exited"
+
+    job_id = labels.get(JOB_LABEL)
+    if job_id and job_id not in jobs:
+        return "job finished"
+
+    return None
+
+
+def _remove_tree(path: str) -> int:
+    """Delete `path`; the number of bytes it held."""
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    shutil.rmtree(path, ignore_errors=True)
+    return size
+
+
+class OrphanReaper:
+
+    def __init__(self, interval: float = ORPHAN_REAPER_INTERVAL_SECONDS):
+        self.interval = interval
+
+        # Found orphaned by the previous sweep: container ids / workspace names.
+        self._suspect_containers: set[str] = set()
+        self._suspect_workspaces: set[str] = set()
+
+        self._sweeps = 0
+        self._containers = 0
+        self._workspaces = 0
+        self._bytes = 0
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "sweeps": self._sweeps,
+            "containers": self._containers,
+            "workspaces": self._workspaces,
+            "workspace_bytes": self._bytes,
+        }
+
+    async def sweep(self) -> dict:
+        """One pass; what it reclaimed."""
+        reclaimed = {"containers": 0, "workspaces": 0, "workspace_bytes": 0}
+
+        try:
+            containers = await get_docker().list_containers(label=OWNER_LABEL)
+        except DockerError as e:
+            log.warning(f"Orphan sweep skipped, cannot list containers: {e}")
+            return reclaimed
+
+        labels = [c.get("Labels") or {} for c in containers]
+        try:
+            workers = await live_workers(sorted({l[OWNER_LABEL] for l in labels if l.get(OWNER_LABEL)}))
+            jobs = await live_jobs(sorted({l[JOB_LABEL] for l in labels if l.get(JOB_LABEL)}))
+        except Exception as e:
+            log.warning(f"Orphan sweep skipped, cannot read owners from Redis: {e!r}")
+            return reclaimed
+
+        self._sweeps += 1
+        suspects: set[str] = set()
+        mounted: set[str] = set()
+        orphan_workspaces: set[str] = set()
+
+        for container in containers:
+            container_id = container["Id"]
+            workspace = (container.get("Labels") or {}).get(WORKSPACE_LABEL)
+            reason = _orphaned(container, workers, jobs)
+
+            if reason is None or container_id not in self._suspect_containers:
+                if reason is not None:
+                    suspects.add(container_id)
+                if workspace:
+                    mounted.add(workspace)
+                continue
+
+            try:
+                await get_docker().remove_container(container_id)
+            except DockerError as e:
+                log.warning(f"Failed to remove orphaned container {container_id[:12]}: {e}")
+                suspects.add(container_id)
+                if workspace:
+                    mounted.add(workspace)
+                continue
+
+            log.info(f"Removed orphaned container {container_id[:12]} ({reason})")
+            reclaimed["containers"] += 1
+            if workspace:
+                orphan_workspaces.add(workspace)
+
+        self._suspect_containers = suspects
+
+        container_root, _ = get_sandbox_roots()
+        now = time.time()
+        workspace_suspects: set[str] = set()
+        try:
+            entries = list(os.scandir(container_root))
+        except OSError as e:
+            log.warning(f"Cannot scan sandbox root {container_root}: {e}")
+            entries = []
+
+        for entry in entries:
+            if not entry.name.startswith(("tmp", STAGING_PREFIX)) or entry.name in mounted:
+                continue
+            try:
+                if not entry.is_dir(follow_symlinks=False):
+                    continue
+                old = now - entry.stat(follow_symlinks=False).st_mtime > ORPHAN_MIN_AGE_SECONDS
+            except OSError:
+                continue
+
+            if entry.name not in orphan_workspaces and not (old and entry.name in self._suspect_workspaces):
+                if old:
+                    workspace_suspects.add(entry.name)
+                continue
+
+            reclaimed["workspace_bytes"] += await asyncio.to_thread(_remove_tree, entry.path)
+            reclaimed["workspaces"] += 1
+
+        self._suspect_workspaces = workspace_suspects
+
+        self._containers += reclaimed["containers"]
+        self._workspaces += reclaimed["workspaces"]
+        self._bytes += reclaimed["workspace_bytes"]
+        if reclaimed["containers"] or reclaimed["workspaces"]:
+            log.info(
+                f"Orphan sweep reclaimed {reclaimed['containers']} containers and"
+                f" {reclaimed['workspaces']} workspaces ({reclaimed['workspace_bytes']} bytes)"
+            )
+        return reclaimed
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.sweep()
+            except Exception:
+                log.exception("Orphan sweep failed")
+            await asyncio.sleep(self.interval)
+
+
+_reaper: OrphanReaper | None = None
+
+
+def get_orphan_reaper() -> OrphanReaper | None:
+    return _reaper
+
+
+async def start_orphan_reaper(interval: float = ORPHAN_REAPER_INTERVAL_SECONDS) -> OrphanReaper:
+    global _reaper
+    if _reaper is None:
+        _reaper = OrphanReaper(interval)
+        await _reaper.start()
+    return _reaper
+
+
+async def stop_orphan_reaper() -> None:
+    global _reaper
+    if _reaper is not None:
+        await _reaper.stop()
+        _reaper = None
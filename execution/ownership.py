@@ -0,0 +1,40 @@
+"""
+Owner labels for the containers this service starts.
+
+Every container is labelled with the process that started it (WORKER_ID),
+the job it was started for, if any, and the workspace directory it mounts, so
+the orphan reaper (execution/orphans.py) can tell leftovers of crashed or
+killed processes from containers still in use.
+
+The job is taken from `current_job`, which worker.py sets while it runs a
+job.  Pooled containers and compile containers are started outside any job
+and carry only their owner.
+"""
+
+import os
+import socket
+from contextvars import ContextVar
+
+OWNER_LABEL = "judge.owner"
+JOB_LABEL = "judge.job"
+ROLE_LABEL = "judge.role"
+WORKSPACE_LABEL = "judge.workspace"   # directory name under the sandbox root
+
+ROLE_SANDBOX = "sandbox"
+ROLE_COMPILE_SERVER = "compile-server"
+ROLE_RAW = "raw"
+
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}"
+
+current_job: ContextVar[str | None] = ContextVar("current_job", default=None)
+
+
+def owner_labels(role: str, workspace: str | None = None) -> dict[str, str]:
+    labels = {OWNER_LABEL: WORKER_ID, ROLE_LABEL: role}
+    job_id = current_job.get()
+    # A compile container may be (re)started during a job but serves them all.
+    if job_id and role != ROLE_COMPILE_SERVER:
+        labels[JOB_LABEL] = job_id
+    if workspace:
+        labels[WORKSPACE_LABEL] = os.path.basename(workspace)
+    return labels
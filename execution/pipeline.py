@@ -1,21 +1,26 @@
 import os
-import shutil
 import tempfile
 import asyncio
+from contextlib import aclosing
 
 from execution.executor import ExecutorFactory
 from execution.exceptions import (
     CompileError,
     RuntimeExecutionError,
+    DockerError,
 )
+from execution.container_pool import sandbox_host_config
+from execution.cleanup import release_sandbox
+from execution.docker_client import get_docker
+from execution.ownership import ROLE_RAW, owner_labels
+from execution.workspace import TMPFS_WORKSPACES, workspace_tmpfs
 from execution.sandbox_paths import build_host_temp_dir, get_sandbox_roots
-from config.limits import (
-    DOCKER_MEMORY_LIMIT,
-    DOCKER_MEMORY_SWAP,
-    DOCKER_CPU_LIMIT,
-    DOCKER_PIDS_LIMIT,
-    DOCKER_NOFILE_LIMIT,
-)
+from execution import result_cache
+from config.limits import TEST_CONCURRENCY
+
+# Output is truncated to 10000 characters below; stop reading well past that
+# so a runaway program cannot make us buffer unbounded output.
+RAW_OUTPUT_LIMIT_BYTES = 64 * 1024
 
 
 class ExecutionPipeline:
@@ -44,8 +49,8 @@ class ExecutionPipeline:
             "kotlin": {"image": "java-sandbox:latest", "ext": ".kt", "cmd": ["sh", "-c", 'kotlinc main.kt -include-runtime -d main.jar && java -jar main.jar "$@"', "sh"]},
             "go": {"image": "go-sandbox:latest", "ext": ".go", "cmd": ["sh", "-c", 'go build -o main main.go && ./main "$@"', "sh"]},
             "rust": {"image": "rust-sandbox:latest", "ext": ".rs", "cmd": ["sh", "-c", 'rustc main.rs -o main && ./main "$@"', "sh"]},
-            "typescript": {"image": "js-sandbox:latest", "ext": ".ts", "cmd": ["sh", "-c", 'tsc main.ts && node main.js "$@"', "sh"]},
-            "csharp": {"image": "csharp-sandbox:latest", "ext": ".cs", "cmd": ["sh", "-c", 'echo \'<Project Sdk="Microsoft.NET.Sdk"><PropertyGroup><OutputType>Exe</OutputType><TargetFramework>net8.0</TargetFramework><ImplicitUsings>enable</ImplicitUsings><Nullable>disable</Nullable></PropertyGroup></Project>\' > main.csproj && dotnet run -- "$@"', "sh"]},
+            "typescript": {"image": "js-sandbox:latest", "ext": ".ts", "cmd": ["sh", "-c", 'esbuild main.ts --outfile=main.js --format=cjs --platform=node --log-level=warning && node main.js "$@"', "sh"]},
+            "csharp": {"image": "csharp-sandbox:latest", "ext": ".cs", "cmd": ["sh", "-c", 'dotnet /opt/csharp/roslyn/csc.dll -nologo -noconfig -optimize+ -nullable:disable @/opt/csharp/references.rsp -out:main.dll main.cs /opt/csharp/GlobalUsings.cs >&2 && dotnet exec --runtimeconfig /opt/csharp/sandbox.runtimeconfig.json main.dll "$@"', "sh"]},
         }
 
         config = LANG_CONFIG[language]
@@ -57,49 +62,114 @@ class ExecutionPipeline:
         with open(file_path, "w") as f:
             f.write(source_code)
 
-        run_cmd = [
-            "docker", "run", "-i", "--rm",
-            "--memory", DOCKER_MEMORY_LIMIT,
-            "--memory-swap", DOCKER_MEMORY_SWAP,
-            "--cpus", DOCKER_CPU_LIMIT,
-            "--pids-limit", DOCKER_PIDS_LIMIT,
-            "--ulimit", f"nofile={DOCKER_NOFILE_LIMIT}:{DOCKER_NOFILE_LIMIT}",
-            "--network", "none",
-            "--cap-drop", "ALL",
-            "--security-opt", "no-new-privileges",
-            "-v", f"{host_temp_dir}:/app",
-            "-w", "/app",
-            config["image"]
-        ] + config["cmd"] + args
-
-        proc = await asyncio.create_subprocess_exec(
-            *run_cmd,
-            stdin=asyncio.subprocess.PIPE if stdin else None,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
+        cmd = config["cmd"] + args
+        host_config = sandbox_host_config(host_temp_dir, auto_remove=False)
+        if TMPFS_WORKSPACES:
+            # There is no exec before the program starts to stream the source
+            # in, so it is copied once from a read-only bind; compiling and
+            # running then happen in the tmpfs.
+            host_config = sandbox_host_config(
+                host_temp_dir, auto_remove=False, mount="/src:ro", tmpfs=workspace_tmpfs(),
+            )
+            cmd = ["sh", "-c", 'cp -R /src/. /app && exec "$@"', "sh", *cmd]
 
         try:
-            input_bytes = stdin.encode('utf-8') if stdin else None
-            stdout, stderr = await asyncio.wait_for(proc.communicate(input=input_bytes), timeout=30)
+            result = await get_docker().run(
+                config["image"],
+                cmd,
+                host_config,
+                stdin=stdin.encode('utf-8') if stdin else None,
+                timeout=30,
+                limit=RAW_OUTPUT_LIMIT_BYTES,
+                labels=owner_labels(ROLE_RAW, temp_dir),
+            )
         except asyncio.TimeoutError:
-            proc.kill()
-            await proc.wait()
-            shutil.rmtree(temp_dir, ignore_errors=True)
+            await release_sandbox(None, temp_dir)
             return {"stdout": "", "stderr": "Execution timed out", "exit_code": 124}
+        except DockerError as e:
+            await release_sandbox(None, temp_dir)
+            return {"stdout": "", "stderr": str(e), "exit_code": 125}
 
-        shutil.rmtree(temp_dir, ignore_errors=True)
+        await release_sandbox(None, temp_dir)
 
         return {
-            "stdout": stdout.decode(errors='replace')[:10000],
-            "stderr": stderr.decode(errors='replace')[:10000],
-            "exit_code": proc.returncode
+            "stdout": result.stdout.decode(errors='replace')[:10000],
+            "stderr": result.stderr.decode(errors='replace')[:10000],
+            "exit_code": result.exit_code if result.exit_code is not None else 137,
         }
 
+    async def _judge(self, test_cases: list[dict], cached: dict) -> tuple[dict, dict]:
+        """Run the uncached tests; the verdict and the outputs produced here."""
+        missing = [index for index in range(len(test_cases)) if index not in cached]
+        actual_outputs = []
+        fresh_outputs = {}
+
+        # Only the uncached test cases are streamed through the executor's
+        # harness; leaving the loop early closes it so no further tests
+        # are run.  In parallel mode outputs still arrive in test order,
+        # so the first failure reported here is the lowest-index one.
+        outputs = self.executor.run_tests(
+            [test_cases[index]["input"] for index in missing],
+            concurrency=TEST_CONCURRENCY.get(self.request["language"], 1),
+            check=lambda i, output: output == test_cases[missing[i]]["expected_output"],
+        )
+        async with aclosing(outputs):
+            try:
+                for index, tc in enumerate(test_cases):
+                    if index in cached:
+                        output = cached[index]
+                    else:
+                        output = await anext(outputs)
+                        fresh_outputs[index] = output
+
+                    if output != tc["expected_output"]:
+                        return {
+                            "verdict": "wrong_answer",
+                            "failed_test_case_index": index,
+                            "actual_output": output,
+                            "expected_output": tc["expected_output"],
+                        }, fresh_outputs
+
+                    actual_outputs.append(output)
+
+            except RuntimeExecutionError as e:
+                return {
+                    "verdict": "runtime_error",
+                    "failed_test_case_index": len(actual_outputs),
+                    "error_message": str(e),
+                }, fresh_outputs
+
+        return {
+            "verdict": "accepted",
+            "actual_outputs": actual_outputs,
+        }, fresh_outputs
+
     async def execute(self) -> dict:
         if self.is_raw:
             return await self._execute_raw()
 
+        test_cases = self.request["test_cases"]
+        cached = await result_cache.load_outputs(self.request) if result_cache.is_enabled() else {}
+
+        # Judge the leading cached tests first: a failure there (or a fully
+        # cached submission) needs no container at all.
+        if cached:
+            for index, tc in enumerate(test_cases):
+                if index not in cached:
+                    break
+                if cached[index] != tc["expected_output"]:
+                    return {
+                        "verdict": "wrong_answer",
+                        "failed_test_case_index": index,
+                        "actual_output": cached[index],
+                        "expected_output": tc["expected_output"],
+                    }
+            else:
+                return {
+                    "verdict": "accepted",
+                    "actual_outputs": [cached[index] for index in range(len(test_cases))],
+                }
+
         try:
             self.executor = ExecutorFactory.get_executor(
                 self.request["language"],
@@ -115,38 +185,32 @@ class ExecutionPipeline:
                     "error_message": str(e),
                 }
 
-            actual_outputs = []
-            for index, tc in enumerate(self.request["test_cases"]):
-                try:
-                    output = await self.executor.run(tc["input"])
-                except RuntimeExecutionError as e:
-                    return {
-                        "verdict": "runtime_error",
-                        "failed_test_case_index": index,
-                        "error_message": str(e),
-                    }
+            verdict, fresh_outputs = await self._judge(test_cases, cached)
 
-                if output != tc["expected_output"]:
-                    return {
-                        "verdict": "wrong_answer",
-                        "failed_test_case_index": index,
-                        "actual_output": output,
-                        "expected_output": tc["expected_output"],
-                    }
+            # Checks compile() left running alongside the tests (the
+            # TypeScript type check) overrule whatever the tests decided, and
+            # outputs of a submission that fails them are not memoized.
+            try:
+                await self.executor.verify()
+            except (CompileError, RuntimeExecutionError) as e:
+                return {
+                    "verdict": "compilation_error",
+                    "error_message": str(e),
+                }
 
-                actual_outputs.append(output)
+            if fresh_outputs and result_cache.is_enabled():
+                await result_cache.store_outputs(self.request, fresh_outputs)
 
-            return {
-                "verdict": "accepted",
-                "actual_outputs": actual_outputs,
-            }
+            return verdict
 
         finally:
             if self.executor:
                 import asyncio
                 try:
                     # Run cleanup shielded so that even if the request/worker cancels,
-                    # the docker rm -f command finishes successfully in the background.
+                    # the sandbox is still released.  On workers this only queues
+                    # the docker rm -f for the cleanup reaper (execution/cleanup.py),
+                    # so the verdict is not held up by it.
                     await asyncio.shield(self.executor.cleanup())
                 except asyncio.CancelledError:
                     pass
@@ -0,0 +1,150 @@
+"""
+Memoized per-test outputs for identical executions (opt-in).
+
+Graders re-running reference code, client retries and load tests send the
+same (language, source, function, input) over and over.  When
+RESULT_CACHE_ENABLED=1, ExecutionPipeline stores the output of every test
+that ran successfully under a hash of exactly those four values and, on the
+next identical submission, only runs the tests that are not cached.  A
+submission whose tests are all cached is judged without touching Docker.
+
+Only successful outputs are cached: runtime errors and timeouts are run
+again.  Expected outputs are not part of the key, so a cached output is
+reused whatever the test case expects.
+
+Input dicts are hashed in their given key order because the wrappers pass
+arguments positionally; {"a": 1, "b": 2} and {"b": 2, "a": 1} are
+different executions.
+
+Memory is bounded by a TTL on every entry plus a byte budget: stored bytes
+are counted in time buckets that expire with the entries they account for,
+and nothing new is cached while the live buckets add up to
+RESULT_CACHE_MAX_BYTES.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any
+
+import redis.exceptions
+
+from config.limits import (
+    RESULT_CACHE_TTL_SECONDS,
+    RESULT_CACHE_MAX_BYTES,
+    RESULT_CACHE_MAX_ENTRY_BYTES,
+    RESULT_CACHE_BUDGET_BUCKETS,
+)
+from jobqueue.redis_client import get_redis
+
+log = logging.getLogger(__name__)
+
+# Bump when a wrapper change can alter the output produced for the same input.
+RESULT_CACHE_VERSION = 1
+
+KEY_PREFIX = "exec:memo:"
+BUDGET_PREFIX = "exec:memo:bytes:"
+
+_REDIS_ERRORS = (redis.exceptions.RedisError, OSError)
+
+# KEYS: the live budget buckets, newest last.  Checks and charges the budget
+# in one step, so concurrent stores cannot overshoot it.
+_RESERVE_SCRIPT = """
+local used = 0
+for _, value in ipairs(redis.call('MGET', unpack(KEYS))) do
+    if value then
+        used = used + tonumber(value)
+    end
+end
+if used + tonumber(ARGV[1]) > tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('INCRBY', KEYS[#KEYS], ARGV[1])
+redis.call('EXPIRE', KEYS[#KEYS], ARGV[3])
+return 1
+"""
+
+
+def is_enabled() -> bool:
+    return os.getenv("RESULT_CACHE_ENABLED", "0") == "1"
+
+
+def test_key(language: str, source_code: str, function_name: str, test_input: Any) -> str:
+    material = json.dumps(
+        [RESULT_CACHE_VERSION, language, source_code, function_name, test_input],
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return KEY_PREFIX + hashlib.sha256(material.encode()).hexdigest()
+
+
+def _keys(request: dict) -> list[str]:
+    return [
+        test_key(request["language"], request["source_code"], request["function_name"], tc["input"])
+        for tc in request["test_cases"]
+    ]
+
+
+async def load_outputs(request: dict) -> dict[int, Any]:
+    """Cached outputs by test index; empty when nothing is cached or Redis is down."""
+    try:
+        values = await get_redis().mget(_keys(request))
+    except _REDIS_ERRORS as e:
+        log.warning(f"Result cache lookup failed: {e}")
+        return {}
+
+    return {
+        index: json.loads(value)["output"]
+        for index, value in enumerate(values)
+        if value is not None
+    }
+
+
+async def store_outputs(request: dict, outputs: dict[int, Any]) -> None:
+    if not outputs:
+        return
+
+    keys = _keys(request)
+    entries = {}
+    for index, output in outputs.items():
+        value = json.dumps({"output": output}, separators=(",", ":"))
+        if len(value) <= RESULT_CACHE_MAX_ENTRY_BYTES:
+            entries[keys[index]] = value
+
+    if not entries:
+        return
+
+    try:
+        r = get_redis()
+        size = sum(len(key) + len(value) for key, value in entries.items())
+        if not await _reserve(r, size):
+            return
+
+        pipe = r.pipeline()
+        for key, value in entries.items():
+            pipe.set(key, value, ex=RESULT_CACHE_TTL_SECONDS)
+        await pipe.execute()
+    except _REDIS_ERRORS as e:
+        log.warning(f"Result cache store failed: {e}")
+
+
+async def _reserve(r, size: int) -> bool:
+    width = max(1, RESULT_CACHE_TTL_SECONDS // RESULT_CACHE_BUDGET_BUCKETS)
+    current = int(time.time()) // width
+    buckets = [
+        f"{BUDGET_PREFIX}{bucket}"
+        for bucket in range(current - RESULT_CACHE_BUDGET_BUCKETS, current + 1)
+    ]
+
+    # A bucket outlives the newest entry it accounts for by at most one width.
+    reserved = await r.eval(
+        _RESERVE_SCRIPT,
+        len(buckets),
+        *buckets,
+        size,
+        RESULT_CACHE_MAX_BYTES,
+        RESULT_CACHE_TTL_SECONDS + width,
+    )
+    return reserved == 1
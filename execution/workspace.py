@@ -0,0 +1,104 @@
+"""
+tmpfs sandbox workspaces.
+
+By default a sandbox's /app is its workspace directory under the sandbox root,
+bind-mounted from HOST_SANDBOX_ROOT, so every file the compiler or a test
+touches goes through that mount — on Docker Desktop a slow host share.  With
+SANDBOX_WORKSPACE=tmpfs the sandbox instead gets a tmpfs /app of
+SANDBOX_TMPFS_SIZE and the workspace directory is only a staging area:
+executors write sources (and restore cached artifacts) there as before, then
+upload_workspace() streams it into /app as a tar on the stdin of a `tar -x`
+exec (the archive API cannot write into tmpfs mounts), and
+download_workspace() brings built artifacts back out for the artifact cache.
+
+Compile servers compile a copy of the staging directory (see
+CompileServer.staged()); what they produce is uploaded like the sources.
+"""
+
+import asyncio
+import io
+import logging
+import os
+import tarfile
+
+from config.limits import DOCKER_API_TIMEOUT_SECONDS, SANDBOX_TMPFS_SIZE
+from execution.docker_client import get_docker
+from execution.exceptions import RuntimeExecutionError
+
+log = logging.getLogger(__name__)
+
+TMPFS_WORKSPACES = os.getenv("SANDBOX_WORKSPACE", "bind") == "tmpfs"
+
+WORKSPACE_MOUNT = "/app"
+
+
+def workspace_tmpfs() -> dict[str, str]:
+    """HostConfig.Tmpfs for a sandbox's /app; exec, unlike Docker's default."""
+    return {WORKSPACE_MOUNT: f"rw,exec,nosuid,nodev,size={SANDBOX_TMPFS_SIZE},mode=1777"}
+
+
+def _pack(workspace: str) -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        for name in sorted(os.listdir(workspace)):
+            tar.add(os.path.join(workspace, name), arcname=name)
+    return buffer.getvalue()
+
+
+def _unpack(data: bytes, workspace: str) -> None:
+    # The archive comes out of the sandbox: no links or paths leaving `workspace`.
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        tar.extractall(workspace, filter="data")
+
+
+async def upload_workspace(container_id: str, workspace: str) -> None:
+    """Copy the staging `workspace` into the sandbox's tmpfs /app; no-op with bind mounts."""
+    if not TMPFS_WORKSPACES:
+        return
+
+    try:
+        result = await get_docker().exec(
+            container_id,
+            ["tar", "-x", "-f", "-", "-C", WORKSPACE_MOUNT],
+            stdin=_pack(workspace),
+            timeout=DOCKER_API_TIMEOUT_SECONDS,
+        )
+    except asyncio.TimeoutError:
+        raise RuntimeExecutionError("Timed out copying the workspace into the container")
+
+    if result.exit_code != 0:
+        log.warning(f"Upload to {container_id[:12]} failed: {result.stderr.decode(errors='replace').strip()}")
+        raise RuntimeExecutionError("Failed to copy the workspace into the container")
+
+
+async def download_workspace(container_id: str, workspace: str, patterns: list[str]) -> None:
+    """
+    Copy the files in the sandbox's tmpfs /app matching the glob `patterns`
+    (trusted names, as in an executor's ARTIFACTS) into the staging
+    `workspace`.  A failure only means the build is not cached, so it is
+    logged rather than raised.
+    """
+    if not TMPFS_WORKSPACES or not patterns:
+        return
+
+    try:
+        # Unmatched patterns make tar complain but still archive the rest;
+        # the tmpfs size bounds the output.
+        result = await get_docker().exec(
+            container_id,
+            ["sh", "-c", f"exec tar -c -f - -- {' '.join(patterns)} 2>/dev/null"],
+            workdir=WORKSPACE_MOUNT,
+            timeout=DOCKER_API_TIMEOUT_SECONDS,
+        )
+    except asyncio.TimeoutError:
+        log.warning(f"Timed out copying artifacts out of {container_id[:12]}")
+        return
+
+    if not result.stdout:
+        log.warning(f"Could not copy artifacts out of {container_id[:12]}")
+        return
+
+    try:
+        _unpack(result.stdout, workspace)
+    except (tarfile.TarError, OSError) as e:
+        log.warning(f"Could not unpack artifacts of {container_id[:12]}: {e}")
@@ -1,59 +1,284 @@
+import hashlib
 import json
+import os
 import time
 import uuid
 
+import redis.exceptions
+
 from jobqueue.redis_client import get_redis
 
+# Jobs are routed to one queue per language (exec:queue:<language>, or
+# exec:stream:<language> with the stream transport) so that workers can
+# prefer the languages they are warm for.  QUEUE_KEY / STREAM_KEY are the
+# queues used before routing existed; workers still drain them last.
 QUEUE_KEY = "exec:queue"
 JOB_PREFIX = "exec:job:"
+RESULT_CHANNEL = "exec:results"  # mark_done publishes finished job ids here
+
+# API processes from before the pub/sub results (jobqueue/results.py) BLPOP
+# one copy of the result per waiter they counted from exec:job:result:<id>;
+# mark_done still pushes those, for them to survive a rolling deploy.  Drop
+# with the next release.
+LEGACY_RESULT_PREFIX = "exec:job:result:"
+LEGACY_WAITERS_PREFIX = "exec:job:waiters:"
+LEGACY_RESULT_TTL = 60   # seconds; old waiters block before their job can finish
+
+# QUEUE_TRANSPORT=stream moves jobs to a Redis stream read by a consumer
+# group: a job stays pending (leased to one worker) until that worker acks
+# it, and a job whose lease is not renewed for STREAM_LEASE_SECONDS — its
+# worker died — is claimed by another worker.  Stream-mode workers also
+# drain the list queues, so a list deployment migrates by switching the
+# workers first and the API second.
+STREAM_TRANSPORT = os.getenv("QUEUE_TRANSPORT", "list") == "stream"
+STREAM_KEY = "exec:stream"
+STREAM_GROUP = "workers"
+STREAM_LEASE_SECONDS = 60     # workers renew the lease of running jobs every third of this
+STREAM_MAX_DELIVERIES = 3     # a job that keeps killing its worker is failed after this many
+
+# Every worker keeps exec:worker:<id> alive while it runs; the orphan reaper
+# (execution/orphans.py) takes containers whose owner's key has expired for
+# leftovers of a dead process.
+WORKER_PREFIX = "exec:worker:"
+WORKER_HEARTBEAT_SECONDS = 10
+WORKER_HEARTBEAT_TTL = 3 * WORKER_HEARTBEAT_SECONDS
+
+# Workers publish their container pool's stats (per-image sizes, hits/misses,
+# refill latency) with every heartbeat, one field per worker; GET /health
+# reports those not older than a heartbeat's TTL.
+POOL_STATS_KEY = "exec:pool_stats"
 
 RESULT_TTL = 3600     # seconds — clients have 1 hour to poll before result expires
 JOB_MAX_AGE = 3600    # seconds — strictly matches API timeout to prevent execution of abandoned jobs
-MAX_QUEUE_DEPTH = 10_000  # refuse new jobs above this; keeps memory bounded
+MAX_QUEUE_DEPTH = 10_000  # per language queue; refuse new jobs above this to keep memory bounded
+COALESCE_TTL = JOB_MAX_AGE  # identical submissions attach to a queued job at most this long
 
 
-async def enqueue(payload: dict) -> str:
-    r = get_redis()
+# Identical submissions (same payload, or same client Idempotency-Key) that
+# arrive while a job is queued or running attach to that job instead of
+# creating a new one, and wait for its result like the first request (see
+# jobqueue/results.py).
+#
+# The content index exec:dedup:<payload hash> holds the job id only while the
+# job is live: COALESCE_TTL while it is queued, then DEDUP_LEASE_SECONDS that
+# its worker renews while running it, so a job whose worker died stops
+# attaching new submissions within a lease.  It is dropped when the job
+# finishes (or expires in the queue).  An idempotency key holds
+# {"job": id, "content": content index} and attaches while that index still
+# points at the job, or once the job is done, for as long as the result lives
+# so a retry after completion still gets the same answer.
+#
+# The content index is recorded in the job so the worker can maintain it.
+# Every key a script touches is passed in KEYS: enqueue() reads the job an
+# idempotency key points at first, and the script reports 'moved' if it
+# changed meanwhile.
+DEDUP_PREFIX = "exec:dedup:"
+IDEMPOTENCY_PREFIX = "exec:idem:"
+DEDUP_LEASE_SECONDS = WORKER_HEARTBEAT_TTL   # renewed every WORKER_HEARTBEAT_SECONDS
 
-    depth = await r.llen(QUEUE_KEY)
-    if depth >= MAX_QUEUE_DEPTH:
-        raise OverflowError("Queue at capacity")
+# KEYS: queue, content index, idempotency key, new job, job of the
+# idempotency key as read by enqueue() (ARGV[9]).
+_ENQUEUE_SCRIPT = """
+local job_id = ARGV[1]
+
+if ARGV[6] == '1' then
+    local ok, idem = pcall(cjson.decode, redis.call('GET', KEYS[3]) or 'null')
+    if not ok or type(idem) ~= 'table' then
+        idem = nil
+    end
+    if (idem and idem.job or '') ~= ARGV[9] then
+        return {'moved'}
+    end
+    if idem then
+        if idem.content ~= KEYS[2] then
+            return {'mismatch', idem.job}
+        end
+        local state = redis.call('GET', KEYS[5])
+        if redis.call('GET', KEYS[2]) == idem.job or (state and cjson.decode(state).status == 'done') then
+            return {'attached', idem.job}
+        end
+    end
+end
+
+local existing = redis.call('GET', KEYS[2])
+if existing then
+    if ARGV[6] == '1' then
+        redis.call('SET', KEYS[3], cjson.encode({job = existing, content = KEYS[2]}), 'EX', ARGV[4])
+    end
+    return {'attached', existing}
+end
+
+local stream = ARGV[7] == 'stream'
+local depth = stream and redis.call('XLEN', KEYS[1]) or redis.call('LLEN', KEYS[1])
+if depth >= tonumber(ARGV[5]) then
+    return {'full'}
+end
+
+if stream then
+    redis.call('XADD', KEYS[1], '*', 'job', ARGV[2])
+else
+    redis.call('LPUSH', KEYS[1], ARGV[2])
+end
+redis.call('SET', KEYS[4], ARGV[3], 'EX', ARGV[4])
+redis.call('SET', KEYS[2], job_id, 'EX', ARGV[8])
+if ARGV[6] == '1' then
+    redis.call('SET', KEYS[3], cjson.encode({job = job_id, content = KEYS[2]}), 'EX', ARGV[4])
+end
+return {'created', job_id}
+"""
+
+# KEYS: job, content index.
+_MARK_RUNNING_SCRIPT = """
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+if redis.call('GET', KEYS[2]) == ARGV[3] then
+    redis.call('EXPIRE', KEYS[2], ARGV[4])
+end
+"""
+
+_RENEW_DEDUP_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+"""
+
+# KEYS: job, content index, legacy result list, legacy waiter count.
+_MARK_DONE_SCRIPT = """
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+redis.call('PUBLISH', ARGV[4], ARGV[3])
+
+if redis.call('GET', KEYS[2]) == ARGV[3] then
+    redis.call('DEL', KEYS[2])
+end
+
+local waiters = tonumber(redis.call('GET', KEYS[4]) or '1')
+for _ = 1, waiters do
+    redis.call('LPUSH', KEYS[3], ARGV[5])
+end
+redis.call('EXPIRE', KEYS[3], ARGV[6])
+redis.call('DEL', KEYS[4])
+"""
+
+
+def _idempotent_job(value: str | None) -> str:
+    """The job an idempotency key's value points at; "" for none (or an old format)."""
+    try:
+        return json.loads(value)["job"]
+    except (TypeError, ValueError, KeyError):
+        return ""
+
+
+def _content_key(payload: dict) -> str:
+    # Key order is kept: wrappers pass test inputs positionally.
+    material = json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+    return DEDUP_PREFIX + hashlib.sha256(material.encode()).hexdigest()
+
+
+def list_queue_key(language: str) -> str:
+    return f"{QUEUE_KEY}:{language}"
+
+
+def stream_key(language: str) -> str:
+    return f"{STREAM_KEY}:{language}"
+
+
+def job_queue_key(language: str) -> str:
+    """The queue new jobs for `language` go to under the configured transport."""
+    return stream_key(language) if STREAM_TRANSPORT else list_queue_key(language)
+
+
+async def enqueue(payload: dict, idempotency_key: str | None = None) -> str:
+    """
+    Queue a job, or return the id of an in-flight job it coalesces with.
+
+    Raises OverflowError when the queue is full and ValueError when
+    `idempotency_key` was already used for a different payload.
+    """
+    r = get_redis()
 
     job_id = str(uuid.uuid4())
+    dedup_key = _content_key(payload)
+    idem_key = IDEMPOTENCY_PREFIX + hashlib.sha256(idempotency_key.encode()).hexdigest() \
+        if idempotency_key else ""
     job = {
         "job_id": job_id,
         "payload": payload,
         "enqueued_at": time.time(),
+        "dedup_key": dedup_key,
     }
 
-    pipe = r.pipeline()
-    pipe.lpush(QUEUE_KEY, json.dumps(job))
-    pipe.set(f"{JOB_PREFIX}{job_id}", json.dumps({"status": "queued"}), ex=RESULT_TTL)
-    await pipe.execute()
+    while True:
+        idem_job = _idempotent_job(await r.get(idem_key)) if idem_key else ""
+        outcome, *rest = await r.eval(
+            _ENQUEUE_SCRIPT,
+            5,
+            job_queue_key(payload["language"]),
+            dedup_key,
+            idem_key or IDEMPOTENCY_PREFIX,
+            f"{JOB_PREFIX}{job_id}",
+            f"{JOB_PREFIX}{idem_job}",
+            job_id,
+            json.dumps(job),
+            json.dumps({"status": "queued"}),
+            RESULT_TTL,
+            MAX_QUEUE_DEPTH,
+            "1" if idem_key else "0",
+            "stream" if STREAM_TRANSPORT else "list",
+            COALESCE_TTL,
+            idem_job,
+        )
+        if outcome != "moved":
+            break
+
+    if outcome == "full":
+        raise OverflowError("Queue at capacity")
+    if outcome == "mismatch":
+        raise ValueError("Idempotency-Key was already used for a different request")
+
+    return rest[0]
+
 
-    return job_id
+def _dedup_key(job: dict) -> str:
+    # A placeholder for jobs queued without one; nothing is stored there.
+    return job.get("dedup_key") or DEDUP_PREFIX
 
 
-async def mark_running(job_id: str) -> None:
+async def mark_running(job: dict) -> None:
+    """Mark `job` running; from now on its content index lives on renew_dedup()'s lease."""
     r = get_redis()
-    await r.set(
-        f"{JOB_PREFIX}{job_id}",
+    await r.eval(
+        _MARK_RUNNING_SCRIPT,
+        2,
+        f"{JOB_PREFIX}{job['job_id']}",
+        _dedup_key(job),
         json.dumps({"status": "running"}),
-        ex=RESULT_TTL,
+        RESULT_TTL,
+        job["job_id"],
+        DEDUP_LEASE_SECONDS,
     )
 
 
-async def mark_done(job_id: str, result: dict) -> None:
+async def renew_dedup(job: dict) -> None:
+    """Extend the lease of a running job's content index."""
     r = get_redis()
-    pipe = r.pipeline()
-    pipe.set(
-        f"{JOB_PREFIX}{job_id}",
+    await r.eval(_RENEW_DEDUP_SCRIPT, 1, _dedup_key(job), job["job_id"], DEDUP_LEASE_SECONDS)
+
+
+async def mark_done(job: dict, result: dict) -> None:
+    r = get_redis()
+    await r.eval(
+        _MARK_DONE_SCRIPT,
+        4,
+        f"{JOB_PREFIX}{job['job_id']}",
+        _dedup_key(job),
+        f"{LEGACY_RESULT_PREFIX}{job['job_id']}",
+        f"{LEGACY_WAITERS_PREFIX}{job['job_id']}",
         json.dumps({"status": "done", "result": result}),
-        ex=RESULT_TTL,
+        RESULT_TTL,
+        job["job_id"],
+        RESULT_CHANNEL,
+        json.dumps(result),
+        LEGACY_RESULT_TTL,
     )
-    pipe.lpush(f"{JOB_PREFIX}result:{job_id}", json.dumps(result))
-    pipe.expire(f"{JOB_PREFIX}result:{job_id}", RESULT_TTL)
-    await pipe.execute()
 
 
 async def get_job_status(job_id: str) -> dict | None:
@@ -64,15 +289,206 @@ async def get_job_status(job_id: str) -> dict | None:
     return json.loads(val)
 
 
-async def wait_for_job_result(job_id: str, timeout: int) -> dict | None:
+async def queue_depths(languages: list[str]) -> dict[str, int]:
+    """
+    Waiting jobs per language, across both transports; jobs still in the
+    pre-routing queues are reported as "unrouted".  Acked stream entries are
+    deleted, so a stream holds unread and leased jobs.
+    """
     r = get_redis()
-    res = await r.blpop(f"{JOB_PREFIX}result:{job_id}", timeout=timeout)
-    if not res:
-        return None
-    _, val = res
-    return json.loads(val)
+    pipe = r.pipeline()
+    for language in languages:
+        pipe.llen(list_queue_key(language))
+        pipe.xlen(stream_key(language))
+    pipe.llen(QUEUE_KEY)
+    pipe.xlen(STREAM_KEY)
+    counts = await pipe.execute()
+
+    depths = {
+        language: counts[2 * i] + counts[2 * i + 1]
+        for i, language in enumerate(languages)
+    }
+    depths["unrouted"] = counts[-2] + counts[-1]
+    return depths
+
+
+# ---------------------------------------------------------------------------
+# Stream transport (worker side)
+#
+# Stream entries are identified by (stream key, entry id).
+# ---------------------------------------------------------------------------
+
+async def ensure_stream_groups(streams: list[str]) -> None:
+    r = get_redis()
+    for stream in streams:
+        try:
+            await r.xgroup_create(stream, STREAM_GROUP, id="0", mkstream=True)
+        except redis.exceptions.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+
+async def read_jobs(
+    consumer: str,
+    streams: list[str],
+    count: int,
+    block_ms: int,
+) -> list[tuple[tuple[str, str], str]]:
+    """
+    Lease up to `count` new jobs to `consumer`, taking from `streams` in the
+    given order of preference; ((stream, entry id), job data) pairs.
+
+    If all streams are empty, block for the first job on any of them.  That
+    read can return one job per stream at once, i.e. more than `count`.
+    """
+    r = get_redis()
+    jobs = []
+
+    for stream in streams:
+        if len(jobs) >= count:
+            break
+        res = await r.xreadgroup(
+            STREAM_GROUP, consumer, {stream: ">"}, count=count - len(jobs),
+        )
+        jobs += _entries(res)
+
+    if not jobs:
+        res = await r.xreadgroup(
+            STREAM_GROUP, consumer, {stream: ">" for stream in streams},
+            count=1, block=block_ms,
+        )
+        jobs += _entries(res)
+
+    return jobs
+
+
+def _entries(res) -> list[tuple[tuple[str, str], str]]:
+    return [
+        ((stream, entry_id), fields["job"])
+        for stream, entries in res or []
+        for entry_id, fields in entries
+    ]
+
+
+async def claim_stalled_jobs(
+    consumer: str,
+    streams: list[str],
+    count: int,
+) -> list[tuple[tuple[str, str], str, int]]:
+    """
+    Take over jobs whose lease expired; ((stream, entry id), job data, deliveries).
+
+    Entries deleted from the stream while pending are acked and skipped.
+    """
+    r = get_redis()
+    claimed = []
+
+    for stream in streams:
+        if len(claimed) >= count:
+            break
+        res = await r.xautoclaim(
+            stream, STREAM_GROUP, consumer,
+            min_idle_time=STREAM_LEASE_SECONDS * 1000, start_id="0-0",
+            count=count - len(claimed),
+        )
+        for entry_id, fields in res[1]:
+            if not fields:
+                await r.xack(stream, STREAM_GROUP, entry_id)
+                continue
+            pending = await r.xpending_range(
+                stream, STREAM_GROUP, min=entry_id, max=entry_id, count=1,
+            )
+            deliveries = pending[0]["times_delivered"] if pending else 1
+            claimed.append(((stream, entry_id), fields["job"], deliveries))
+
+    return claimed
+
+
+async def renew_lease(consumer: str, entry: tuple[str, str]) -> None:
+    # Re-claiming an entry for ourselves resets its idle time.
+    stream, entry_id = entry
+    await get_redis().xclaim(
+        stream, STREAM_GROUP, consumer, min_idle_time=0,
+        message_ids=[entry_id], justid=True,
+    )
+
+
+async def ack_job(entry: tuple[str, str]) -> None:
+    stream, entry_id = entry
+    r = get_redis()
+    pipe = r.pipeline()
+    pipe.xack(stream, STREAM_GROUP, entry_id)
+    pipe.xdel(stream, entry_id)
+    await pipe.execute()
+
+
+async def prune_consumers(streams: list[str], max_idle_seconds: int) -> None:
+    """Forget consumers (exited workers) with nothing pending."""
+    r = get_redis()
+    for stream in streams:
+        for info in await r.xinfo_consumers(stream, STREAM_GROUP):
+            if info["pending"] == 0 and info["idle"] > max_idle_seconds * 1000:
+                await r.xgroup_delconsumer(stream, STREAM_GROUP, info["name"])
+
+
+async def pop_list_jobs(keys: list[str], count: int) -> list[str]:
+    """Non-blocking pop of up to `count` jobs from list queues, in order."""
+    r = get_redis()
+    jobs = []
+    for key in keys:
+        if len(jobs) >= count:
+            break
+        jobs += await r.rpop(key, count - len(jobs)) or []
+    return jobs
+
+
+async def heartbeat_worker(worker_id: str) -> None:
+    r = get_redis()
+    await r.set(f"{WORKER_PREFIX}{worker_id}", int(time.time()), ex=WORKER_HEARTBEAT_TTL)
+
+
+async def live_workers(worker_ids: list[str]) -> set[str]:
+    """The workers among `worker_ids` whose heartbeat has not expired."""
+    if not worker_ids:
+        return set()
+    r = get_redis()
+    values = await r.mget([f"{WORKER_PREFIX}{worker_id}" for worker_id in worker_ids])
+    return {worker_id for worker_id, value in zip(worker_ids, values) if value is not None}
+
+
+async def live_jobs(job_ids: list[str]) -> set[str]:
+    """The jobs among `job_ids` that are still queued or running."""
+    if not job_ids:
+        return set()
+    r = get_redis()
+    values = await r.mget([f"{JOB_PREFIX}{job_id}" for job_id in job_ids])
+    return {
+        job_id
+        for job_id, value in zip(job_ids, values)
+        if value is not None and json.loads(value).get("status") != "done"
+    }
+
+
+async def publish_pool_stats(worker_id: str, stats: dict) -> None:
+    r = get_redis()
+    await r.hset(POOL_STATS_KEY, worker_id, json.dumps({"at": time.time(), "stats": stats}))
+
+
+async def withdraw_pool_stats(worker_id: str) -> None:
+    r = get_redis()
+    await r.hdel(POOL_STATS_KEY, worker_id)
 
 
-async def queue_depth() -> int:
+async def pool_stats() -> dict[str, dict]:
+    """Container pool stats per live worker; entries of dead workers are dropped."""
     r = get_redis()
-    return await r.llen(QUEUE_KEY)
+    fresh, stale = {}, []
+    for worker_id, value in (await r.hgetall(POOL_STATS_KEY)).items():
+        entry = json.loads(value)
+        if time.time() - entry["at"] > WORKER_HEARTBEAT_TTL:
+            stale.append(worker_id)
+        else:
+            fresh[worker_id] = entry["stats"]
+    if stale:
+        await r.hdel(POOL_STATS_KEY, *stale)
+    return fresh
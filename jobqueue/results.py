@@ -0,0 +1,117 @@
+"""
+Result delivery to requests waiting on their job.
+
+mark_done publishes the id of every finished job on RESULT_CHANNEL.  Each API
+process keeps a single subscription and a map of job id -> futures of the
+requests waiting for that job; a completion for a job someone here waits on
+is resolved with one status read.  Thousands of waiting requests therefore
+cost one pub/sub connection and a few pooled ones, instead of one blocking
+BLPOP connection each.
+
+Pub/sub drops messages published while the subscriber is disconnected, so
+after (re)subscribing, and every RECHECK_INTERVAL seconds, the status of all
+awaited jobs is re-read and finished ones are resolved.
+"""
+
+import asyncio
+import json
+import logging
+import time
+
+from jobqueue.job import JOB_PREFIX, RESULT_CHANNEL, get_job_status
+from jobqueue.redis_client import get_redis
+
+log = logging.getLogger(__name__)
+
+RECHECK_INTERVAL = 30   # seconds between status sweeps over all awaited jobs
+RECHECK_BATCH = 500     # job statuses read per MGET
+
+
+class ResultDispatcher:
+
+    def __init__(self):
+        self._waiters: dict[str, set[asyncio.Future]] = {}
+        self._task: asyncio.Task | None = None
+
+    async def wait(self, job_id: str, timeout: float) -> dict | None:
+        """The job's result, or None if it did not finish within `timeout`."""
+        self._start()
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(job_id, set()).add(future)
+        try:
+            # Registered before reading the status: a completion published
+            # after this read is delivered to the future, an earlier one
+            # (including jobs that finished before this request coalesced
+            # onto them) is seen here.
+            status = await get_job_status(job_id)
+            if status is not None and status["status"] == "done":
+                return status["result"]
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            waiters = self._waiters.get(job_id)
+            if waiters is not None:
+                waiters.discard(future)
+                if not waiters:
+                    del self._waiters[job_id]
+
+    def _start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(RESULT_CHANNEL)
+                await self._resolve(list(self._waiters))
+                last_recheck = time.monotonic()
+
+                while True:
+                    message = await pubsub.get_message(timeout=RECHECK_INTERVAL)
+                    if message is not None and message["data"] in self._waiters:
+                        await self._resolve([message["data"]])
+
+                    if time.monotonic() - last_recheck >= RECHECK_INTERVAL:
+                        await self._resolve(list(self._waiters))
+                        last_recheck = time.monotonic()
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning(f"Result subscription lost ({e!r}), resubscribing in 1s")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    async def _resolve(self, job_ids: list[str]) -> None:
+        r = get_redis()
+        for start in range(0, len(job_ids), RECHECK_BATCH):
+            batch = job_ids[start:start + RECHECK_BATCH]
+            values = await r.mget([f"{JOB_PREFIX}{job_id}" for job_id in batch])
+
+            for job_id, value in zip(batch, values):
+                if value is None:
+                    continue
+                status = json.loads(value)
+                if status["status"] != "done":
+                    continue
+                for future in self._waiters.get(job_id, ()):
+                    if not future.done():
+                        future.set_result(status["result"])
+
+
+_dispatcher: ResultDispatcher | None = None
+
+
+def get_result_dispatcher() -> ResultDispatcher:
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = ResultDispatcher()
+    return _dispatcher
+
+
+async def wait_for_job_result(job_id: str, timeout: int) -> dict | None:
+    return await get_result_dispatcher().wait(job_id, timeout)
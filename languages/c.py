@@ -1,8 +1,6 @@
 import asyncio
-import tempfile
 import os
 import json
-import shutil
 import re
 
 from execution.base import BaseExecutor
@@ -11,32 +9,37 @@ from execution.exceptions import (
     RuntimeExecutionError,
 )
 
-from execution.sandbox_paths import (
-    build_host_temp_dir,
-    get_sandbox_roots,
+from execution.container_pool import acquire_sandbox
+from execution.cleanup import release_sandbox
+from execution.workspace import download_workspace, upload_workspace
+from execution.docker_client import get_docker
+from execution.artifact_cache import (
+    artifact_key,
+    lookup_artifact,
+    restore_artifact,
+    store_artifact,
+    store_compile_error,
 )
 
 from config.limits import (
     EXECUTION_TIMEOUT_SECONDS,
     COMPILATION_TIMEOUT_SECONDS,
-    DOCKER_MEMORY_LIMIT,
-    DOCKER_MEMORY_SWAP,
-    DOCKER_CPU_LIMIT,
-    DOCKER_PIDS_LIMIT,
-    DOCKER_NOFILE_LIMIT,
     MAX_STDOUT_BYTES,
-    CONTAINER_SLEEP_SECONDS,
+    TEST_CPU_SECONDS_LIMIT,
 )
 
 from .c_wrapper import C_WRAPPER_TEMPLATE
 
-PIPE = asyncio.subprocess.PIPE
-DEVNULL = asyncio.subprocess.DEVNULL
-
-
 class CExecutor(BaseExecutor):
 
     IMAGE_NAME = "cpp-sandbox:latest"
+    HARNESS_COMMAND = ["./solution", "--harness"]
+    # The C JSON harness prebuilt in cpp-sandbox (docker/cpp.Dockerfile):
+    # submissions are compiled by gcc as C and linked against it.
+    COMPILE_FLAGS = ["-O2", "-std=gnu17"]
+    HARNESS_INCLUDE_DIR = "/opt/c/include"
+    HARNESS_LIBRARY = "/opt/c/lib/libsandbox_harness.a"
+    ARTIFACTS = ["solution"]
 
     def __init__(self, code: str, function_name: str):
         super().__init__(code, function_name)
@@ -51,59 +54,53 @@ class CExecutor(BaseExecutor):
 
     async def compile(self):
 
-        container_sandbox_root, host_sandbox_root = get_sandbox_roots()
-
-        self.temp_dir = tempfile.mkdtemp(dir=container_sandbox_root)
-        self.host_temp_dir = build_host_temp_dir(host_sandbox_root, self.temp_dir)
-
         wrapped_code = self._generate_wrapper()
 
-        if "__PLACEHOLDER__" in wrapped_code:
+        if "__PLACEHOLDER__" in wrapped_code or "__FUNCTION_" in wrapped_code:
             raise CompileError("Wrapper placeholder replacement failed")
 
-        self.file_path = os.path.join(self.temp_dir, "solution.cpp")
+        compile_cmd = [
+            "gcc", "solution.c", *self.COMPILE_FLAGS, f"-I{self.HARNESS_INCLUDE_DIR}",
+            self.HARNESS_LIBRARY, "-lm", "-o", "solution",
+        ]
 
-        with open(self.file_path, "w") as f:
-            f.write(wrapped_code)
+        cache_key = await artifact_key("c", self.IMAGE_NAME, [wrapped_code], compile_cmd)
+        cached = await lookup_artifact(cache_key)
+        if cached and cached.error is not None:
+            raise CompileError(cached.error)
 
-        run_cmd = [
-            "docker", "run",
-            "-d", "--rm",
-            "--memory", DOCKER_MEMORY_LIMIT,
-            "--memory-swap", DOCKER_MEMORY_SWAP,
-            "--cpus", DOCKER_CPU_LIMIT,
-            "--pids-limit", DOCKER_PIDS_LIMIT,
-            "--ulimit", f"nofile={DOCKER_NOFILE_LIMIT}:{DOCKER_NOFILE_LIMIT}",
-            "--network", "none",
-            "--cap-drop", "ALL",
-            "--security-opt", "no-new-privileges",
-            "-v", f"{self.host_temp_dir}:/app",
-            "-w", "/app",
-            self.IMAGE_NAME,
-            "sleep", str(CONTAINER_SLEEP_SECONDS),
-        ]
+        sandbox = await acquire_sandbox(self.IMAGE_NAME)
+        self.container_id = sandbox.container_id
+        self.temp_dir = sandbox.temp_dir
+        self.host_temp_dir = sandbox.host_temp_dir
 
-        proc = await asyncio.create_subprocess_exec(*run_cmd, stdout=PIPE, stderr=PIPE)
-        stdout, _ = await proc.communicate()
-        if proc.returncode != 0:
-            raise RuntimeExecutionError("Failed to start container")
-        self.container_id = stdout.decode().strip()
+        if cached and await restore_artifact(cached, self.temp_dir):
+            await upload_workspace(self.container_id, self.temp_dir)
+            return
 
-        compile_cmd = [
-            "docker", "exec", self.container_id,
-            "g++", "solution.cpp", "-O2", "-std=c++20", "-o", "solution",
-        ]
+        self.file_path = os.path.join(self.temp_dir, "solution.c")
+
+        with open(self.file_path, "w") as f:
+            f.write(wrapped_code)
+
+        await upload_workspace(self.container_id, self.temp_dir)
 
-        proc = await asyncio.create_subprocess_exec(*compile_cmd, stdout=PIPE, stderr=PIPE)
         try:
-            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=COMPILATION_TIMEOUT_SECONDS)
+            result = await get_docker().exec(
+                self.container_id, compile_cmd,
+                timeout=COMPILATION_TIMEOUT_SECONDS,
+            )
         except asyncio.TimeoutError:
-            proc.kill()
-            await proc.wait()
             raise CompileError("Compilation timed out")
 
-        if proc.returncode != 0:
-            raise CompileError(stderr.decode())
+        if result.exit_code != 0:
+            message = result.stderr.decode()
+            await store_compile_error(cache_key, message)
+            raise CompileError(message)
+
+        if cache_key is not None:
+            await download_workspace(self.container_id, self.temp_dir, self.ARTIFACTS)
+            await store_artifact(cache_key, self.temp_dir, self.ARTIFACTS)
 
     # ==========================================================
     # Run Phase
@@ -116,24 +113,27 @@ class CExecutor(BaseExecutor):
 
         payload = json.dumps(test_input).encode()
 
-        exec_cmd = ["docker", "exec", "-i", self.container_id, "./solution"]
+        exec_cmd = ["./solution"]
 
-        proc = await asyncio.create_subprocess_exec(*exec_cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE)
         try:
-            stdout, stderr = await asyncio.wait_for(proc.communicate(payload), timeout=EXECUTION_TIMEOUT_SECONDS)
+            result = await get_docker().exec(
+                self.container_id, exec_cmd,
+                stdin=payload,
+                timeout=EXECUTION_TIMEOUT_SECONDS,
+                cpu_seconds=TEST_CPU_SECONDS_LIMIT,
+                limit=MAX_STDOUT_BYTES,
+            )
         except asyncio.TimeoutError:
-            proc.kill()
-            await proc.wait()
             raise RuntimeExecutionError("Execution timed out")
 
-        stdout_str = stdout.decode()
-
-        if len(stdout_str.encode("utf-8")) > MAX_STDOUT_BYTES:
+        if len(result.stdout) > MAX_STDOUT_BYTES:
             raise RuntimeExecutionError("Output limit exceeded")
 
-        if proc.returncode != 0:
+        stdout_str = result.stdout.decode()
+
+        if result.exit_code != 0:
             raise RuntimeExecutionError(
-                stderr.decode().strip() or stdout_str.strip() or "Runtime error"
+                result.stderr.decode().strip() or stdout_str.strip() or "Runtime error"
             )
 
         try:
@@ -141,24 +141,21 @@ class CExecutor(BaseExecutor):
         except Exception:
             raise RuntimeExecutionError("Invalid JSON output")
 
+    def harness_payload(self, test_input: dict):
+        # The generated wrapper is specialised to one function and reads the
+        # bare test input.
+        return test_input
+
     # ==========================================================
     # Cleanup
     # ==========================================================
 
     async def cleanup(self):
 
-        if self.container_id:
-            proc = await asyncio.create_subprocess_exec(
-                "docker", "rm", "-f", self.container_id,
-                stdout=DEVNULL, stderr=DEVNULL,
-            )
-            await proc.wait()
-            self.container_id = None
-
-        if self.temp_dir:
-            shutil.rmtree(self.temp_dir, ignore_errors=True)
-            self.temp_dir = None
-            self.host_temp_dir = None
+        await release_sandbox(self.container_id, self.temp_dir)
+        self.container_id = None
+        self.temp_dir = None
+        self.host_temp_dir = None
 
     # ==========================================================
     # Wrapper Generator
@@ -192,26 +189,27 @@ class CExecutor(BaseExecutor):
 
             clean_type = param_type.replace("const", "").strip()
 
+            arg = f'harness_arg(j, "{param_name}")'
+
             if clean_type == "int":
-                param_deserialization.append(f'int {param_name} = j["{param_name}"];')
+                param_deserialization.append(f'int {param_name} = harness_int({arg});')
 
             elif clean_type == "long":
-                param_deserialization.append(f'long {param_name} = j["{param_name}"];')
+                param_deserialization.append(f'long {param_name} = harness_long({arg});')
 
             elif clean_type == "double":
-                param_deserialization.append(f'double {param_name} = j["{param_name}"];')
+                param_deserialization.append(f'double {param_name} = harness_double({arg});')
 
             elif clean_type in ("int[]", "int*"):
+                param_deserialization.append(f'size_t {param_name}_len;')
                 param_deserialization.append(
-                    f'vector<int> {param_name}_vec = j["{param_name}"].get<vector<int>>();'
+                    f'int* {param_name} = harness_int_array({arg}, &{param_name}_len);'
                 )
-                param_deserialization.append(f'int* {param_name} = {param_name}_vec.data();')
                 if first_input_array_size is None:
-                    first_input_array_size = f"{param_name}_vec.size()"
+                    first_input_array_size = f"{param_name}_len"
 
             elif clean_type == "char*":
-                param_deserialization.append(f'string {param_name}_tmp = j["{param_name}"];')
-                param_deserialization.append(f'char* {param_name} = (char*){param_name}_tmp.c_str();')
+                param_deserialization.append(f'char* {param_name} = harness_string({arg});')
 
             else:
                 raise CompileError(f"Unsupported C type: {clean_type}")
@@ -222,20 +220,20 @@ class CExecutor(BaseExecutor):
         if is_void and output_param:
             out_type, out_name = output_param
             size_expr = first_input_array_size or "0"
-            param_deserialization.append(f'vector<int> {out_name}_vec({size_expr});')
-            param_deserialization.append(f'int* {out_name} = {out_name}_vec.data();')
+            param_deserialization.append(f'size_t {out_name}_len = {size_expr};')
+            param_deserialization.append(f'int* {out_name} = harness_int_buffer({out_name}_len);')
 
         # Function call and return serialization differ for void vs non-void
         if is_void:
             function_call = f'{self.function_name}({", ".join(param_names)});'
             if output_param:
                 out_name = output_param[1]
-                return_serialization = f'output = json({out_name}_vec);'
+                return_serialization = f'harness_write_int_array(output, {out_name}, {out_name}_len);'
             else:
-                return_serialization = 'output = nullptr;'
+                return_serialization = 'harness_write_null(output);'
         else:
-            function_call = f'auto result = {self.function_name}({", ".join(param_names)});'
-            return_serialization = "output = result;"
+            function_call = f'{return_type} result = {self.function_name}({", ".join(param_names)});'
+            return_serialization = "harness_write(output, result);"
 
         # Build forward declaration using normalised types (int[] → int*)
         def decl_param(pt: str, pn: str) -> str:
@@ -1,8 +1,6 @@
 import asyncio
-import tempfile
 import os
 import json
-import shutil
 import re
 
 from execution.base import BaseExecutor
@@ -10,32 +8,37 @@ from execution.exceptions import (
     CompileError,
     RuntimeExecutionError,
 )
-from execution.sandbox_paths import (
-    build_host_temp_dir,
-    get_sandbox_roots,
+from execution.container_pool import acquire_sandbox
+from execution.cleanup import release_sandbox
+from execution.workspace import download_workspace, upload_workspace
+from execution.docker_client import get_docker
+from execution.artifact_cache import (
+    artifact_key,
+    lookup_artifact,
+    restore_artifact,
+    store_artifact,
+    store_compile_error,
 )
 
 from config.limits import (
     EXECUTION_TIMEOUT_SECONDS,
     COMPILATION_TIMEOUT_SECONDS,
-    DOCKER_MEMORY_LIMIT,
-    DOCKER_MEMORY_SWAP,
-    DOCKER_CPU_LIMIT,
-    DOCKER_PIDS_LIMIT,
-    DOCKER_NOFILE_LIMIT,
     MAX_STDOUT_BYTES,
-    CONTAINER_SLEEP_SECONDS,
+    TEST_CPU_SECONDS_LIMIT,
 )
 
 from .cpp_wrapper import CPP_WRAPPER_TEMPLATE
 
-PIPE = asyncio.subprocess.PIPE
-DEVNULL = asyncio.subprocess.DEVNULL
-
-
 class CppExecutor(BaseExecutor):
 
     IMAGE_NAME = "cpp-sandbox:latest"
+    HARNESS_COMMAND = ["./solution", "--harness"]
+    # The precompiled sandbox_harness.h in cpp-sandbox is only used with the
+    # flags it was built with (docker/cpp.Dockerfile); keep the two in step.
+    COMPILE_FLAGS = ["-O2", "-std=c++20"]
+    HARNESS_INCLUDE_DIR = "/opt/cpp/include"
+    HARNESS_OBJECT = "/opt/cpp/lib/sandbox_harness.o"
+    ARTIFACTS = ["solution"]
 
     def __init__(self, code: str, function_name: str):
         super().__init__(code, function_name)
@@ -50,65 +53,53 @@ class CppExecutor(BaseExecutor):
 
     async def compile(self):
 
-        container_sandbox_root, host_sandbox_root = get_sandbox_roots()
-
-        self.temp_dir = tempfile.mkdtemp(dir=container_sandbox_root)
-        self.host_temp_dir = build_host_temp_dir(host_sandbox_root, self.temp_dir)
-
         wrapped_code = self._generate_wrapper()
 
         if "__PLACEHOLDER__" in wrapped_code or "__FUNCTION_" in wrapped_code:
             raise CompileError("Wrapper placeholder replacement failed")
 
+        compile_cmd = [
+            "g++", "solution.cpp", *self.COMPILE_FLAGS,
+            f"-I{self.HARNESS_INCLUDE_DIR}", self.HARNESS_OBJECT, "-o", "solution",
+        ]
+
+        cache_key = await artifact_key("cpp", self.IMAGE_NAME, [wrapped_code], compile_cmd)
+        cached = await lookup_artifact(cache_key)
+        if cached and cached.error is not None:
+            raise CompileError(cached.error)
+
+        sandbox = await acquire_sandbox(self.IMAGE_NAME)
+        self.container_id = sandbox.container_id
+        self.temp_dir = sandbox.temp_dir
+        self.host_temp_dir = sandbox.host_temp_dir
+
+        if cached and await restore_artifact(cached, self.temp_dir):
+            await upload_workspace(self.container_id, self.temp_dir)
+            return
+
         self.file_path = os.path.join(self.temp_dir, "solution.cpp")
 
         with open(self.file_path, "w") as f:
             f.write(wrapped_code)
 
-        run_cmd = [
-            "docker", "run",
-            "-d", "--rm",
-            "--memory", DOCKER_MEMORY_LIMIT,
-            "--memory-swap", DOCKER_MEMORY_SWAP,
-            "--cpus", DOCKER_CPU_LIMIT,
-            "--pids-limit", DOCKER_PIDS_LIMIT,
-            "--ulimit", f"nofile={DOCKER_NOFILE_LIMIT}:{DOCKER_NOFILE_LIMIT}",
-            "--network", "none",
-            "--cap-drop", "ALL",
-            "--security-opt", "no-new-privileges",
-            "-v", f"{self.host_temp_dir}:/app",
-            "-w", "/app",
-            self.IMAGE_NAME,
-            "sleep", str(CONTAINER_SLEEP_SECONDS),
-        ]
+        await upload_workspace(self.container_id, self.temp_dir)
 
-        proc = await asyncio.create_subprocess_exec(*run_cmd, stdout=PIPE, stderr=PIPE)
         try:
-            stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=30.0)
-        except asyncio.TimeoutError:
-            proc.kill()
-            await proc.wait()
-            raise RuntimeExecutionError("Docker daemon timed out and hung while starting the container")
-            
-        if proc.returncode != 0:
-            raise RuntimeExecutionError("Failed to start C++ container")
-        self.container_id = stdout.decode().strip()
-
-        compile_cmd = [
-            "docker", "exec", self.container_id,
-            "g++", "solution.cpp", "-O2", "-std=c++20", "-o", "solution",
-        ]
-
-        proc = await asyncio.create_subprocess_exec(*compile_cmd, stdout=PIPE, stderr=PIPE)
-        try:
-            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=COMPILATION_TIMEOUT_SECONDS)
+            result = await get_docker().exec(
+                self.container_id, compile_cmd,
+                timeout=COMPILATION_TIMEOUT_SECONDS,
+            )
         except asyncio.TimeoutError:
-            proc.kill()
-            await proc.wait()
             raise CompileError("Compilation timed out")
 
-        if proc.returncode != 0:
-            raise CompileError(stderr.decode())
+        if result.exit_code != 0:
+            message = result.stderr.decode()
+            await store_compile_error(cache_key, message)
+            raise CompileError(message)
+
+        if cache_key is not None:
+            await download_workspace(self.container_id, self.temp_dir, self.ARTIFACTS)
+            await store_artifact(cache_key, self.temp_dir, self.ARTIFACTS)
 
     # ==========================================================
     # Run Phase
@@ -121,24 +112,27 @@ class CppExecutor(BaseExecutor):
 
         payload = json.dumps(test_input).encode()
 
-        exec_cmd = ["docker", "exec", "-i", self.container_id, "./solution"]
+        exec_cmd = ["./solution"]
 
-        proc = await asyncio.create_subprocess_exec(*exec_cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE)
         try:
-            stdout, stderr = await asyncio.wait_for(proc.communicate(payload), timeout=EXECUTION_TIMEOUT_SECONDS)
+            result = await get_docker().exec(
+                self.container_id, exec_cmd,
+                stdin=payload,
+                timeout=EXECUTION_TIMEOUT_SECONDS,
+                cpu_seconds=TEST_CPU_SECONDS_LIMIT,
+                limit=MAX_STDOUT_BYTES,
+            )
         except asyncio.TimeoutError:
-            proc.kill()
-            await proc.wait()
             raise RuntimeExecutionError("Execution timed out")
 
-        stdout_str = stdout.decode()
-
-        if len(stdout_str.encode("utf-8")) > MAX_STDOUT_BYTES:
+        if len(result.stdout) > MAX_STDOUT_BYTES:
             raise RuntimeExecutionError("Output limit exceeded")
 
-        if proc.returncode != 0:
+        stdout_str = result.stdout.decode()
+
+        if result.exit_code != 0:
             raise RuntimeExecutionError(
-                stderr.decode().strip() or stdout_str.strip() or "Runtime error"
+                result.stderr.decode().strip() or stdout_str.strip() or "Runtime error"
             )
 
         try:
@@ -146,30 +140,21 @@ class CppExecutor(BaseExecutor):
         except Exception:
             raise RuntimeExecutionError("Invalid JSON output")
 
+    def harness_payload(self, test_input: dict):
+        # The generated wrapper is specialised to one function and reads the
+        # bare test input.
+        return test_input
+
     # ==========================================================
     # Cleanup Phase
     # ==========================================================
 
     async def cleanup(self):
 
-        if self.container_id:
-            proc = await asyncio.create_subprocess_exec(
-                "docker", "rm", "-f", self.container_id,
-                stdout=DEVNULL, stderr=DEVNULL,
-            )
-            try:
-                await asyncio.wait_for(proc.wait(), timeout=15.0)
-            except asyncio.TimeoutError:
-                # Docker daemon is frozen; we abandon waiting to prevent deadlocking the worker slot
-                proc.kill()
-                await proc.wait()
-                
-            self.container_id = None
-
-        if self.temp_dir:
-            shutil.rmtree(self.temp_dir, ignore_errors=True)
-            self.temp_dir = None
-            self.host_temp_dir = None
+        await release_sandbox(self.container_id, self.temp_dir)
+        self.container_id = None
+        self.temp_dir = None
+        self.host_temp_dir = None
 
     # ==========================================================
     # Wrapper Generator
@@ -1,5 +1,7 @@
-CPP_WRAPPER_TEMPLATE = r"""
-
+# Prebuilt into cpp-sandbox (docker/cpp.Dockerfile): this header, also as a
+# precompiled header for the submission flags, and CPP_HARNESS_SOURCE as an
+# object file, so a submission compiles only its generated glue and user code.
+CPP_HARNESS_HEADER = r"""
 #include <iostream>
 #include <vector>
 #include <string>
@@ -29,6 +31,18 @@ struct TreeNode {
     TreeNode(int x) : val(x), left(nullptr), right(nullptr) {}
 };
 
+ListNode* buildLinkedList(const vector<int>& values);
+vector<int> serializeLinkedList(ListNode* head);
+TreeNode* buildTree(const vector<optional<int>>& arr);
+json serializeTree(TreeNode* root);
+
+// Runs one test (stdin) or the harness loop (--harness) over runTest.
+int sandboxMain(int argc, char** argv, json (*runTest)(json));
+"""
+
+CPP_HARNESS_SOURCE = r"""
+#include "sandbox_harness.h"
+
 // ======================================================
 // Linked List Utilities
 // ======================================================
@@ -128,20 +142,46 @@ json serializeTree(TreeNode* root) {
 }
 
 // ======================================================
-// FUNCTION FORWARD DECLARATION (AUTO-INJECTED)
+// HARNESS (one payload per input line, one frame per output line)
 // ======================================================
 
-__FUNCTION_SIGNATURE_PLACEHOLDER__
+static int harness(json (*runTest)(json)) {
+
+    string input;
+
+    while (getline(cin, input)) {
+
+        if (input.find_first_not_of(" \t\r") == string::npos)
+            continue;
+
+        string frame;
+
+        try {
+            frame = json{{"result", runTest(json::parse(input))}}.dump();
+        } catch (const exception& e) {
+            frame = json{{"error", e.what()}}.dump(-1, ' ', false, json::error_handler_t::replace);
+        } catch (...) {
+            frame = "{\"error\":\"Unknown runtime error\"}";
+        }
+
+        cout << frame << '\n' << flush;
+    }
+
+    return 0;
+}
 
 // ======================================================
 // MAIN EXECUTION ENTRY
 // ======================================================
 
-int main() {
-    try {
-        ios::sync_with_stdio(false);
-        cin.tie(nullptr);
+int sandboxMain(int argc, char** argv, json (*runTest)(json)) {
+    ios::sync_with_stdio(false);
+    cin.tie(nullptr);
 
+    if (argc > 1 && string(argv[1]) == "--harness")
+        return harness(runTest);
+
+    try {
         string input;
         if (!getline(cin, input)) {
             cout << "{\"error\":\"No input received\"}";
@@ -157,27 +197,7 @@ int main() {
             return 1;
         }
 
-        // ==================================================
-        // PARAMETER DESERIALIZATION (AUTO-GENERATED)
-        // ==================================================
-
-        __PARAMETER_DESERIALIZATION_PLACEHOLDER__
-
-        // ==================================================
-        // FUNCTION INVOCATION
-        // ==================================================
-
-        auto result = __FUNCTION_NAME_PLACEHOLDER__(
-            __FUNCTION_ARGUMENT_LIST_PLACEHOLDER__
-        );
-
-        // ==================================================
-        // RETURN TYPE SERIALIZATION
-        // ==================================================
-
-        json output;
-
-        __RETURN_SERIALIZATION_PLACEHOLDER__
+        json output = runTest(j);
 
         cout << output.dump();
 
@@ -191,6 +211,57 @@ int main() {
 
     return 0;
 }
+"""
+
+# Generated per submission on top of the prebuilt harness.  The harness
+# header must stay the first include for the precompiled header to apply.
+CPP_WRAPPER_TEMPLATE = r"""
+#include "sandbox_harness.h"
+
+// ======================================================
+// FUNCTION FORWARD DECLARATION (AUTO-INJECTED)
+// ======================================================
+
+__FUNCTION_SIGNATURE_PLACEHOLDER__
+
+// ======================================================
+// SINGLE TEST EXECUTION
+// ======================================================
+
+json runTest(json j) {
+
+    // ==================================================
+    // PARAMETER DESERIALIZATION (AUTO-GENERATED)
+    // ==================================================
+
+    __PARAMETER_DESERIALIZATION_PLACEHOLDER__
+
+    // ==================================================
+    // FUNCTION INVOCATION
+    // ==================================================
+
+    auto result = __FUNCTION_NAME_PLACEHOLDER__(
+        __FUNCTION_ARGUMENT_LIST_PLACEHOLDER__
+    );
+
+    // ==================================================
+    // RETURN TYPE SERIALIZATION
+    // ==================================================
+
+    json output;
+
+    __RETURN_SERIALIZATION_PLACEHOLDER__
+
+    return output;
+}
+
+// ======================================================
+// MAIN EXECUTION ENTRY
+// ======================================================
+
+int main(int argc, char** argv) {
+    return sandboxMain(argc, argv, runTest);
+}
 
 // ======================================================
 // USER CODE INJECTION
@@ -1,47 +1,74 @@
 import asyncio
-import tempfile
+import logging
 import os
 import json
-import shutil
 
 from execution.base import BaseExecutor
 from execution.exceptions import (
     CompileError,
+    CompileServerError,
     RuntimeExecutionError,
 )
-from execution.sandbox_paths import (
-    build_host_temp_dir,
-    get_sandbox_roots,
+from execution.container_pool import acquire_sandbox
+from execution.cleanup import release_sandbox
+from execution.workspace import download_workspace, upload_workspace
+from execution.compile_server import get_compile_server
+from execution.docker_client import get_docker
+from execution.artifact_cache import (
+    artifact_key,
+    lookup_artifact,
+    restore_artifact,
+    store_artifact,
+    store_compile_error,
 )
 
 from config.limits import (
     EXECUTION_TIMEOUT_SECONDS,
     COMPILATION_TIMEOUT_SECONDS,
-    DOCKER_MEMORY_LIMIT,
-    DOCKER_MEMORY_SWAP,
-    DOCKER_CPU_LIMIT,
-    DOCKER_PIDS_LIMIT,
-    DOCKER_NOFILE_LIMIT,
     MAX_STDOUT_BYTES,
-    CONTAINER_SLEEP_SECONDS,
+    TEST_CPU_SECONDS_LIMIT,
 )
 
-from .csharp_wrapper import CSHARP_WRAPPER_TEMPLATE
+from .csharp_wrapper import CSHARP_USINGS, CSHARP_ENTRY
 
-PIPE = asyncio.subprocess.PIPE
-DEVNULL = asyncio.subprocess.DEVNULL
+log = logging.getLogger(__name__)
+
+# Reference assemblies, implicit usings and runtime config resolved once in
+# csharp-sandbox (docker/csharp.Dockerfile), so submissions are compiled by
+# Roslyn directly instead of through MSBuild.
+CSHARP_RUNTIME_CONFIG = "/opt/csharp/sandbox.runtimeconfig.json"
+CSHARP_GLOBAL_USINGS = "/opt/csharp/GlobalUsings.cs"
+CSC = ["dotnet", "/opt/csharp/roslyn/csc.dll"]
+
+# TreeNode, ListNode, Node, Builders and Program from CSHARP_WRAPPER_TEMPLATE,
+# prebuilt into csharp-sandbox.
+CSHARP_HARNESS_DLL = "/opt/harness/SandboxHarness.dll"
 
 
 class CSharpExecutor(BaseExecutor):
 
     IMAGE_NAME = "csharp-sandbox:latest"
+    RUN_COMMAND = ["dotnet", "exec", "--runtimeconfig", CSHARP_RUNTIME_CONFIG, "/app/Solution.dll"]
+    HARNESS_COMMAND = RUN_COMMAND + ["--harness"]
+    # CS0436: a submission type shadowing a harness type.  The old single
+    # Program.cs rejected these as duplicate definitions, and so do we.
+    COMPILE_OPTIONS = [
+        "-nologo", "-noconfig", "-optimize+", "-nullable:disable", "-warnaserror+:CS0436",
+        "-target:exe", "-main:SandboxEntry",
+        "@/opt/csharp/references.rsp", f"-r:{CSHARP_HARNESS_DLL}",
+    ]
+    COMPILE_SERVER_COMMAND = [
+        "dotnet", "exec", "--runtimeconfig", CSHARP_RUNTIME_CONFIG,
+        "/opt/compile-server/CSharpCompileServer.dll", *COMPILE_OPTIONS,
+    ]
+    ARTIFACTS = ["Solution.dll"]
 
     def __init__(self, code: str, function_name: str):
         super().__init__(code, function_name)
         self.container_id = None
         self.temp_dir = None
         self.host_temp_dir = None
-        self.project_path = None
+        self.file_path = None
 
     # -------------------------
     # Compile Phase
@@ -49,71 +76,73 @@ class CSharpExecutor(BaseExecutor):
 
     async def compile(self):
 
-        container_sandbox_root, host_sandbox_root = get_sandbox_roots()
-
-        self.temp_dir = tempfile.mkdtemp(dir=container_sandbox_root)
-        self.host_temp_dir = build_host_temp_dir(host_sandbox_root, self.temp_dir)
-
-        self.project_path = os.path.join(self.temp_dir, "SandboxApp")
-        os.makedirs(self.project_path, exist_ok=True)
-
-        program_path = os.path.join(self.project_path, "Program.cs")
-
-        wrapped_code = CSHARP_WRAPPER_TEMPLATE.replace("{source_code}", self.code)
-
-        with open(program_path, "w") as f:
-            f.write(wrapped_code)
-
-        csproj_content = """<Project Sdk="Microsoft.NET.Sdk">
-  <PropertyGroup>
-    <OutputType>Exe</OutputType>
-    <TargetFramework>net8.0</TargetFramework>
-    <ImplicitUsings>enable</ImplicitUsings>
-    <Nullable>disable</Nullable>
-  </PropertyGroup>
-</Project>
-"""
-        with open(os.path.join(self.project_path, "SandboxApp.csproj"), "w") as f:
-            f.write(csproj_content)
-
-        run_cmd = [
-            "docker", "run",
-            "-d", "--rm",
-            "--memory", DOCKER_MEMORY_LIMIT,
-            "--memory-swap", DOCKER_MEMORY_SWAP,
-            "--cpus", DOCKER_CPU_LIMIT,
-            "--pids-limit", DOCKER_PIDS_LIMIT,
-            "--ulimit", f"nofile={DOCKER_NOFILE_LIMIT}:{DOCKER_NOFILE_LIMIT}",
-            "--network", "none",
-            "--cap-drop", "ALL",
-            "--security-opt", "no-new-privileges",
-            "-v", f"{self.host_temp_dir}:/app",
-            "-w", "/app/SandboxApp",
-            self.IMAGE_NAME,
-            "sleep", str(CONTAINER_SLEEP_SECONDS),
-        ]
-
-        proc = await asyncio.create_subprocess_exec(*run_cmd, stdout=PIPE, stderr=PIPE)
-        stdout, _ = await proc.communicate()
-        if proc.returncode != 0:
-            raise RuntimeExecutionError("Failed to start execution container")
-        self.container_id = stdout.decode().strip()
+        source = CSHARP_USINGS + self.code + CSHARP_ENTRY
 
         compile_cmd = [
-            "docker", "exec", self.container_id,
-            "dotnet", "build", "--configuration", "Release", "--nologo",
+            *CSC, *self.COMPILE_OPTIONS, "-out:Solution.dll", "Solution.cs", CSHARP_GLOBAL_USINGS,
         ]
 
-        proc = await asyncio.create_subprocess_exec(*compile_cmd, stdout=PIPE, stderr=PIPE)
+        cache_key = await artifact_key("csharp", self.IMAGE_NAME, [source], compile_cmd)
+        cached = await lookup_artifact(cache_key)
+        if cached and cached.error is not None:
+            raise CompileError(cached.error)
+
+        sandbox = await acquire_sandbox(self.IMAGE_NAME)
+        self.container_id = sandbox.container_id
+        self.temp_dir = sandbox.temp_dir
+        self.host_temp_dir = sandbox.host_temp_dir
+
+        if cached and await restore_artifact(cached, self.temp_dir):
+            await upload_workspace(self.container_id, self.temp_dir)
+            return
+
+        self.file_path = os.path.join(self.temp_dir, "Solution.cs")
+
+        with open(self.file_path, "w") as f:
+            f.write(source)
+
         try:
-            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=COMPILATION_TIMEOUT_SECONDS)
+            ok, output = await self._csc(compile_cmd)
         except asyncio.TimeoutError:
-            proc.kill()
-            await proc.wait()
             raise CompileError("Compilation timed out")
 
-        if proc.returncode != 0:
-            raise CompileError(stderr.decode().strip() or "Compilation failed")
+        if not ok:
+            message = output.strip() or "Compilation failed"
+            await store_compile_error(cache_key, message)
+            raise CompileError(message)
+
+        await store_artifact(cache_key, self.temp_dir, self.ARTIFACTS)
+
+    async def _csc(self, compile_cmd: list[str]) -> tuple[bool, str]:
+        """
+        Compile Solution.cs with the compile server, else in the sandbox;
+        either way Solution.dll ends up in the workspace and in the sandbox.
+        """
+        server = get_compile_server("csharp")
+        if server is not None:
+            try:
+                async with server.staged(self.temp_dir) as workspace:
+                    ok, output = await server.compile(
+                        "csc",
+                        [*self.COMPILE_OPTIONS, f"-out:{workspace}/Solution.dll"],
+                        [f"{workspace}/Solution.cs", CSHARP_GLOBAL_USINGS],
+                        timeout=COMPILATION_TIMEOUT_SECONDS,
+                    )
+                if ok:
+                    await upload_workspace(self.container_id, self.temp_dir)
+                return ok, output.replace(f"{workspace}/", "")
+            except CompileServerError as e:
+                log.warning(f"C# compile server failed, compiling in the sandbox: {e}")
+
+        # csc reports diagnostics on stdout.
+        await upload_workspace(self.container_id, self.temp_dir)
+        result = await get_docker().exec(
+            self.container_id, compile_cmd,
+            timeout=COMPILATION_TIMEOUT_SECONDS,
+        )
+        if result.exit_code == 0:
+            await download_workspace(self.container_id, self.temp_dir, self.ARTIFACTS)
+        return result.exit_code == 0, result.stdout.decode()
 
     # -------------------------
     # Run Phase
@@ -126,29 +155,29 @@ class CSharpExecutor(BaseExecutor):
 
         payload = json.dumps({"function_name": self.function_name, "input": test_input}).encode()
 
-        exec_cmd = [
-            "docker", "exec", "-i", self.container_id,
-            "dotnet", "/app/SandboxApp/bin/Release/net8.0/SandboxApp.dll",
-        ]
+        exec_cmd = self.RUN_COMMAND
 
-        proc = await asyncio.create_subprocess_exec(*exec_cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE)
         try:
-            stdout, stderr = await asyncio.wait_for(proc.communicate(payload), timeout=EXECUTION_TIMEOUT_SECONDS)
+            result = await get_docker().exec(
+                self.container_id, exec_cmd,
+                stdin=payload,
+                timeout=EXECUTION_TIMEOUT_SECONDS,
+                cpu_seconds=TEST_CPU_SECONDS_LIMIT,
+                limit=MAX_STDOUT_BYTES,
+            )
         except asyncio.TimeoutError:
-            proc.kill()
-            await proc.wait()
             raise RuntimeExecutionError("Execution timed out")
 
-        stdout_str = stdout.decode()
-
-        if len(stdout_str.encode("utf-8")) > MAX_STDOUT_BYTES:
+        if len(result.stdout) > MAX_STDOUT_BYTES:
             raise RuntimeExecutionError("Output limit exceeded")
 
-        if proc.returncode != 0:
+        stdout_str = result.stdout.decode()
+
+        if result.exit_code != 0:
             try:
                 message = json.loads(stdout_str).get("error", "Runtime error")
             except Exception:
-                message = stderr.decode() or "Runtime error"
+                message = result.stderr.decode() or "Runtime error"
             raise RuntimeExecutionError(message)
 
         try:
@@ -162,15 +191,7 @@ class CSharpExecutor(BaseExecutor):
 
     async def cleanup(self):
 
-        if self.container_id:
-            proc = await asyncio.create_subprocess_exec(
-                "docker", "rm", "-f", self.container_id,
-                stdout=DEVNULL, stderr=DEVNULL,
-            )
-            await proc.wait()
-            self.container_id = None
-
-        if self.temp_dir:
-            shutil.rmtree(self.temp_dir, ignore_errors=True)
-            self.temp_dir = None
-            self.host_temp_dir = None
+        await release_sandbox(self.container_id, self.temp_dir)
+        self.container_id = None
+        self.temp_dir = None
+        self.host_temp_dir = None
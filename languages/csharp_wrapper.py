@@ -1,11 +1,17 @@
-CSHARP_WRAPPER_TEMPLATE = r"""
+# Usings in scope for user code.  Also the header of Solution.cs when the
+# user code is compiled on its own against the prebuilt harness assembly.
+CSHARP_USINGS = r"""
 using System;
 using System.Collections.Generic;
 using System.Text.Json;
 using System.Text.Json.Serialization;
 using System.Reflection;
 using System.Linq;
+"""
 
+# Rendered with empty user code this is the source of the harness assembly
+# built into csharp-sandbox (docker/csharp.Dockerfile).
+CSHARP_WRAPPER_TEMPLATE = CSHARP_USINGS + r"""
 // ==============================
 // Built-in Data Structures
 // ==============================
@@ -280,37 +286,79 @@ public class Program {
         return null;
     }
 
-    public static void Main(string[] args) {
+    static object Execute(string inputJson) {
 
-        try {
+        var payload = JsonSerializer.Deserialize<Dictionary<string, JsonElement>>(inputJson);
 
-            string inputJson = Console.In.ReadToEnd();
-            var payload = JsonSerializer.Deserialize<Dictionary<string, JsonElement>>(inputJson);
+        string functionName = payload["function_name"].GetString();
+        var input = JsonSerializer.Deserialize<Dictionary<string, JsonElement>>(
+            payload["input"].GetRawText()
+        );
+
+        // The submission is the entry assembly, whether or not the harness
+        // was compiled into it.
+        Type solutionType = Assembly.GetEntryAssembly().GetType("Solution");
+        object instance = Activator.CreateInstance(solutionType);
 
-            string functionName = payload["function_name"].GetString();
-            var input = JsonSerializer.Deserialize<Dictionary<string, JsonElement>>(
-                payload["input"].GetRawText()
+        var method = solutionType.GetMethod(functionName);
+        var parameters = method.GetParameters();
+
+        object[] argsConverted = new object[parameters.Length];
+        var values = input.Values.ToList();
+
+        for (int i = 0; i < parameters.Length; i++) {
+            argsConverted[i] = ConvertValue(
+                values[i],
+                parameters[i].ParameterType,
+                input
             );
+        }
 
-            Type solutionType = Type.GetType("Solution");
-            object instance = Activator.CreateInstance(solutionType);
+        var result = method.Invoke(instance, argsConverted);
+        return AutoConvertOutput(result);
+    }
 
-            var method = solutionType.GetMethod(functionName);
-            var parameters = method.GetParameters();
+    // One payload per input line, one result/error frame per output line.
+    static void Harness() {
 
-            object[] argsConverted = new object[parameters.Length];
-            var values = input.Values.ToList();
+        string line;
 
-            for (int i = 0; i < parameters.Length; i++) {
-                argsConverted[i] = ConvertValue(
-                    values[i],
-                    parameters[i].ParameterType,
-                    input
-                );
+        while ((line = Console.In.ReadLine()) != null) {
+
+            if (string.IsNullOrWhiteSpace(line))
+                continue;
+
+            string frame;
+
+            try {
+                var response = new Dictionary<string, object> {
+                    { "result", Execute(line) }
+                };
+                frame = JsonSerializer.Serialize(response);
             }
+            catch (Exception ex) {
+                var error = new Dictionary<string, object> {
+                    { "error", ex.InnerException?.Message ?? ex.Message }
+                };
+                frame = JsonSerializer.Serialize(error);
+            }
+
+            Console.Out.WriteLine(frame);
+            Console.Out.Flush();
+        }
+    }
+
+    public static void Main(string[] args) {
+
+        if (args.Length > 0 && args[0] == "--harness") {
+            Harness();
+            return;
+        }
+
+        try {
 
-            var result = method.Invoke(instance, argsConverted);
-            var output = AutoConvertOutput(result);
+            string inputJson = Console.In.ReadToEnd();
+            var output = Execute(inputJson);
 
             var response = new Dictionary<string, object> {
                 { "result", output }
@@ -329,4 +377,25 @@ public class Program {
         }
     }
 }
-"""
\ No newline at end of file
+"""
+
+# Entry point of a submission compiled against the harness assembly, appended
+# to Solution.cs.  SandboxHarness.dll is not in the submission's directory, so
+# it is loaded from the image when the runtime first asks for it; Run() is a
+# separate method so nothing from the harness is needed before that hook is in.
+CSHARP_ENTRY = r"""
+
+public static class SandboxEntry {
+
+    public static void Main(string[] args) {
+        AppDomain.CurrentDomain.AssemblyResolve += (sender, e) =>
+            new AssemblyName(e.Name).Name == "SandboxHarness"
+                ? Assembly.LoadFrom("/opt/harness/SandboxHarness.dll")
+                : null;
+        Run(args);
+    }
+
+    [System.Runtime.CompilerServices.MethodImpl(System.Runtime.CompilerServices.MethodImplOptions.NoInlining)]
+    static void Run(string[] args) => Program.Main(args);
+}
+"""
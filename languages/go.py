@@ -1,42 +1,49 @@
 import asyncio
 import json
+import logging
 import os
 import re
-import shutil
-import tempfile
 from typing import List, Tuple
 
 from execution.base import BaseExecutor
 from execution.exceptions import (
     CompileError,
+    CompileServerError,
     RuntimeExecutionError,
 )
-from execution.sandbox_paths import (
-    build_host_temp_dir,
-    get_sandbox_roots,
+from execution.container_pool import acquire_sandbox
+from execution.cleanup import release_sandbox
+from execution.workspace import download_workspace, upload_workspace
+from execution.compile_server import get_compile_server
+from execution.docker_client import get_docker
+from execution.artifact_cache import (
+    artifact_key,
+    lookup_artifact,
+    restore_artifact,
+    store_artifact,
+    store_compile_error,
 )
 
 from config.limits import (
     EXECUTION_TIMEOUT_SECONDS,
     COMPILATION_TIMEOUT_SECONDS,
-    DOCKER_MEMORY_LIMIT,
-    DOCKER_MEMORY_SWAP,
-    DOCKER_CPU_LIMIT,
-    DOCKER_PIDS_LIMIT,
-    DOCKER_NOFILE_LIMIT,
     MAX_STDOUT_BYTES,
-    CONTAINER_SLEEP_SECONDS,
+    TEST_CPU_SECONDS_LIMIT,
 )
 
-from .go_wrapper import GO_WRAPPER_TEMPLATE
+from .go_wrapper import GO_MOD, GO_WRAPPER_TEMPLATE
 
-PIPE = asyncio.subprocess.PIPE
-DEVNULL = asyncio.subprocess.DEVNULL
+log = logging.getLogger(__name__)
 
 
 class GoExecutor(BaseExecutor):
 
     IMAGE_NAME = "go-sandbox:latest"
+    HARNESS_COMMAND = ["./main", "--harness"]
+    # Its GOCACHE, seeded from the image, is shared by every compile on the worker.
+    COMPILE_SERVER_COMMAND = ["/opt/compile-server/go-compile-server"]
+    COMPILE_OPTIONS = ["-buildvcs=false", "-o", "main"]
+    ARTIFACTS = ["main"]
 
     def __init__(self, code: str, function_name: str):
         super().__init__(code, function_name)
@@ -51,61 +58,78 @@ class GoExecutor(BaseExecutor):
 
     async def compile(self):
 
-        container_sandbox_root, host_sandbox_root = get_sandbox_roots()
+        wrapped_code = self._generate_wrapper()
 
-        self.temp_dir = tempfile.mkdtemp(dir=container_sandbox_root)
-        self.host_temp_dir = build_host_temp_dir(host_sandbox_root, self.temp_dir)
-        self.file_path = os.path.join(self.temp_dir, "main.go")
+        compile_cmd = ["go", "build", *self.COMPILE_OPTIONS, "main.go"]
+        compile_env = {"CGO_ENABLED": "0"}
+        flags = compile_cmd + [f"{key}={value}" for key, value in compile_env.items()]
 
-        wrapped_code = self._generate_wrapper()
+        cache_key = await artifact_key("go", self.IMAGE_NAME, [wrapped_code, GO_MOD], flags)
+        cached = await lookup_artifact(cache_key)
+        if cached and cached.error is not None:
+            raise CompileError(cached.error)
+
+        sandbox = await acquire_sandbox(self.IMAGE_NAME)
+        self.container_id = sandbox.container_id
+        self.temp_dir = sandbox.temp_dir
+        self.host_temp_dir = sandbox.host_temp_dir
+
+        if cached and await restore_artifact(cached, self.temp_dir):
+            await upload_workspace(self.container_id, self.temp_dir)
+            return
+
+        self.file_path = os.path.join(self.temp_dir, "main.go")
 
         with open(self.file_path, "w") as f:
             f.write(wrapped_code)
 
-        run_cmd = [
-            "docker", "run",
-            "-d", "--rm",
-            "--memory", DOCKER_MEMORY_LIMIT,
-            "--memory-swap", DOCKER_MEMORY_SWAP,
-            "--cpus", DOCKER_CPU_LIMIT,
-            "--pids-limit", DOCKER_PIDS_LIMIT,
-            "--ulimit", f"nofile={DOCKER_NOFILE_LIMIT}:{DOCKER_NOFILE_LIMIT}",
-            "--network", "none",
-            "--cap-drop", "ALL",
-            "--security-opt", "no-new-privileges",
-            "-v", f"{self.host_temp_dir}:/app",
-            "-w", "/app",
-            self.IMAGE_NAME,
-            "sleep", str(CONTAINER_SLEEP_SECONDS),
-        ]
-
-        proc = await asyncio.create_subprocess_exec(*run_cmd, stdout=PIPE, stderr=PIPE)
-        try:
-            stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=30.0)
-        except asyncio.TimeoutError:
-            proc.kill()
-            await proc.wait()
-            raise RuntimeExecutionError("Docker daemon timed out and hung while starting the container")
-            
-        if proc.returncode != 0:
-            raise RuntimeExecutionError("Failed to start execution container")
-        self.container_id = stdout.decode().strip()
-
-        compile_cmd = [
-            "docker", "exec", "-e", "CGO_ENABLED=0", self.container_id,
-            "go", "build", "-buildvcs=false", "-o", "main", "main.go",
-        ]
-
-        proc = await asyncio.create_subprocess_exec(*compile_cmd, stdout=PIPE, stderr=PIPE)
+        with open(os.path.join(self.temp_dir, "go.mod"), "w") as f:
+            f.write(GO_MOD)
+
         try:
-            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=COMPILATION_TIMEOUT_SECONDS)
+            ok, output = await self._go_build(compile_cmd, compile_env)
         except asyncio.TimeoutError:
-            proc.kill()
-            await proc.wait()
             raise CompileError("Compilation timed out")
 
-        if proc.returncode != 0:
-            raise CompileError(stderr.decode().strip() or "Compilation failed")
+        if not ok:
+            message = output.strip() or "Compilation failed"
+            await store_compile_error(cache_key, message)
+            raise CompileError(message)
+
+        await store_artifact(cache_key, self.temp_dir, self.ARTIFACTS)
+
+    async def _go_build(self, compile_cmd: list[str], compile_env: dict) -> tuple[bool, str]:
+        """
+        Build main.go with the compile server, else in the sandbox; either
+        way the binary ends up in the workspace and in the sandbox.
+        """
+        server = get_compile_server("go")
+        if server is not None:
+            try:
+                # The server builds in the directory of the first source, so
+                # diagnostics name ./main.go as they do in the sandbox.
+                async with server.staged(self.temp_dir) as workspace:
+                    ok, output = await server.compile(
+                        "go",
+                        self.COMPILE_OPTIONS,
+                        [f"{workspace}/main.go"],
+                        timeout=COMPILATION_TIMEOUT_SECONDS,
+                    )
+                if ok:
+                    await upload_workspace(self.container_id, self.temp_dir)
+                return ok, output
+            except CompileServerError as e:
+                log.warning(f"Go compile server failed, compiling in the sandbox: {e}")
+
+        await upload_workspace(self.container_id, self.temp_dir)
+        result = await get_docker().exec(
+            self.container_id, compile_cmd,
+            env=compile_env,
+            timeout=COMPILATION_TIMEOUT_SECONDS,
+        )
+        if result.exit_code == 0:
+            await download_workspace(self.container_id, self.temp_dir, self.ARTIFACTS)
+        return result.exit_code == 0, result.stderr.decode()
 
     # -------------------------
     # Run Phase
@@ -118,26 +142,29 @@ class GoExecutor(BaseExecutor):
 
         payload = json.dumps({"function_name": self.function_name, "input": test_input}).encode()
 
-        exec_cmd = ["docker", "exec", "-i", self.container_id, "./main"]
+        exec_cmd = ["./main"]
 
-        proc = await asyncio.create_subprocess_exec(*exec_cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE)
         try:
-            stdout, stderr = await asyncio.wait_for(proc.communicate(payload), timeout=EXECUTION_TIMEOUT_SECONDS)
+            result = await get_docker().exec(
+                self.container_id, exec_cmd,
+                stdin=payload,
+                timeout=EXECUTION_TIMEOUT_SECONDS,
+                cpu_seconds=TEST_CPU_SECONDS_LIMIT,
+                limit=MAX_STDOUT_BYTES,
+            )
         except asyncio.TimeoutError:
-            proc.kill()
-            await proc.wait()
             raise RuntimeExecutionError("Execution timed out")
 
-        stdout_str = stdout.decode()
-
-        if len(stdout_str.encode("utf-8")) > MAX_STDOUT_BYTES:
+        if len(result.stdout) > MAX_STDOUT_BYTES:
             raise RuntimeExecutionError("Output limit exceeded")
 
-        if proc.returncode != 0:
+        stdout_str = result.stdout.decode()
+
+        if result.exit_code != 0:
             try:
                 message = json.loads(stdout_str).get("error", "Runtime error")
             except Exception:
-                message = stderr.decode() or "Runtime error"
+                message = result.stderr.decode() or "Runtime error"
             raise RuntimeExecutionError(message)
 
         try:
@@ -151,24 +178,10 @@ class GoExecutor(BaseExecutor):
 
     async def cleanup(self):
 
-        if self.container_id:
-            proc = await asyncio.create_subprocess_exec(
-                "docker", "rm", "-f", self.container_id,
-                stdout=DEVNULL, stderr=DEVNULL,
-            )
-            try:
-                await asyncio.wait_for(proc.wait(), timeout=15.0)
-            except asyncio.TimeoutError:
-                # Docker daemon is frozen; we abandon waiting to prevent deadlocking the worker slot
-                proc.kill()
-                await proc.wait()
-                
-            self.container_id = None
-
-        if self.temp_dir:
-            shutil.rmtree(self.temp_dir, ignore_errors=True)
-            self.temp_dir = None
-            self.host_temp_dir = None
+        await release_sandbox(self.container_id, self.temp_dir)
+        self.container_id = None
+        self.temp_dir = None
+        self.host_temp_dir = None
 
     # -------------------------
     # Wrapper Generation
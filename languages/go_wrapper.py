@@ -1,42 +1,19 @@
-GO_WRAPPER_TEMPLATE = r"""
-package main
+# Harness package: the converters every submission shares, prebuilt into
+# go-sandbox's build cache (docker/go.Dockerfile) so a submission's build
+# compiles only its own main.go.  The node types stay in the generated main
+# package, where solutions may declare methods on them; the converters are
+# generic over them and reach their fields through the accessors the glue
+# passes in.
+GO_HARNESS_IMPORT = "sandbox.local/sandboxharness"
+
+GO_HARNESS_PACKAGE = r"""
+package sandboxharness
 
 import (
-    "encoding/json"
-    "fmt"
-    "io"
-    "os"
     "reflect"
     "sort"
-    "strings"
 )
 
-type payload struct {
-    FunctionName string                     `json:"function_name"`
-    Input        map[string]json.RawMessage `json:"input"`
-}
-
-type output struct {
-    Result interface{} `json:"result,omitempty"`
-    Error  string      `json:"error,omitempty"`
-}
-
-type ListNode struct {
-    Val  int
-    Next *ListNode
-}
-
-type TreeNode struct {
-    Val   int
-    Left  *TreeNode
-    Right *TreeNode
-}
-
-type Node struct {
-    Val       int
-    Neighbors []*Node
-}
-
 func toInt(value interface{}) (int, bool) {
     switch v := value.(type) {
     case float64:
@@ -54,47 +31,47 @@ func toInt(value interface{}) (int, bool) {
     }
 }
 
-func buildLinkedList(values []int, pos int) *ListNode {
+func BuildLinkedList[N any](values []int, pos int, newNode func(int) *N, setNext func(node, next *N)) *N {
     if len(values) == 0 {
         return nil
     }
 
-    dummy := &ListNode{}
-    curr := dummy
-    nodes := make([]*ListNode, 0, len(values))
+    nodes := make([]*N, 0, len(values))
 
     for _, v := range values {
-        curr.Next = &ListNode{Val: v}
-        curr = curr.Next
+        curr := newNode(v)
+        if len(nodes) > 0 {
+            setNext(nodes[len(nodes)-1], curr)
+        }
         nodes = append(nodes, curr)
     }
 
     if pos >= 0 && pos < len(nodes) {
-        nodes[len(nodes)-1].Next = nodes[pos]
+        setNext(nodes[len(nodes)-1], nodes[pos])
     }
 
-    return dummy.Next
+    return nodes[0]
 }
 
-func linkedListToArray(head *ListNode) []int {
+func LinkedListToArray[N any](head *N, val func(*N) int, next func(*N) *N) []int {
     result := make([]int, 0)
-    visited := map[*ListNode]bool{}
+    visited := map[*N]bool{}
 
     for head != nil && !visited[head] {
         visited[head] = true
-        result = append(result, head.Val)
-        head = head.Next
+        result = append(result, val(head))
+        head = next(head)
     }
 
     return result
 }
 
-func buildTree(values []interface{}) *TreeNode {
+func BuildTree[N any](values []interface{}, newNode func(int) *N, setChildren func(node, left, right *N)) *N {
     if len(values) == 0 || values[0] == nil {
         return nil
     }
 
-    nodes := make([]*TreeNode, len(values))
+    nodes := make([]*N, len(values))
     for i, raw := range values {
         if raw == nil {
             continue
@@ -103,7 +80,7 @@ func buildTree(values []interface{}) *TreeNode {
         if !ok {
             return nil
         }
-        nodes[i] = &TreeNode{Val: iv}
+        nodes[i] = newNode(iv)
     }
 
     pos := 1
@@ -111,26 +88,28 @@ func buildTree(values []interface{}) *TreeNode {
         if nodes[i] == nil {
             continue
         }
+        var left, right *N
         if pos < len(nodes) {
-            nodes[i].Left = nodes[pos]
+            left = nodes[pos]
             pos++
         }
         if pos < len(nodes) {
-            nodes[i].Right = nodes[pos]
+            right = nodes[pos]
             pos++
         }
+        setChildren(nodes[i], left, right)
     }
 
     return nodes[0]
 }
 
-func treeToArray(root *TreeNode) []interface{} {
+func TreeToArray[N any](root *N, val func(*N) int, children func(*N) (*N, *N)) []interface{} {
     if root == nil {
         return []interface{}{}
     }
 
     result := make([]interface{}, 0)
-    queue := []*TreeNode{root}
+    queue := []*N{root}
 
     for len(queue) > 0 {
         curr := queue[0]
@@ -141,8 +120,9 @@ func treeToArray(root *TreeNode) []interface{} {
             continue
         }
 
-        result = append(result, curr.Val)
-        queue = append(queue, curr.Left, curr.Right)
+        left, right := children(curr)
+        result = append(result, val(curr))
+        queue = append(queue, left, right)
     }
 
     for len(result) > 0 && result[len(result)-1] == nil {
@@ -152,20 +132,20 @@ func treeToArray(root *TreeNode) []interface{} {
     return result
 }
 
-func buildGraph(adjList [][]int) *Node {
+func BuildGraph[N any](adjList [][]int, newNode func(int) *N, addNeighbor func(node, neighbor *N)) *N {
     if len(adjList) == 0 {
         return nil
     }
 
-    nodes := make([]*Node, len(adjList))
+    nodes := make([]*N, len(adjList))
     for i := range adjList {
-        nodes[i] = &Node{Val: i + 1}
+        nodes[i] = newNode(i + 1)
     }
 
     for i, neighbors := range adjList {
         for _, n := range neighbors {
             if n >= 1 && n <= len(nodes) {
-                nodes[i].Neighbors = append(nodes[i].Neighbors, nodes[n-1])
+                addNeighbor(nodes[i], nodes[n-1])
             }
         }
     }
@@ -173,14 +153,14 @@ func buildGraph(adjList [][]int) *Node {
     return nodes[0]
 }
 
-func graphToAdjList(node *Node) [][]int {
+func GraphToAdjList[N any](node *N, val func(*N) int, neighbors func(*N) []*N) [][]int {
     if node == nil {
         return [][]int{}
     }
 
-    visited := map[*Node]bool{}
-    queue := []*Node{node}
-    ordered := make([]*Node, 0)
+    visited := map[*N]bool{}
+    queue := []*N{node}
+    ordered := make([]*N, 0)
     maxVal := 0
 
     for len(queue) > 0 {
@@ -193,11 +173,11 @@ func graphToAdjList(node *Node) [][]int {
 
         visited[curr] = true
         ordered = append(ordered, curr)
-        if curr.Val > maxVal {
-            maxVal = curr.Val
+        if val(curr) > maxVal {
+            maxVal = val(curr)
         }
 
-        for _, neighbor := range curr.Neighbors {
+        for _, neighbor := range neighbors(curr) {
             if neighbor != nil && !visited[neighbor] {
                 queue = append(queue, neighbor)
             }
@@ -205,23 +185,132 @@ func graphToAdjList(node *Node) [][]int {
     }
 
     sort.Slice(ordered, func(i, j int) bool {
-        return ordered[i].Val < ordered[j].Val
+        return val(ordered[i]) < val(ordered[j])
     })
 
     result := make([][]int, maxVal)
     for _, curr := range ordered {
-        row := make([]int, 0, len(curr.Neighbors))
-        for _, neighbor := range curr.Neighbors {
+        row := make([]int, 0, len(neighbors(curr)))
+        for _, neighbor := range neighbors(curr) {
             if neighbor != nil {
-                row = append(row, neighbor.Val)
+                row = append(row, val(neighbor))
             }
         }
-        result[curr.Val-1] = row
+        result[val(curr)-1] = row
     }
 
     return result
 }
 
+// NormalizeOutput converts results other than node types.
+func NormalizeOutput(value interface{}) interface{} {
+    if value == nil {
+        return nil
+    }
+
+    rv := reflect.ValueOf(value)
+    if rv.Kind() == reflect.Slice && rv.IsNil() {
+        return []interface{}{}
+    }
+
+    return value
+}
+"""
+
+# go.mod written next to main.go; the harness package comes from the image.
+GO_MOD = f"""module solution
+
+go 1.22
+
+require {GO_HARNESS_IMPORT} v0.0.0
+
+replace {GO_HARNESS_IMPORT} => /opt/go/harness
+"""
+
+GO_WRAPPER_TEMPLATE = r"""
+package main
+
+import (
+    "bufio"
+    "encoding/json"
+    "fmt"
+    "io"
+    "os"
+    "reflect"
+    "sort"
+    "strings"
+
+    "sandbox.local/sandboxharness"
+)
+
+// reflect and sort stay imported for user code, as when the helpers lived here.
+var (
+    _ = reflect.ValueOf
+    _ = sort.Ints
+)
+
+type payload struct {
+    FunctionName string                     `json:"function_name"`
+    Input        map[string]json.RawMessage `json:"input"`
+}
+
+type output struct {
+    Result interface{} `json:"result,omitempty"`
+    Error  string      `json:"error,omitempty"`
+}
+
+type ListNode struct {
+    Val  int
+    Next *ListNode
+}
+
+type TreeNode struct {
+    Val   int
+    Left  *TreeNode
+    Right *TreeNode
+}
+
+type Node struct {
+    Val       int
+    Neighbors []*Node
+}
+
+func buildLinkedList(values []int, pos int) *ListNode {
+    return sandboxharness.BuildLinkedList(values, pos,
+        func(v int) *ListNode { return &ListNode{Val: v} },
+        func(node, next *ListNode) { node.Next = next })
+}
+
+func linkedListToArray(head *ListNode) []int {
+    return sandboxharness.LinkedListToArray(head,
+        func(node *ListNode) int { return node.Val },
+        func(node *ListNode) *ListNode { return node.Next })
+}
+
+func buildTree(values []interface{}) *TreeNode {
+    return sandboxharness.BuildTree(values,
+        func(v int) *TreeNode { return &TreeNode{Val: v} },
+        func(node, left, right *TreeNode) { node.Left, node.Right = left, right })
+}
+
+func treeToArray(root *TreeNode) []interface{} {
+    return sandboxharness.TreeToArray(root,
+        func(node *TreeNode) int { return node.Val },
+        func(node *TreeNode) (*TreeNode, *TreeNode) { return node.Left, node.Right })
+}
+
+func buildGraph(adjList [][]int) *Node {
+    return sandboxharness.BuildGraph(adjList,
+        func(v int) *Node { return &Node{Val: v} },
+        func(node, neighbor *Node) { node.Neighbors = append(node.Neighbors, neighbor) })
+}
+
+func graphToAdjList(node *Node) [][]int {
+    return sandboxharness.GraphToAdjList(node,
+        func(node *Node) int { return node.Val },
+        func(node *Node) []*Node { return node.Neighbors })
+}
+
 func autoConvertOutput(value interface{}) interface{} {
     switch v := value.(type) {
     case *ListNode:
@@ -240,21 +329,8 @@ func autoConvertOutput(value interface{}) interface{} {
         vv := v
         return graphToAdjList(&vv)
     default:
-        return normalizeGenericOutput(value)
-    }
-}
-
-func normalizeGenericOutput(value interface{}) interface{} {
-    if value == nil {
-        return nil
-    }
-
-    rv := reflect.ValueOf(value)
-    if rv.Kind() == reflect.Slice && rv.IsNil() {
-        return []interface{}{}
+        return sandboxharness.NormalizeOutput(value)
     }
-
-    return value
 }
 
 {source_code}
@@ -266,38 +342,68 @@ __INVOKER_SETUP_PLACEHOLDER__
 __CALL_PLACEHOLDER__
 }
 
-func main() {
-    raw, err := io.ReadAll(os.Stdin)
-    if err != nil {
-        _ = json.NewEncoder(os.Stdout).Encode(output{Error: "failed to read input"})
-        os.Exit(1)
-    }
-
+func runOne(raw []byte) (output, bool) {
     if len(strings.TrimSpace(string(raw))) == 0 {
-        _ = json.NewEncoder(os.Stdout).Encode(output{Error: "no input provided"})
-        os.Exit(1)
+        return output{Error: "no input provided"}, false
     }
 
     var p payload
     if err := json.Unmarshal(raw, &p); err != nil {
-        _ = json.NewEncoder(os.Stdout).Encode(output{Error: "invalid JSON input"})
-        os.Exit(1)
+        return output{Error: "invalid JSON input"}, false
     }
 
     if p.FunctionName != "" && p.FunctionName != "__FUNCTION_NAME_PLACEHOLDER__" {
-        _ = json.NewEncoder(os.Stdout).Encode(output{
+        return output{
             Error: fmt.Sprintf("function '%s' not found", p.FunctionName),
-        })
-        os.Exit(1)
+        }, false
     }
 
     result, execErr := execute(p.Input)
     if execErr != nil {
-        _ = json.NewEncoder(os.Stdout).Encode(output{Error: execErr.Error()})
+        return output{Error: execErr.Error()}, false
+    }
+
+    return output{Result: result}, true
+}
+
+// One payload per input line, one result/error frame per output line.
+func harness() {
+    reader := bufio.NewReader(os.Stdin)
+    encoder := json.NewEncoder(os.Stdout)
+
+    for {
+        line, err := reader.ReadBytes('\n')
+        if len(strings.TrimSpace(string(line))) > 0 {
+            out, _ := runOne(line)
+            if encErr := encoder.Encode(out); encErr != nil {
+                _ = encoder.Encode(output{Error: "failed to serialize output"})
+            }
+        }
+        if err != nil {
+            return
+        }
+    }
+}
+
+func main() {
+    if len(os.Args) > 1 && os.Args[1] == "--harness" {
+        harness()
+        return
+    }
+
+    raw, err := io.ReadAll(os.Stdin)
+    if err != nil {
+        _ = json.NewEncoder(os.Stdout).Encode(output{Error: "failed to read input"})
+        os.Exit(1)
+    }
+
+    out, ok := runOne(raw)
+    if !ok {
+        _ = json.NewEncoder(os.Stdout).Encode(out)
         os.Exit(1)
     }
 
-    if err := json.NewEncoder(os.Stdout).Encode(output{Result: result}); err != nil {
+    if err := json.NewEncoder(os.Stdout).Encode(out); err != nil {
         _ = json.NewEncoder(os.Stdout).Encode(output{Error: "failed to serialize output"})
         os.Exit(1)
     }
@@ -1,10 +1,16 @@
-JAVA_WRAPPER_TEMPLATE = r"""
+# Imports in scope for user code.  Also the header of Solution.java when the
+# user code is compiled on its own against the prebuilt harness jar.
+JAVA_IMPORTS = r"""
 import java.io.*;
 import java.lang.reflect.*;
 import java.util.*;
 import com.fasterxml.jackson.databind.ObjectMapper;
 import com.fasterxml.jackson.core.type.TypeReference;
+"""
 
+# Rendered with empty user code this is the source of the harness jar built
+# into java-sandbox (docker/java.Dockerfile).
+JAVA_WRAPPER_TEMPLATE = JAVA_IMPORTS + r"""
 // ==============================
 // Built-in Data Structures
 // ==============================
@@ -283,8 +289,53 @@ public class Main {
         throw new Exception("Function '" + functionName + "' not found");
     }
 
+    // One payload per input line, one result/error frame per output line.
+    public static void harness() throws IOException {
+
+        BufferedReader reader = new BufferedReader(new InputStreamReader(System.in));
+        String line;
+
+        while ((line = reader.readLine()) != null) {
+
+            if (line.trim().isEmpty())
+                continue;
+
+            String frame;
+
+            try {
+                Map<String, Object> payload =
+                    mapper.readValue(line, new TypeReference<Map<String, Object>>() {});
+
+                String functionName = (String) payload.get("function_name");
+                Map<String, Object> input =
+                    (Map<String, Object>) payload.get("input");
+
+                Map<String, Object> response = new HashMap<>();
+                response.put("result", executeFunction(functionName, input));
+                frame = mapper.writeValueAsString(response);
+
+            } catch (Exception e) {
+                Map<String, Object> error = new HashMap<>();
+                error.put("error", e.getMessage());
+                frame = mapper.writeValueAsString(error);
+            }
+
+            System.out.println(frame);
+            System.out.flush();
+        }
+    }
+
     public static void main(String[] args) {
 
+        if (args.length > 0 && args[0].equals("--harness")) {
+            try {
+                harness();
+            } catch (IOException e) {
+                System.exit(1);
+            }
+            return;
+        }
+
         try {
 
             BufferedReader reader = new BufferedReader(new InputStreamReader(System.in));
@@ -321,4 +372,7 @@ public class Main {
         }
     }
 }
-"""
\ No newline at end of file
+"""
+
+# Classes the harness jar defines; user code may not redefine them.
+JAVA_HARNESS_CLASSES = ["TreeNode", "ListNode", "Node", "Builders", "Main"]
@@ -1,39 +1,64 @@
 import asyncio
-import tempfile
+import logging
 import os
 import json
-import shutil
 
 from execution.base import BaseExecutor
 from execution.exceptions import (
     CompileError,
+    CompileServerError,
     RuntimeExecutionError,
 )
-from execution.sandbox_paths import (
-    build_host_temp_dir,
-    get_sandbox_roots,
+from execution.container_pool import acquire_sandbox
+from execution.cleanup import release_sandbox
+from execution.workspace import download_workspace, upload_workspace
+from execution.compile_server import get_compile_server
+from execution.docker_client import get_docker
+from execution.artifact_cache import (
+    artifact_key,
+    lookup_artifact,
+    restore_artifact,
+    store_artifact,
+    store_compile_error,
 )
 from config.limits import (
     EXECUTION_TIMEOUT_SECONDS,
     COMPILATION_TIMEOUT_SECONDS,
-    DOCKER_MEMORY_LIMIT,
-    DOCKER_MEMORY_SWAP,
-    DOCKER_CPU_LIMIT,
-    DOCKER_PIDS_LIMIT,
-    DOCKER_NOFILE_LIMIT,
     MAX_STDOUT_BYTES,
-    CONTAINER_SLEEP_SECONDS,
+    TEST_CPU_SECONDS_LIMIT,
 )
 
-from .kotlin_wrapper import KOTLIN_WRAPPER_TEMPLATE
+from .java import JACKSON_CLASSPATH, jvm_launch_options
+from .kotlin_wrapper import KOTLIN_IMPORTS, KOTLIN_HARNESS_CLASSES
 
-PIPE = asyncio.subprocess.PIPE
-DEVNULL = asyncio.subprocess.DEVNULL
+log = logging.getLogger(__name__)
+
+# TreeNode, ListNode, Node, Builders and Main from KOTLIN_WRAPPER_TEMPLATE,
+# prebuilt into java-sandbox; submissions compile only their own Solution.kt.
+KOTLIN_HARNESS_JAR = "/opt/harness/kotlin-harness.jar"
+KOTLIN_COMPILE_CLASSPATH = f"/opt/kotlinc/lib/kotlin-stdlib.jar:{JACKSON_CLASSPATH}:{KOTLIN_HARNESS_JAR}"
 
 
 class KotlinExecutor(BaseExecutor):
 
     IMAGE_NAME = "java-sandbox:latest"  # same image (has kotlinc + JDK)
+    RUN_COMMAND = [
+        "java", *jvm_launch_options("/opt/cds/kotlin.jsa"),
+        "-cp", f"{KOTLIN_COMPILE_CLASSPATH}:.",
+        "Main",
+    ]
+    HARNESS_COMMAND = RUN_COMMAND + ["--harness"]
+    # The embedded K2JVMCompiler; kotlin-compiler.jar brings the rest of
+    # /opt/kotlinc/lib through its manifest class path.
+    COMPILE_SERVER_COMMAND = [
+        "java", "-XX:+UseSerialGC", "-Xmx768m", "-Xss2m", "-XX:+ExitOnOutOfMemoryError",
+        "-Didea.io.use.nio2=true",
+        "-cp", f"{JACKSON_CLASSPATH}:/opt/compile-server:/opt/kotlinc/lib/kotlin-compiler.jar",
+        "CompileServer", "kotlinc", KOTLIN_COMPILE_CLASSPATH,
+    ]
+    # The stdlib is passed explicitly (it is the runtime's only Kotlin jar).
+    COMPILE_OPTIONS = ["-no-stdlib", "-no-reflect", "-cp", KOTLIN_COMPILE_CLASSPATH]
+    ARTIFACTS = ["*.class", "META-INF"]
 
     def __init__(self, code: str, function_name: str):
         super().__init__(code, function_name)
@@ -48,60 +73,86 @@ class KotlinExecutor(BaseExecutor):
 
     async def compile(self):
 
-        container_sandbox_root, host_sandbox_root = get_sandbox_roots()
-
-        self.temp_dir = tempfile.mkdtemp(dir=container_sandbox_root)
-        self.host_temp_dir = build_host_temp_dir(host_sandbox_root, self.temp_dir)
-
-        self.file_path = os.path.join(self.temp_dir, "Main.kt")
-
-        wrapped_code = KOTLIN_WRAPPER_TEMPLATE.replace("{source_code}", self.code)
-
-        with open(self.file_path, "w") as f:
-            f.write(wrapped_code)
-
-        run_cmd = [
-            "docker", "run",
-            "-d", "--rm",
-            "--memory", DOCKER_MEMORY_LIMIT,
-            "--memory-swap", DOCKER_MEMORY_SWAP,
-            "--cpus", DOCKER_CPU_LIMIT,
-            "--pids-limit", DOCKER_PIDS_LIMIT,
-            "--ulimit", f"nofile={DOCKER_NOFILE_LIMIT}:{DOCKER_NOFILE_LIMIT}",
-            "--network", "none",
-            "--cap-drop", "ALL",
-            "--security-opt", "no-new-privileges",
-            "-v", f"{self.host_temp_dir}:/app",
-            "-w", "/app",
-            self.IMAGE_NAME,
-            "sleep", str(CONTAINER_SLEEP_SECONDS),
-        ]
-
-        proc = await asyncio.create_subprocess_exec(*run_cmd, stdout=PIPE, stderr=PIPE)
-        stdout, _ = await proc.communicate()
-        if proc.returncode != 0:
-            raise RuntimeExecutionError("Failed to start execution container")
-        self.container_id = stdout.decode().strip()
+        source = KOTLIN_IMPORTS + self.code
 
         compile_cmd = [
-            "docker", "exec", self.container_id,
-            "kotlinc", "Main.kt",
-            "-cp", "/opt/libs/jackson-core.jar:/opt/libs/jackson-databind.jar:/opt/libs/jackson-annotations.jar",
+            "kotlinc", "Solution.kt",
+            *self.COMPILE_OPTIONS,
             "-d", ".",
             "-J-Xms64m", "-J-Xmx256m",
             "-J-XX:+UseSerialGC", "-J-XX:TieredStopAtLevel=1",
         ]
 
-        proc = await asyncio.create_subprocess_exec(*compile_cmd, stdout=PIPE, stderr=PIPE)
+        cache_key = await artifact_key("kotlin", self.IMAGE_NAME, [source], compile_cmd)
+        cached = await lookup_artifact(cache_key)
+        if cached and cached.error is not None:
+            raise CompileError(cached.error)
+
+        sandbox = await acquire_sandbox(self.IMAGE_NAME)
+        self.container_id = sandbox.container_id
+        self.temp_dir = sandbox.temp_dir
+        self.host_temp_dir = sandbox.host_temp_dir
+
+        if cached and await restore_artifact(cached, self.temp_dir):
+            await upload_workspace(self.container_id, self.temp_dir)
+            return
+
+        self.file_path = os.path.join(self.temp_dir, "Solution.kt")
+
+        with open(self.file_path, "w") as f:
+            f.write(source)
+
         try:
-            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=COMPILATION_TIMEOUT_SECONDS)
+            ok, output = await self._kotlinc(compile_cmd)
         except asyncio.TimeoutError:
-            proc.kill()
-            await proc.wait()
             raise CompileError("Compilation timed out")
 
-        if proc.returncode != 0:
-            raise CompileError(stderr.decode().strip() or "Compilation failed")
+        if ok:
+            # Sources shadow the harness jar; the old single Main.kt rejected
+            # these as redeclarations, and so do we.
+            redefined = [
+                name for name in KOTLIN_HARNESS_CLASSES
+                if os.path.exists(os.path.join(self.temp_dir, f"{name}.class"))
+            ]
+            if redefined:
+                ok, output = False, f"Solution.kt: error: redeclaration: {redefined[0]}"
+
+        if not ok:
+            message = output.strip() or "Compilation failed"
+            await store_compile_error(cache_key, message)
+            raise CompileError(message)
+
+        await store_artifact(cache_key, self.temp_dir, self.ARTIFACTS)
+
+    async def _kotlinc(self, compile_cmd: list[str]) -> tuple[bool, str]:
+        """
+        Compile Solution.kt with the compile server, else in the sandbox;
+        either way the classes end up in the workspace and in the sandbox.
+        """
+        server = get_compile_server("kotlin")
+        if server is not None:
+            try:
+                async with server.staged(self.temp_dir) as workspace:
+                    ok, output = await server.compile(
+                        "kotlinc",
+                        [*self.COMPILE_OPTIONS, "-d", workspace],
+                        [f"{workspace}/Solution.kt"],
+                        timeout=COMPILATION_TIMEOUT_SECONDS,
+                    )
+                if ok:
+                    await upload_workspace(self.container_id, self.temp_dir)
+                return ok, output.replace(f"{workspace}/", "")
+            except CompileServerError as e:
+                log.warning(f"Kotlin compile server failed, compiling in the sandbox: {e}")
+
+        await upload_workspace(self.container_id, self.temp_dir)
+        result = await get_docker().exec(
+            self.container_id, compile_cmd,
+            timeout=COMPILATION_TIMEOUT_SECONDS,
+        )
+        if result.exit_code == 0:
+            await download_workspace(self.container_id, self.temp_dir, self.ARTIFACTS)
+        return result.exit_code == 0, result.stderr.decode()
 
     # -------------------------
     # Run Phase
@@ -114,31 +165,29 @@ class KotlinExecutor(BaseExecutor):
 
         payload = json.dumps({"function_name": self.function_name, "input": test_input}).encode()
 
-        exec_cmd = [
-            "docker", "exec", "-i", self.container_id,
-            "java",
-            "-cp", ".:/opt/kotlinc/lib/kotlin-stdlib.jar:/opt/libs/jackson-core.jar:/opt/libs/jackson-databind.jar:/opt/libs/jackson-annotations.jar",
-            "Main",
-        ]
+        exec_cmd = self.RUN_COMMAND
 
-        proc = await asyncio.create_subprocess_exec(*exec_cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE)
         try:
-            stdout, stderr = await asyncio.wait_for(proc.communicate(payload), timeout=EXECUTION_TIMEOUT_SECONDS)
+            result = await get_docker().exec(
+                self.container_id, exec_cmd,
+                stdin=payload,
+                timeout=EXECUTION_TIMEOUT_SECONDS,
+                cpu_seconds=TEST_CPU_SECONDS_LIMIT,
+                limit=MAX_STDOUT_BYTES,
+            )
         except asyncio.TimeoutError:
-            proc.kill()
-            await proc.wait()
             raise RuntimeExecutionError("Execution timed out")
 
-        stdout_str = stdout.decode()
-
-        if len(stdout_str.encode("utf-8")) > MAX_STDOUT_BYTES:
+        if len(result.stdout) > MAX_STDOUT_BYTES:
             raise RuntimeExecutionError("Output limit exceeded")
 
-        if proc.returncode != 0:
+        stdout_str = result.stdout.decode()
+
+        if result.exit_code != 0:
             try:
                 message = json.loads(stdout_str).get("error", "Runtime error")
             except Exception:
-                message = stderr.decode() or "Runtime error"
+                message = result.stderr.decode() or "Runtime error"
             raise RuntimeExecutionError(message)
 
         try:
@@ -152,15 +201,7 @@ class KotlinExecutor(BaseExecutor):
 
     async def cleanup(self):
 
-        if self.container_id:
-            proc = await asyncio.create_subprocess_exec(
-                "docker", "rm", "-f", self.container_id,
-                stdout=DEVNULL, stderr=DEVNULL,
-            )
-            await proc.wait()
-            self.container_id = None
-
-        if self.temp_dir:
-            shutil.rmtree(self.temp_dir, ignore_errors=True)
-            self.temp_dir = None
-            self.host_temp_dir = None
+        await release_sandbox(self.container_id, self.temp_dir)
+        self.container_id = None
+        self.temp_dir = None
+        self.host_temp_dir = None
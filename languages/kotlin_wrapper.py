@@ -1,4 +1,6 @@
-KOTLIN_WRAPPER_TEMPLATE = r"""
+# Imports in scope for user code.  Also the header of Solution.kt when the
+# user code is compiled on its own against the prebuilt harness jar.
+KOTLIN_IMPORTS = r"""
 import java.io.BufferedReader
 import java.io.InputStreamReader
 import java.lang.reflect.InvocationTargetException
@@ -6,7 +8,11 @@ import java.lang.reflect.Method
 import java.util.*
 import com.fasterxml.jackson.databind.ObjectMapper
 import com.fasterxml.jackson.core.type.TypeReference
+"""
 
+# Rendered with empty user code this is the source of the harness jar built
+# into java-sandbox (docker/java.Dockerfile).
+KOTLIN_WRAPPER_TEMPLATE = KOTLIN_IMPORTS + r"""
 // ==============================
 // Built-in Data Structures
 // ==============================
@@ -253,9 +259,45 @@ object Main {
         throw Exception("Function '$functionName' not found")
     }
 
+    // One payload per input line, one result/error frame per output line.
+    private fun harness() {
+
+        val reader = BufferedReader(InputStreamReader(System.`in`))
+
+        while (true) {
+            val line = reader.readLine() ?: break
+            if (line.isBlank()) continue
+
+            val frame = try {
+                val payload: Map<String, Any?> =
+                    mapper.readValue(line, object : TypeReference<Map<String, Any?>>() {})
+
+                val functionName = payload["function_name"] as String
+                val input = payload["input"] as Map<String, Any?>
+
+                val response = HashMap<String, Any?>()
+                response["result"] = executeFunction(functionName, input)
+                mapper.writeValueAsString(response)
+
+            } catch (e: Exception) {
+                val error = HashMap<String, Any?>()
+                error["error"] = e.message
+                mapper.writeValueAsString(error)
+            }
+
+            println(frame)
+            System.out.flush()
+        }
+    }
+
     @JvmStatic
     fun main(args: Array<String>) {
 
+        if (args.isNotEmpty() && args[0] == "--harness") {
+            harness()
+            return
+        }
+
         try {
             val reader = BufferedReader(InputStreamReader(System.`in`))
             val inputBuilder = StringBuilder()
@@ -290,4 +332,7 @@ object Main {
         }
     }
 }
-"""
\ No newline at end of file
+"""
+
+# Classes the harness jar defines; user code may not redefine them.
+KOTLIN_HARNESS_CLASSES = ["TreeNode", "ListNode", "Node", "Builders", "Main"]
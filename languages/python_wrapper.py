@@ -5,6 +5,12 @@ import traceback
 import inspect
 from collections import deque
 
+import gc as _gc
+import os as _os
+import select as _select
+import signal as _signal
+import time as _time
+
 # ==============================
 # Built-in Data Structures
 # ==============================
@@ -267,7 +273,129 @@ def main():
         sys.exit(1)
 
 
+def harness():
+    # One payload per input line, one result/error frame per output line.
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+
+        try:
+            payload = json.loads(line)
+            result = execute_function(payload["function_name"], payload["input"])
+            frame = json.dumps({"result": result})
+        except Exception as e:
+            frame = json.dumps({
+                "error": str(e),
+                "trace": traceback.format_exc()
+            })
+
+        sys.stdout.write(frame + "\\n")
+        sys.stdout.flush()
+
+
+def run_in_child(line):
+    # Runs in the forked child: stdout (user prints and the frame) goes to the
+    # parent through a pipe, stdin is closed so user code cannot eat payloads.
+    try:
+        payload = json.loads(line)
+        result = execute_function(payload["function_name"], payload["input"])
+        frame = json.dumps({"result": result})
+    except Exception as e:
+        frame = json.dumps({
+            "error": str(e),
+            "trace": traceback.format_exc()
+        })
+
+    sys.stdout.write(frame + "\\n")
+    sys.stdout.flush()
+
+
+def collect_child(pid, read_fd, timeout, limit):
+    deadline = _time.monotonic() + timeout
+    chunks = []
+    size = 0
+
+    try:
+        while True:
+            remaining = deadline - _time.monotonic()
+            if remaining <= 0:
+                return json.dumps({"error": "Execution timed out"})
+
+            ready, _, _ = _select.select([read_fd], [], [], remaining)
+            if not ready:
+                continue
+
+            data = _os.read(read_fd, 65536)
+            if not data:
+                break
+
+            size += len(data)
+            if size > limit:
+                return json.dumps({"error": "Output limit exceeded"})
+            chunks.append(data)
+
+        _, status = _os.waitpid(pid, 0)
+        pid = None
+
+        output = b"".join(chunks).decode(errors="replace").rstrip("\\n")
+        if output:
+            return output
+        if _os.WIFSIGNALED(status):
+            return json.dumps({"error": f"Killed by signal {_os.WTERMSIG(status)}"})
+        return json.dumps({"error": "Runtime error"})
+
+    finally:
+        _os.close(read_fd)
+        if pid is not None:
+            # The child leads its own process group; take anything it spawned too.
+            try:
+                _os.killpg(pid, _signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            _os.waitpid(pid, 0)
+
+
+def zygote(timeout, limit):
+    # Harness variant that keeps this process (wrapper and user code loaded,
+    # imports done) as a template and forks a copy-on-write child per test, so
+    # a test cannot see global state left behind by the previous one.
+    _gc.freeze()
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+
+        read_fd, write_fd = _os.pipe()
+        sys.stdout.flush()
+        pid = _os.fork()
+
+        if pid == 0:
+            try:
+                _os.setpgid(0, 0)
+                _os.close(read_fd)
+                _os.dup2(write_fd, 1)
+                _os.close(write_fd)
+                devnull = _os.open(_os.devnull, _os.O_RDONLY)
+                _os.dup2(devnull, 0)
+                sys.stdin = open(_os.devnull)
+                run_in_child(line)
+            finally:
+                _os._exit(0)
+
+        _os.close(write_fd)
+        frame = collect_child(pid, read_fd, timeout, limit)
+        sys.stdout.write(frame + "\\n")
+        sys.stdout.flush()
+
+
 if __name__ == "__main__":
-    main()
+    args = sys.argv[1:]
+    if "--zygote" in args:
+        i = args.index("--zygote")
+        zygote(float(args[i + 1]), int(args[i + 2]))
+    elif "--harness" in args:
+        harness()
+    else:
+        main()
 
 """
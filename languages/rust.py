@@ -2,35 +2,48 @@ import asyncio
 import json
 import os
 import re
-import shutil
-import tempfile
 
 from config.limits import (
     COMPILATION_TIMEOUT_SECONDS,
-    CONTAINER_SLEEP_SECONDS,
-    DOCKER_CPU_LIMIT,
-    DOCKER_MEMORY_LIMIT,
-    DOCKER_MEMORY_SWAP,
-    DOCKER_NOFILE_LIMIT,
-    DOCKER_PIDS_LIMIT,
     EXECUTION_TIMEOUT_SECONDS,
     MAX_STDOUT_BYTES,
+    TEST_CPU_SECONDS_LIMIT,
 )
 from execution.base import BaseExecutor
 from execution.exceptions import CompileError, RuntimeExecutionError
-from execution.sandbox_paths import build_host_temp_dir, get_sandbox_roots
+from execution.container_pool import acquire_sandbox
+from execution.cleanup import release_sandbox
+from execution.workspace import download_workspace, upload_workspace
+from execution.docker_client import get_docker
+from execution.artifact_cache import (
+    artifact_key,
+    lookup_artifact,
+    restore_artifact,
+    store_artifact,
+    store_compile_error,
+)
 
 from .rust_wrapper import RUST_WRAPPER_TEMPLATE
 
-PIPE = asyncio.subprocess.PIPE
-DEVNULL = asyncio.subprocess.DEVNULL
-
-
 class RustExecutor(BaseExecutor):
 
     IMAGE_NAME = "rust-sandbox:latest"
-    VENDORED_SOURCE_DIR = "/opt/cache/runner/vendor"
-    SHARED_TARGET_DIR = "/opt/cache/runner/target"
+    HARNESS_COMMAND = ["./runner", "--harness"]
+    # rustc directly, without cargo, against the prebuilt serde_json and
+    # harness rlibs named in /opt/rust/extern.args (docker/rust.Dockerfile).
+    # Tuned for compile latency (see benchmarks/rust_compile.py): opt-level=2
+    # runs as fast as 3 for typical solutions but compiles quicker, and one
+    # codegen unit avoids partitioning overhead for a single small crate.
+    # Warnings are not reported; deny-by-default lints still fail the build.
+    RUSTC_OPTIONS = [
+        "--edition", "2021",
+        "-C", "opt-level=2",
+        "-C", "codegen-units=1",
+        "-C", "debuginfo=0",
+        "-A", "warnings",
+        "@/opt/rust/extern.args",
+    ]
+    ARTIFACTS = ["runner"]
 
     def __init__(self, code: str, function_name: str):
         super().__init__(code, function_name)
@@ -44,84 +57,48 @@ class RustExecutor(BaseExecutor):
 
     async def compile(self):
 
-        container_root, host_root = get_sandbox_roots()
-
-        self.temp_dir = tempfile.mkdtemp(dir=container_root)
-        self.host_temp_dir = build_host_temp_dir(host_root, self.temp_dir)
-
         wrapped_code = self._generate_wrapper()
 
         if "__PLACEHOLDER__" in wrapped_code or "__FUNCTION_" in wrapped_code:
             raise CompileError("Wrapper placeholder replacement failed")
 
-        src_dir = os.path.join(self.temp_dir, "src")
-        os.makedirs(src_dir, exist_ok=True)
+        compile_cmd = ["rustc", *self.RUSTC_OPTIONS, "-o", "runner", "main.rs"]
 
-        with open(os.path.join(src_dir, "main.rs"), "w") as f:
-            f.write(wrapped_code)
+        cache_key = await artifact_key("rust", self.IMAGE_NAME, [wrapped_code], compile_cmd)
+        cached = await lookup_artifact(cache_key)
+        if cached and cached.error is not None:
+            raise CompileError(cached.error)
 
-        cargo_toml = """
-[package]
-name = "runner"
-version = "0.1.0"
-edition = "2021"
-
-[dependencies]
-serde_json = "1"
-"""
-        with open(os.path.join(self.temp_dir, "Cargo.toml"), "w") as f:
-            f.write(cargo_toml)
-
-        cargo_config_dir = os.path.join(self.temp_dir, ".cargo")
-        os.makedirs(cargo_config_dir, exist_ok=True)
-        cargo_config = f"""[source.crates-io]
-replace-with = "vendored-sources"
-
-[source.vendored-sources]
-directory = "{self.VENDORED_SOURCE_DIR}"
-"""
-        with open(os.path.join(cargo_config_dir, "config.toml"), "w") as f:
-            f.write(cargo_config)
-
-        run_cmd = [
-            "docker", "run",
-            "-d", "--rm",
-            "--memory", DOCKER_MEMORY_LIMIT,
-            "--memory-swap", DOCKER_MEMORY_SWAP,
-            "--cpus", DOCKER_CPU_LIMIT,
-            "--pids-limit", DOCKER_PIDS_LIMIT,
-            "--ulimit", f"nofile={DOCKER_NOFILE_LIMIT}:{DOCKER_NOFILE_LIMIT}",
-            "--network", "none",
-            "--cap-drop", "ALL",
-            "--security-opt", "no-new-privileges",
-            "-v", f"{self.host_temp_dir}:/app",
-            "-w", "/app",
-            self.IMAGE_NAME,
-            "sleep", str(CONTAINER_SLEEP_SECONDS),
-        ]
+        sandbox = await acquire_sandbox(self.IMAGE_NAME)
+        self.container_id = sandbox.container_id
+        self.temp_dir = sandbox.temp_dir
+        self.host_temp_dir = sandbox.host_temp_dir
 
-        proc = await asyncio.create_subprocess_exec(*run_cmd, stdout=PIPE, stderr=PIPE)
-        stdout, _ = await proc.communicate()
-        if proc.returncode != 0:
-            raise RuntimeExecutionError("Failed to start Rust container")
-        self.container_id = stdout.decode().strip()
+        if cached and await restore_artifact(cached, self.temp_dir):
+            await upload_workspace(self.container_id, self.temp_dir)
+            return
 
-        compile_cmd = [
-            "docker", "exec", self.container_id,
-            "cargo", "build", "--release", "--offline",
-            "--target-dir", self.SHARED_TARGET_DIR,
-        ]
+        with open(os.path.join(self.temp_dir, "main.rs"), "w") as f:
+            f.write(wrapped_code)
+
+        await upload_workspace(self.container_id, self.temp_dir)
 
-        proc = await asyncio.create_subprocess_exec(*compile_cmd, stdout=PIPE, stderr=PIPE)
         try:
-            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=COMPILATION_TIMEOUT_SECONDS)
+            result = await get_docker().exec(
+                self.container_id, compile_cmd,
+                timeout=COMPILATION_TIMEOUT_SECONDS,
+            )
         except asyncio.TimeoutError:
-            proc.kill()
-            await proc.wait()
             raise CompileError("Compilation timed out")
 
-        if proc.returncode != 0:
-            raise CompileError(stderr.decode().strip()[:1000])
+        if result.exit_code != 0:
+            message = result.stderr.decode().strip()[:1000]
+            await store_compile_error(cache_key, message)
+            raise CompileError(message)
+
+        if cache_key is not None:
+            await download_workspace(self.container_id, self.temp_dir, self.ARTIFACTS)
+            await store_artifact(cache_key, self.temp_dir, self.ARTIFACTS)
 
     # ==========================================================
     # Run Phase
@@ -134,27 +111,27 @@ directory = "{self.VENDORED_SOURCE_DIR}"
 
         payload = json.dumps(test_input, separators=(",", ":")).encode()
 
-        exec_cmd = [
-            "docker", "exec", "-i", self.container_id,
-            f"{self.SHARED_TARGET_DIR}/release/runner",
-        ]
+        exec_cmd = ["./runner"]
 
-        proc = await asyncio.create_subprocess_exec(*exec_cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE)
         try:
-            stdout, stderr = await asyncio.wait_for(proc.communicate(payload), timeout=EXECUTION_TIMEOUT_SECONDS)
+            result = await get_docker().exec(
+                self.container_id, exec_cmd,
+                stdin=payload,
+                timeout=EXECUTION_TIMEOUT_SECONDS,
+                cpu_seconds=TEST_CPU_SECONDS_LIMIT,
+                limit=MAX_STDOUT_BYTES,
+            )
         except asyncio.TimeoutError:
-            proc.kill()
-            await proc.wait()
             raise RuntimeExecutionError("Execution timed out")
 
-        stdout_str = stdout.decode()
-
-        if len(stdout_str.encode("utf-8")) > MAX_STDOUT_BYTES:
+        if len(result.stdout) > MAX_STDOUT_BYTES:
             raise RuntimeExecutionError("Output limit exceeded")
 
-        if proc.returncode != 0:
+        stdout_str = result.stdout.decode()
+
+        if result.exit_code != 0:
             raise RuntimeExecutionError(
-                stderr.decode().strip() or stdout_str.strip() or "Runtime error"
+                result.stderr.decode().strip() or stdout_str.strip() or "Runtime error"
             )
 
         try:
@@ -162,24 +139,21 @@ directory = "{self.VENDORED_SOURCE_DIR}"
         except Exception:
             raise RuntimeExecutionError("Invalid JSON output")
 
+    def harness_payload(self, test_input: dict):
+        # The generated wrapper is specialised to one function and reads the
+        # bare test input.
+        return test_input
+
     # ==========================================================
     # Cleanup
     # ==========================================================
 
     async def cleanup(self):
 
-        if self.container_id:
-            proc = await asyncio.create_subprocess_exec(
-                "docker", "rm", "-f", self.container_id,
-                stdout=DEVNULL, stderr=DEVNULL,
-            )
-            await proc.wait()
-            self.container_id = None
-
-        if self.temp_dir:
-            shutil.rmtree(self.temp_dir, ignore_errors=True)
-            self.temp_dir = None
-            self.host_temp_dir = None
+        await release_sandbox(self.container_id, self.temp_dir)
+        self.container_id = None
+        self.temp_dir = None
+        self.host_temp_dir = None
 
     # ==========================================================
     # Wrapper Generator
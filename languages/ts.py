@@ -1,41 +1,61 @@
 import asyncio
-import tempfile
 import os
 import json
-import shutil
 
 from execution.base import BaseExecutor
 from execution.exceptions import (
     CompileError,
     RuntimeExecutionError,
 )
-from execution.sandbox_paths import (
-    build_host_temp_dir,
-    get_sandbox_roots,
+from execution.container_pool import acquire_sandbox
+from execution.cleanup import release_sandbox
+from execution.workspace import download_workspace, upload_workspace
+from execution.docker_client import get_docker
+from execution.artifact_cache import (
+    artifact_key,
+    lookup_artifact,
+    restore_artifact,
+    store_artifact,
+    store_compile_error,
 )
 
 from config.limits import (
     EXECUTION_TIMEOUT_SECONDS,
-    DOCKER_MEMORY_LIMIT,
-    DOCKER_MEMORY_SWAP,
-    DOCKER_PIDS_LIMIT,
-    DOCKER_NOFILE_LIMIT,
     MAX_STDOUT_BYTES,
     MAX_COMPILE_ERROR_BYTES,
-    CONTAINER_SLEEP_SECONDS,
     TS_CPU_LIMIT,
     TS_COMPILE_TIMEOUT_SECONDS,
+    TS_TYPE_CHECK,
+    TEST_CPU_SECONDS_LIMIT,
 )
 
 from .ts_wrapper import TS_WRAPPER_TEMPLATE
 
-PIPE = asyncio.subprocess.PIPE
-DEVNULL = asyncio.subprocess.DEVNULL
-
-
 class TypeScriptExecutor(BaseExecutor):
 
     IMAGE_NAME = "js-sandbox:latest"
+    HARNESS_COMMAND = ["node", "main.js", "--harness"]
+    ARTIFACTS = ["main.js"]
+
+    # esbuild only strips types, file by file, so it is on the critical path;
+    # tsc checks them, as TS_TYPE_CHECK says.
+    TRANSPILE_COMMAND = [
+        "esbuild", "main.ts",
+        "--outfile=main.js",
+        "--format=cjs",
+        "--platform=node",
+        "--target=es2020",
+        "--log-level=error",
+        "--color=false",
+    ]
+    TYPE_CHECK_COMMAND = [
+        "tsc", "main.ts",
+        "--noEmit",
+        "--target", "ES2020",
+        "--module", "commonjs",
+        "--lib", "ES2020",
+        "--skipLibCheck",
+    ]
 
     def __init__(self, code: str, function_name: str):
         super().__init__(code, function_name)
@@ -43,6 +63,7 @@ class TypeScriptExecutor(BaseExecutor):
         self.temp_dir = None
         self.host_temp_dir = None
         self.file_path = None
+        self.type_check: asyncio.Task | None = None
 
     # =============================
     # Compile Phase
@@ -50,76 +71,116 @@ class TypeScriptExecutor(BaseExecutor):
 
     async def compile(self):
 
-        container_sandbox_root, host_sandbox_root = get_sandbox_roots()
+        wrapped_code = TS_WRAPPER_TEMPLATE.replace("{source_code}", self.code)
 
-        self.temp_dir = tempfile.mkdtemp(dir=container_sandbox_root)
-        self.host_temp_dir = build_host_temp_dir(host_sandbox_root, self.temp_dir)
+        cache_key = await artifact_key("typescript", self.IMAGE_NAME, [wrapped_code], self.TRANSPILE_COMMAND)
+        cached = await lookup_artifact(cache_key)
+        if cached and cached.error is not None:
+            raise CompileError(cached.error)
+
+        # Type check outcomes are cached as well: a passed check as an empty
+        # entry, a failed one as a compile error.
+        check_key = None
+        if TS_TYPE_CHECK != "off":
+            check_key = await artifact_key(
+                "typescript-check", self.IMAGE_NAME, [wrapped_code], self.TYPE_CHECK_COMMAND,
+            )
+            checked = await lookup_artifact(check_key)
+            if checked and checked.error is not None:
+                raise CompileError(checked.error)
+            if checked:
+                check_key = None
 
-        self.file_path = os.path.join(self.temp_dir, "main.ts")
+        sandbox = await acquire_sandbox(self.IMAGE_NAME, cpus=TS_CPU_LIMIT)
+        self.container_id = sandbox.container_id
+        self.temp_dir = sandbox.temp_dir
+        self.host_temp_dir = sandbox.host_temp_dir
 
-        wrapped_code = TS_WRAPPER_TEMPLATE.replace("{source_code}", self.code)
+        self.file_path = os.path.join(self.temp_dir, "main.ts")
 
         with open(self.file_path, "w") as f:
             f.write(wrapped_code)
 
-        run_cmd = [
-            "docker", "run",
-            "-d", "--rm",
-            "--memory", DOCKER_MEMORY_LIMIT,
-            "--memory-swap", DOCKER_MEMORY_SWAP,
-            "--cpus", TS_CPU_LIMIT,
-            "--pids-limit", DOCKER_PIDS_LIMIT,
-            "--ulimit", f"nofile={DOCKER_NOFILE_LIMIT}:{DOCKER_NOFILE_LIMIT}",
-            "--network", "none",
-            "--cap-drop", "ALL",
-            "--security-opt", "no-new-privileges",
-            "-v", f"{self.host_temp_dir}:/app",
-            "-w", "/app",
-            self.IMAGE_NAME,
-            "sleep", str(CONTAINER_SLEEP_SECONDS),
-        ]
-
-        proc = await asyncio.create_subprocess_exec(*run_cmd, stdout=PIPE, stderr=PIPE)
-        stdout, _ = await proc.communicate()
-        if proc.returncode != 0:
-            raise RuntimeExecutionError("Failed to start execution container")
-        self.container_id = stdout.decode().strip()
-
-        compile_cmd = [
-            "docker", "exec", self.container_id,
-            "tsc", "main.ts",
-            "--target", "ES2020",
-            "--module", "commonjs",
-            "--lib", "ES2020",
-            "--skipLibCheck",
-        ]
-
-        proc = await asyncio.create_subprocess_exec(*compile_cmd, stdout=PIPE, stderr=PIPE)
+        restored = bool(cached) and await restore_artifact(cached, self.temp_dir)
+        await upload_workspace(self.container_id, self.temp_dir)
+
+        if check_key and TS_TYPE_CHECK == "blocking":
+            await self._type_check(self.container_id, check_key)
+
+        if not restored:
+            await self._transpile(cache_key)
+
+        if check_key and TS_TYPE_CHECK == "parallel":
+            self.type_check = asyncio.create_task(self._isolated_type_check(check_key, wrapped_code))
+            # Retrieved by verify(); not an unhandled error if cleanup() comes first.
+            self.type_check.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+    async def _transpile(self, cache_key: str):
+
         try:
-            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=TS_COMPILE_TIMEOUT_SECONDS)
+            result = await get_docker().exec(
+                self.container_id, self.TRANSPILE_COMMAND,
+                timeout=TS_COMPILE_TIMEOUT_SECONDS,
+            )
         except asyncio.TimeoutError:
-            proc.kill()
-            await proc.wait()
-            await self.cleanup()
             raise CompileError("Compilation timed out")
 
-        if proc.returncode != 0:
-            error_message = (stderr.decode() or stdout.decode() or "").strip()
-            if len(error_message) > MAX_COMPILE_ERROR_BYTES:
-                error_message = error_message[:MAX_COMPILE_ERROR_BYTES]
-            await self.cleanup()
-            raise CompileError(error_message or "TypeScript compilation failed")
+        if result.exit_code != 0:
+            error_message = self._compile_error(result) or "TypeScript compilation failed"
+            await store_compile_error(cache_key, error_message)
+            raise CompileError(error_message)
 
         # Verify compiled JS exists
-        check_proc = await asyncio.create_subprocess_exec(
-            "docker", "exec", self.container_id, "test", "-f", "main.js",
-            stdout=DEVNULL, stderr=DEVNULL,
-        )
-        await check_proc.wait()
-        if check_proc.returncode != 0:
-            await self.cleanup()
+        check_result = await get_docker().exec(self.container_id, ["test", "-f", "main.js"])
+        if check_result.exit_code != 0:
             raise CompileError("Compilation failed: main.js not generated")
 
+        if cache_key is not None:
+            await download_workspace(self.container_id, self.temp_dir, self.ARTIFACTS)
+            await store_artifact(cache_key, self.temp_dir, self.ARTIFACTS)
+
+    async def _isolated_type_check(self, check_key: str, wrapped_code: str):
+
+        # The tests run (as root) in the submission's sandbox meanwhile and
+        # could rewrite main.ts before tsc reads it, so the check gets a
+        # sandbox of its own, with a copy no submitted code can reach.
+        sandbox = await acquire_sandbox(self.IMAGE_NAME, cpus=TS_CPU_LIMIT)
+        try:
+            with open(os.path.join(sandbox.temp_dir, "main.ts"), "w") as f:
+                f.write(wrapped_code)
+            await upload_workspace(sandbox.container_id, sandbox.temp_dir)
+            await self._type_check(sandbox.container_id, check_key)
+        finally:
+            await release_sandbox(sandbox.container_id, sandbox.temp_dir)
+
+    async def _type_check(self, container_id: str, check_key: str):
+
+        try:
+            result = await get_docker().exec(
+                container_id, self.TYPE_CHECK_COMMAND,
+                timeout=TS_COMPILE_TIMEOUT_SECONDS,
+            )
+        except asyncio.TimeoutError:
+            raise CompileError("Type check timed out")
+
+        if result.exit_code != 0:
+            error_message = self._compile_error(result) or "TypeScript type check failed"
+            await store_compile_error(check_key, error_message)
+            raise CompileError(error_message)
+
+        await store_artifact(check_key, self.temp_dir, [])
+
+    @staticmethod
+    def _compile_error(result) -> str:
+        # esbuild reports on stderr, tsc on stdout.
+        error_message = (result.stderr.decode() or result.stdout.decode() or "").strip()
+        return error_message[:MAX_COMPILE_ERROR_BYTES]
+
+    async def verify(self):
+
+        if self.type_check:
+            await self.type_check
+
     # =============================
     # Run Phase
     # =============================
@@ -131,35 +192,34 @@ class TypeScriptExecutor(BaseExecutor):
 
         payload = json.dumps({"function_name": self.function_name, "input": test_input}).encode()
 
-        exec_cmd = ["docker", "exec", "-i", self.container_id, "node", "main.js"]
+        exec_cmd = ["node", "main.js"]
 
-        proc = await asyncio.create_subprocess_exec(*exec_cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE)
         try:
-            stdout, stderr = await asyncio.wait_for(proc.communicate(payload), timeout=EXECUTION_TIMEOUT_SECONDS)
+            result = await get_docker().exec(
+                self.container_id, exec_cmd,
+                stdin=payload,
+                timeout=EXECUTION_TIMEOUT_SECONDS,
+                cpu_seconds=TEST_CPU_SECONDS_LIMIT,
+                limit=MAX_STDOUT_BYTES,
+            )
         except asyncio.TimeoutError:
-            proc.kill()
-            await proc.wait()
-            await self.cleanup()
             raise RuntimeExecutionError("Execution timed out")
 
-        stdout_str = stdout.decode()
-
-        if len(stdout_str.encode("utf-8")) > MAX_STDOUT_BYTES:
-            await self.cleanup()
+        if len(result.stdout) > MAX_STDOUT_BYTES:
             raise RuntimeExecutionError("Output limit exceeded")
 
-        if proc.returncode != 0:
+        stdout_str = result.stdout.decode()
+
+        if result.exit_code != 0:
             try:
                 message = json.loads(stdout_str).get("error", "Runtime error")
             except Exception:
-                message = stderr.decode().strip() or "Runtime error"
-            await self.cleanup()
+                message = result.stderr.decode().strip() or "Runtime error"
             raise RuntimeExecutionError(message)
 
         try:
             return json.loads(stdout_str)["result"]
         except Exception:
-            await self.cleanup()
             raise RuntimeExecutionError("Invalid output format")
 
     # =============================
@@ -168,15 +228,11 @@ class TypeScriptExecutor(BaseExecutor):
 
     async def cleanup(self):
 
-        if self.container_id:
-            proc = await asyncio.create_subprocess_exec(
-                "docker", "rm", "-f", self.container_id,
-                stdout=DEVNULL, stderr=DEVNULL,
-            )
-            await proc.wait()
-            self.container_id = None
+        if self.type_check:
+            self.type_check.cancel()
+            self.type_check = None
 
-        if self.temp_dir:
-            shutil.rmtree(self.temp_dir, ignore_errors=True)
-            self.temp_dir = None
-            self.host_temp_dir = None
+        await release_sandbox(self.container_id, self.temp_dir)
+        self.container_id = None
+        self.temp_dir = None
+        self.host_temp_dir = None
@@ -3,6 +3,8 @@ TS_WRAPPER_TEMPLATE = """
 // Minimal Node global declarations (avoid @types/node dependency)
 declare const process: any;
 declare const console: any;
+declare const require: any;
+declare const Buffer: any;
 
 // ==============================
 // Built-in Data Structures
@@ -266,31 +268,70 @@ function executeFunction(functionName: string, input: Record<string, any>): any
 // ==============================
 
 function main() {
-    const inputChunks: any[] = [];
+    const fs = require("fs");
+
+    // Synchronous stdin/stdout: setting up the process.stdin and
+    // process.stdout streams is most of what a one-test run costs on top of
+    // node's own startup.
+    const writeOutput = (text: string) => {
+        const data = Buffer.from(text);
+        let offset = 0;
+
+        // Short writes and EAGAIN happen once user code has created
+        // process.stdout, which makes the pipe non-blocking.
+        while (offset < data.length) {
+            try {
+                offset += fs.writeSync(1, data, offset);
+            } catch (err: any) {
+                if (err?.code !== "EAGAIN") throw err;
+            }
+        }
+    };
 
-    process.stdin.on("data", (chunk: any) => {
-        inputChunks.push(chunk);
-    });
+    try {
+        const payload = JSON.parse(fs.readFileSync(0, "utf8"));
 
-    process.stdin.on("end", () => {
-        try {
-            const rawInput = inputChunks.join("");
-            const payload = JSON.parse(rawInput);
+        const functionName = payload.function_name;
+        const testInput = payload.input;
 
-            const functionName = payload.function_name;
-            const testInput = payload.input;
+        const result = executeFunction(functionName, testInput);
 
-            const result = executeFunction(functionName, testInput);
+        writeOutput(JSON.stringify({ result }) + "\\n");
+    } catch (err: any) {
+        writeOutput(JSON.stringify({
+            error: err?.message || "Runtime error"
+        }) + "\\n");
+        process.exit(1);
+    }
+}
 
-            console.log(JSON.stringify({ result }));
+// ==============================
+// Harness (one payload per input line, one frame per output line)
+// ==============================
+
+function harness() {
+    const readline = require("readline");
+    const rl = readline.createInterface({ input: process.stdin, terminal: false });
+
+    rl.on("line", (line: string) => {
+        if (!line.trim()) return;
+
+        let frame;
+        try {
+            const payload = JSON.parse(line);
+            const result = executeFunction(payload.function_name, payload.input);
+            frame = JSON.stringify({ result });
         } catch (err: any) {
-            console.log(JSON.stringify({
-                error: err?.message || "Runtime error"
-            }));
-            process.exit(1);
+            frame = JSON.stringify({ error: err?.message || "Runtime error" });
         }
+
+        process.stdout.write(frame + "\\n");
     });
 }
 
-main();
+if (process.argv.includes("--harness")) {
+    harness();
+} else {
+    main();
+}
 """
\ No newline at end of file
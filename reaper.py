@@ -0,0 +1,50 @@
+"""
+Orphan reaper — remove sandbox containers and workspaces whose worker or job
+is gone (see execution/orphans.py).
+
+Usage:
+    python reaper.py           # sweep every ORPHAN_REAPER_INTERVAL_SECONDS
+    python reaper.py --once    # sweep twice (a leftover must be seen twice),
+                               # print what was reclaimed and exit
+
+Workers already run the same sweep unless ORPHAN_REAPER_ENABLED=0; run this on
+hosts where they do not.  It needs the workers' Redis, Docker Engine and
+CONTAINER_SANDBOX_ROOT.
+"""
+
+import asyncio
+import json
+import logging
+import sys
+
+from config.limits import ORPHAN_REAPER_INTERVAL_SECONDS
+from execution.orphans import OrphanReaper
+from jobqueue.job import WORKER_HEARTBEAT_TTL
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s [pid=%(process)d] %(message)s",
+)
+log = logging.getLogger(__name__)
+
+
+async def _main(once: bool) -> None:
+    reaper = OrphanReaper()
+
+    if once:
+        await reaper.sweep()
+        await asyncio.sleep(WORKER_HEARTBEAT_TTL)
+        await reaper.sweep()
+        print(json.dumps(reaper.stats()))
+        return
+
+    log.info(f"Orphan reaper sweeping every {ORPHAN_REAPER_INTERVAL_SECONDS}s")
+    await reaper.start()
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(_main("--once" in sys.argv[1:]))
+    except KeyboardInterrupt:
+        pass
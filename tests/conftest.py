@@ -0,0 +1,12 @@
+import fakeredis
+import pytest
+
+import jobqueue.redis_client as redis_client
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    """An in-process Redis (with Lua) behind get_redis()."""
+    server = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(redis_client, "_redis", server)
+    return server
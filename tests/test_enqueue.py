@@ -0,0 +1,229 @@
+"""
+jobqueue.job.enqueue() and the job lifecycle scripts: every outcome of
+_ENQUEUE_SCRIPT, and coalescing only onto jobs that are still live.
+"""
+
+import asyncio
+import json
+
+import pytest
+
+import jobqueue.job as job_queue
+from jobqueue.job import (
+    COALESCE_TTL,
+    DEDUP_LEASE_SECONDS,
+    IDEMPOTENCY_PREFIX,
+    JOB_PREFIX,
+    LEGACY_RESULT_PREFIX,
+    LEGACY_RESULT_TTL,
+    LEGACY_WAITERS_PREFIX,
+    enqueue,
+    list_queue_key,
+    mark_done,
+    mark_running,
+    stream_key,
+)
+
+
+def payload(code: str = "def f(): pass") -> dict:
+    return {"language": "python", "source_code": code, "function_name": "f", "test_cases": []}
+
+
+async def queued(redis, language: str = "python") -> list[dict]:
+    return [json.loads(raw) for raw in await redis.lrange(list_queue_key(language), 0, -1)]
+
+
+async def take(redis) -> dict:
+    """Pop the oldest queued job, as a worker would."""
+    return json.loads(await redis.rpop(list_queue_key("python")))
+
+
+def test_created(redis):
+    async def main():
+        job_id = await enqueue(payload())
+
+        [job] = await queued(redis)
+        assert job["job_id"] == job_id
+        assert json.loads(await redis.get(JOB_PREFIX + job_id)) == {"status": "queued"}
+        assert await redis.get(job["dedup_key"]) == job_id
+        assert 0 < await redis.ttl(job["dedup_key"]) <= COALESCE_TTL
+
+    asyncio.run(main())
+
+
+def test_created_on_stream(redis, monkeypatch):
+    monkeypatch.setattr(job_queue, "STREAM_TRANSPORT", True)
+
+    async def main():
+        job_id = await enqueue(payload())
+
+        [(_, fields)] = await redis.xrange(stream_key("python"))
+        assert json.loads(fields["job"])["job_id"] == job_id
+        assert await redis.llen(list_queue_key("python")) == 0
+
+    asyncio.run(main())
+
+
+def test_identical_payload_attaches(redis):
+    async def main():
+        first = await enqueue(payload())
+        second = await enqueue(payload())
+
+        assert second == first
+        assert len(await queued(redis)) == 1
+
+    asyncio.run(main())
+
+
+def test_idempotency_key_attaches(redis):
+    async def main():
+        first = await enqueue(payload(), "key")
+
+        assert await enqueue(payload(), "key") == first
+        assert len(await queued(redis)) == 1
+
+    asyncio.run(main())
+
+
+def test_idempotency_key_records_coalesced_job(redis):
+    async def main():
+        first = await enqueue(payload())
+        assert await enqueue(payload(), "key") == first
+
+        [idem_key] = await redis.keys(IDEMPOTENCY_PREFIX + "*")
+        assert json.loads(await redis.get(idem_key))["job"] == first
+
+    asyncio.run(main())
+
+
+def test_idempotency_key_mismatch(redis):
+    async def main():
+        await enqueue(payload("a = 1"), "key")
+
+        with pytest.raises(ValueError):
+            await enqueue(payload("a = 2"), "key")
+        assert len(await queued(redis)) == 1
+
+    asyncio.run(main())
+
+
+def test_moved_retries(redis, monkeypatch):
+    async def main():
+        first = await enqueue(payload(), "key")
+
+        # The key is repointed between enqueue() reading it and the script.
+        reads = []
+
+        def stale(value):
+            reads.append(value)
+            return "not-the-job" if len(reads) == 1 else json.loads(value)["job"]
+
+        monkeypatch.setattr(job_queue, "_idempotent_job", stale)
+        assert await enqueue(payload(), "key") == first
+        assert len(reads) == 2
+
+    asyncio.run(main())
+
+
+def test_full(redis, monkeypatch):
+    monkeypatch.setattr(job_queue, "MAX_QUEUE_DEPTH", 1)
+
+    async def main():
+        await enqueue(payload("a = 1"))
+
+        with pytest.raises(OverflowError):
+            await enqueue(payload("a = 2"))
+        assert len(await queued(redis)) == 1
+
+    asyncio.run(main())
+
+
+def test_running_job_attaches_on_a_lease(redis):
+    async def main():
+        first = await enqueue(payload())
+        job = await take(redis)
+        await mark_running(job)
+
+        assert 0 < await redis.ttl(job["dedup_key"]) <= DEDUP_LEASE_SECONDS
+        assert await enqueue(payload()) == first
+
+    asyncio.run(main())
+
+
+def test_dead_job_does_not_attach(redis):
+    async def main():
+        first = await enqueue(payload(), "key")
+        job = await take(redis)
+        await mark_running(job)
+        # Its worker died: the lease ran out.
+        await redis.delete(job["dedup_key"])
+
+        second = await enqueue(payload())
+        assert second != first
+        # Retries of the dead job's key follow the content index to the new job.
+        assert await enqueue(payload(), "key") == second
+
+    asyncio.run(main())
+
+
+def test_done_job(redis):
+    async def main():
+        first = await enqueue(payload(), "key")
+        job = await take(redis)
+        await mark_running(job)
+        await mark_done(job, {"verdict": "accepted"})
+
+        assert await redis.get(job["dedup_key"]) is None
+        # A retry with the key gets the finished job's result...
+        assert await enqueue(payload(), "key") == first
+        # ...while a new submission runs again.
+        assert await enqueue(payload()) != first
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("waiters, copies", [(None, 1), ("3", 3)])
+def test_done_job_feeds_old_api_processes(redis, waiters, copies):
+    async def main():
+        job_id = await enqueue(payload())
+        job = await take(redis)
+        if waiters:
+            # Counted by the enqueue script of an old API process.
+            await redis.set(LEGACY_WAITERS_PREFIX + job_id, waiters)
+        await mark_done(job, {"verdict": "accepted"})
+
+        results = await redis.lrange(LEGACY_RESULT_PREFIX + job_id, 0, -1)
+        assert [json.loads(result) for result in results] == [{"verdict": "accepted"}] * copies
+        assert 0 < await redis.ttl(LEGACY_RESULT_PREFIX + job_id) <= LEGACY_RESULT_TTL
+        assert not await redis.exists(LEGACY_WAITERS_PREFIX + job_id)
+
+    asyncio.run(main())
+
+
+def test_idempotency_key_mismatch_is_422(redis, monkeypatch):
+    from fastapi.testclient import TestClient
+    from api.main import app
+    import jobqueue.results
+
+    async def no_result(job_id, timeout):
+        return None
+
+    # A broken check attaches instead; fail fast rather than wait for a worker.
+    monkeypatch.setattr(jobqueue.results, "wait_for_job_result", no_result)
+
+    request = {
+        "language": "python",
+        "source_code": "def f(): pass",
+        "function_name": "f",
+        "test_cases": [{"input": {}, "expected_output": None}],
+    }
+    asyncio.run(enqueue(request, "key"))
+
+    with TestClient(app) as client:
+        response = client.post(
+            "/execute",
+            json={**request, "source_code": "def f(): return 1"},
+            headers={"Idempotency-Key": "key"},
+        )
+
+    assert response.status_code == 422
@@ -0,0 +1,247 @@
+"""
+BaseExecutor.run_tests() against fake harness sessions: ordering, the
+lowest-index-failure guarantee of the parallel runner, and which sessions
+are closed or killed on the way out.
+"""
+
+import asyncio
+import json
+
+import pytest
+
+import execution.base as base
+from execution.base import BaseExecutor
+from execution.docker_client import ExecSession
+from execution.exceptions import DockerError, RuntimeExecutionError
+
+
+class FakeSession(ExecSession):
+    """
+    Stands in for an ExecSession running the harness.  Each test input says
+    how the fake harness answers it: after `delay` seconds with its `result`,
+    an `error` frame or `output` bytes long; `hang` never answers.
+    """
+
+    stderr = b""
+
+    def __init__(self, slot: int):
+        # No stream behind it: every method that would use one is replaced.
+        self.slot = slot
+        self.sent: list[int] = []
+        self.closed = False
+        self.killed = False
+        self._pending: dict | None = None
+
+    async def send(self, data: bytes) -> None:
+        payload = json.loads(data)
+        self._pending = payload["input"]
+        self.sent.append(payload["input"]["i"])
+
+    async def readline(self, limit: int | None = None) -> bytes | None:
+        test, self._pending = self._pending, None
+        if test.get("hang"):
+            await asyncio.Event().wait()
+        await asyncio.sleep(test.get("delay", 0))
+        if "output" in test:
+            return b"x" * (limit + 1)
+        if "error" in test:
+            return json.dumps({"error": test["error"]}).encode()
+        return json.dumps({"result": test.get("result", test["i"])}).encode()
+
+    async def kill(self) -> None:
+        self.killed = True
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class FakeExecutor(BaseExecutor):
+
+    HARNESS_COMMAND = ["harness"]
+
+    def __init__(self, start_errors: tuple[int, ...] = ()):
+        super().__init__("", "f")
+        self.container_id = "c0ffee"
+        self.sessions: list[FakeSession] = []
+        self._start_errors = start_errors
+
+    async def _start_harness(self, tests: int) -> FakeSession:
+        slot = len(self.sessions)
+        session = FakeSession(slot)
+        self.sessions.append(session)
+        await asyncio.sleep(0)
+        if slot in self._start_errors:
+            raise DockerError("exec create failed")
+        return session
+
+    async def compile(self) -> None:
+        pass
+
+    async def run(self, test_input):
+        raise AssertionError("the harness runs every test")
+
+    async def cleanup(self) -> None:
+        pass
+
+
+def collect(executor, tests, concurrency, check=None, stop_after=None):
+    """Run the tests; the outputs yielded and the error raised, if any."""
+
+    async def main():
+        outputs = []
+        iterator = executor.run_tests(tests, concurrency, check)
+        try:
+            async for output in iterator:
+                outputs.append(output)
+                if stop_after is not None and len(outputs) == stop_after:
+                    break
+        except RuntimeExecutionError as e:
+            return outputs, e
+        finally:
+            await iterator.aclose()
+        return outputs, None
+
+    return asyncio.run(main())
+
+
+def sent(executor) -> set[int]:
+    return {i for session in executor.sessions for i in session.sent}
+
+
+def test_outputs_arrive_in_test_order():
+    tests = [{"i": i, "delay": 0.05 * (5 - i)} for i in range(6)]
+    executor = FakeExecutor()
+
+    outputs, error = collect(executor, tests, concurrency=3)
+
+    assert outputs == list(range(6))
+    assert error is None
+    assert len(executor.sessions) == 3
+    assert all(s.closed and not s.killed for s in executor.sessions)
+
+
+def test_failure_cancels_only_later_tests():
+    tests = [
+        {"i": 0},
+        {"i": 1, "delay": 0.2},
+        {"i": 2, "delay": 0.05, "error": "boom"},
+        {"i": 3, "hang": True},
+        {"i": 4},
+        {"i": 5},
+    ]
+    executor = FakeExecutor()
+
+    outputs, error = collect(executor, tests, concurrency=3)
+
+    # Test 1 was still running when test 2 failed and is waited for.
+    assert outputs == [0, 1]
+    assert str(error) == "boom"
+    assert sent(executor) == {0, 1, 2, 3}
+    assert all(s.closed for s in executor.sessions)
+    killed = {s.sent[-1] for s in executor.sessions if s.killed}
+    # The failed test's harness and the one cancelled mid-test.
+    assert killed == {2, 3}
+
+
+def test_lowest_failure_wins():
+    tests = [
+        {"i": 0},
+        {"i": 1, "delay": 0.2, "error": "first"},
+        {"i": 2, "error": "second"},
+        {"i": 3},
+    ]
+    executor = FakeExecutor()
+
+    outputs, error = collect(executor, tests, concurrency=2)
+
+    assert outputs == [0]
+    assert str(error) == "first"
+    assert 3 not in sent(executor)
+
+
+def test_wrong_answer_stops_later_tests():
+    tests = [
+        {"i": 0},
+        {"i": 1, "delay": 0.1, "result": "wrong"},
+        {"i": 2, "hang": True},
+        {"i": 3},
+    ]
+    executor = FakeExecutor()
+
+    outputs, error = collect(
+        executor, tests, concurrency=2,
+        check=lambda index, output: output == index,
+    )
+
+    # The caller sees the wrong answer and stops there itself.
+    assert outputs[:2] == [0, "wrong"]
+    assert error is None
+    assert 3 not in sent(executor)
+    assert all(s.closed for s in executor.sessions)
+    assert [s.sent[-1] for s in executor.sessions if s.killed] == [2]
+
+
+def test_timeout_kills_the_session(monkeypatch):
+    monkeypatch.setattr(base, "EXECUTION_TIMEOUT_SECONDS", 0.05)
+    tests = [{"i": 0}, {"i": 1, "hang": True}, {"i": 2}, {"i": 3}]
+    executor = FakeExecutor()
+
+    outputs, error = collect(executor, tests, concurrency=2)
+
+    assert outputs == [0]
+    assert str(error) == "Execution timed out"
+    assert all(s.closed for s in executor.sessions)
+    assert [s.sent[-1] for s in executor.sessions if s.killed] == [1]
+
+
+def test_caller_stopping_early_cancels_the_rest():
+    tests = [{"i": 0}, {"i": 1, "hang": True}, {"i": 2, "hang": True}]
+    executor = FakeExecutor()
+
+    outputs, error = collect(executor, tests, concurrency=2, stop_after=1)
+
+    assert outputs == [0]
+    assert error is None
+    assert all(s.closed for s in executor.sessions)
+    assert {s.sent[-1] for s in executor.sessions if s.killed} == {1, 2}
+
+
+def test_partial_harness_start_failure():
+    tests = [{"i": i} for i in range(4)]
+    executor = FakeExecutor(start_errors=(1,))
+
+    outputs, error = collect(executor, tests, concurrency=3)
+
+    assert outputs == []
+    assert isinstance(error, DockerError)
+    assert sent(executor) == set()
+    started = [s for s in executor.sessions if s.slot != 1]
+    assert all(s.closed and not s.killed for s in started)
+
+
+@pytest.mark.parametrize("test", [
+    {"i": 1, "output": True},
+    {"i": 1, "hang": True},
+])
+def test_sequential_failure_kills_the_session(monkeypatch, test):
+    monkeypatch.setattr(base, "EXECUTION_TIMEOUT_SECONDS", 0.05)
+    executor = FakeExecutor()
+
+    outputs, error = collect(executor, [{"i": 0}, test, {"i": 2}], concurrency=1)
+
+    assert outputs == [0]
+    assert error is not None
+    [session] = executor.sessions
+    assert session.sent == [0, 1]
+    assert session.closed and session.killed
+
+
+def test_sequential_early_stop_only_closes():
+    executor = FakeExecutor()
+
+    outputs, error = collect(executor, [{"i": 0}, {"i": 1}], concurrency=1, stop_after=1)
+
+    assert outputs == [0]
+    [session] = executor.sessions
+    assert session.sent == [0]
+    assert session.closed and not session.killed
@@ -0,0 +1,159 @@
+"""
+Stream transport: lease renewal, reclaiming jobs of a dead worker and
+settling jobs that hit STREAM_MAX_DELIVERIES (jobqueue/job.py, worker.py).
+"""
+
+import asyncio
+import json
+
+import pytest
+
+import jobqueue.job as job_queue
+import worker
+from jobqueue.job import (
+    STREAM_GROUP,
+    claim_stalled_jobs,
+    enqueue,
+    ensure_stream_groups,
+    get_job_status,
+    read_jobs,
+    renew_lease,
+    stream_key,
+)
+
+LEASE = 1   # second, in place of STREAM_LEASE_SECONDS (XAUTOCLAIM takes whole ms)
+
+
+@pytest.fixture(autouse=True)
+def stream_transport(monkeypatch):
+    monkeypatch.setattr(job_queue, "STREAM_TRANSPORT", True)
+    monkeypatch.setattr(job_queue, "STREAM_LEASE_SECONDS", LEASE)
+    monkeypatch.setattr(worker, "STREAM_LEASE_SECONDS", LEASE)
+    monkeypatch.setattr(worker, "WORKER_LANGUAGES", ["python"])
+
+
+def payload(code: str = "def f(): pass") -> dict:
+    return {"language": "python", "source_code": code, "function_name": "f", "test_cases": []}
+
+
+async def submit(consumer: str = "dead") -> tuple[tuple[str, str], str]:
+    """Queue a job and lease it to `consumer`; its (entry, job id)."""
+    await ensure_stream_groups(worker._served_streams())
+    job_id = await enqueue(payload())
+    [(entry, _)] = await read_jobs(consumer, [stream_key("python")], 1, 0)
+    return entry, job_id
+
+
+async def pending(redis) -> int:
+    return (await redis.xpending(stream_key("python"), STREAM_GROUP))["pending"]
+
+
+def test_stalled_entry_is_reclaimed(redis, monkeypatch):
+    monkeypatch.setattr(worker, "STREAM_CONSUMER", "alive")
+
+    async def main():
+        entry, job_id = await submit()
+        # Still within its lease.
+        assert await worker._sweep(1) == []
+
+        await asyncio.sleep(LEASE * 1.5)
+        [(claimed, job_data)] = await worker._sweep(1)
+
+        assert claimed == entry
+        assert json.loads(job_data)["job_id"] == job_id
+        [info] = await redis.xpending_range(stream_key("python"), STREAM_GROUP, "-", "+", 1)
+        assert info["consumer"] == "alive"
+        assert info["times_delivered"] == 2
+
+    asyncio.run(main())
+
+
+def test_renewed_lease_is_not_reclaimed(redis):
+    async def main():
+        entry, _ = await submit("busy")
+        await asyncio.sleep(LEASE * 0.75)
+        await renew_lease("busy", entry)
+        await asyncio.sleep(LEASE * 0.75)
+
+        assert await claim_stalled_jobs("other", [stream_key("python")], 1) == []
+
+    asyncio.run(main())
+
+
+def test_running_job_keeps_its_lease(redis, monkeypatch):
+    async def slow_job(job_data):
+        await asyncio.sleep(LEASE * 3)
+
+    monkeypatch.setattr(worker, "STREAM_CONSUMER", "busy")
+    monkeypatch.setattr(worker, "_process", slow_job)
+
+    async def main():
+        entry, _ = await submit("busy")
+        capacity = asyncio.Semaphore(0)
+        run = asyncio.create_task(worker._run_stream_job(entry, "{}", capacity, True))
+
+        await asyncio.sleep(LEASE * 2)
+        assert await claim_stalled_jobs("other", [stream_key("python")], 1) == []
+
+        await run
+        # Acked and deleted once done.
+        assert await pending(redis) == 0
+        assert await redis.xlen(stream_key("python")) == 0
+
+    asyncio.run(main())
+
+
+def test_failed_store_leaves_the_entry_pending(redis, monkeypatch):
+    async def broken_job(job_data):
+        raise ConnectionError("Redis went away")
+
+    monkeypatch.setattr(worker, "_process", broken_job)
+
+    async def main():
+        entry, _ = await submit("busy")
+        await worker._run_stream_job(entry, "{}", asyncio.Semaphore(0), True)
+
+        assert await pending(redis) == 1
+
+    asyncio.run(main())
+
+
+def test_finished_job_is_acked_not_rerun(redis, monkeypatch):
+    monkeypatch.setattr(worker, "STREAM_CONSUMER", "alive")
+
+    async def main():
+        entry, job_id = await submit()
+        # Its worker stored the result, then died before acking.
+        await job_queue.mark_done({"job_id": job_id}, {"verdict": "accepted"})
+        await asyncio.sleep(LEASE * 1.5)
+
+        assert await worker._sweep(1) == []
+        assert await pending(redis) == 0
+        assert (await get_job_status(job_id))["result"] == {"verdict": "accepted"}
+
+    asyncio.run(main())
+
+
+def test_job_fails_after_max_deliveries(redis, monkeypatch):
+    monkeypatch.setattr(worker, "STREAM_CONSUMER", "alive")
+
+    async def main():
+        _, job_id = await submit()
+        reruns = 0
+
+        # Every worker that takes it over dies too.
+        while True:
+            await asyncio.sleep(LEASE * 1.5)
+            jobs = await worker._sweep(1)
+            if not jobs:
+                break
+            reruns += 1
+
+        assert reruns == worker.STREAM_MAX_DELIVERIES - 1
+        status = await get_job_status(job_id)
+        assert status["status"] == "done"
+        assert status["result"]["verdict"] == "error"
+        assert await pending(redis) == 0
+        assert await redis.xlen(stream_key("python")) == 0
+
+    asyncio.run(main())
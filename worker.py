@@ -8,19 +8,86 @@ Each worker process runs WORKER_CONCURRENCY async slots.  To scale,
 run multiple processes (or containers) pointing at the same Redis instance.
 Each slot independently BRPOPs from the queue, so there is no central
 coordination needed.
+
+Jobs are queued per language.  A worker serves the languages listed in
+WORKER_LANGUAGES (default: all) and pulls from their queues in a weighted
+random order that favours images it is warm for — idle pooled containers or
+a recent job — so it mostly keeps getting jobs it can start quickly, but
+takes any served language when those queues are empty.
+
+With QUEUE_TRANSPORT=stream a single reader per process instead leases up
+to WORKER_CONCURRENCY jobs at a time from the job stream (one XREADGROUP
+for as many jobs as there are idle slots), renews the lease of every job it
+runs, acks it once the result is stored and periodically takes over jobs
+whose worker died; see jobqueue/job.py.
+
+Unless CONTAINER_POOL_ENABLED=0, the worker also keeps a pool of pre-started
+sandbox containers (see execution/container_pool.py), logs its stats every
+POOL_STATS_INTERVAL seconds and publishes them to Redis with every heartbeat
+for GET /health, and unless COMPILE_SERVER_ENABLED=0 it keeps
+warm compiler daemons for the languages that have them (see
+execution/compile_server.py).
+
+Unless BACKGROUND_CLEANUP_ENABLED=0, finished sandboxes are removed by a
+background reaper (see execution/cleanup.py) rather than before the result is
+stored; while more than CLEANUP_MAX_BACKLOG of them wait to be removed the
+worker takes no new jobs.
+
+Every container the worker starts is labelled with its identity (WORKER_ID,
+kept alive in Redis by a heartbeat) and its job; unless
+ORPHAN_REAPER_ENABLED=0 the worker also periodically removes containers and
+workspaces whose owner or job is gone (see execution/orphans.py, or run
+reaper.py standalone).
 """
 
 import asyncio
 import json
 import logging
 import os
+import random
 import signal
 import time
 
 from jobqueue.redis_client import get_redis
-from jobqueue.job import QUEUE_KEY, JOB_MAX_AGE, mark_done, mark_running
+from jobqueue.job import (
+    QUEUE_KEY,
+    STREAM_KEY,
+    JOB_MAX_AGE,
+    STREAM_TRANSPORT,
+    STREAM_LEASE_SECONDS,
+    STREAM_MAX_DELIVERIES,
+    mark_done,
+    mark_running,
+    renew_dedup,
+    get_job_status,
+    list_queue_key,
+    stream_key,
+    ensure_stream_groups,
+    read_jobs,
+    claim_stalled_jobs,
+    renew_lease,
+    ack_job,
+    prune_consumers,
+    pop_list_jobs,
+    heartbeat_worker,
+    publish_pool_stats,
+    withdraw_pool_stats,
+    WORKER_HEARTBEAT_SECONDS,
+)
 from execution.pipeline import ExecutionPipeline
-from config.limits import WORKER_CONCURRENCY as _DEFAULT_CONCURRENCY
+from execution.executor import ExecutorFactory
+from execution.container_pool import get_container_pool, start_container_pool, stop_container_pool
+from execution.compile_server import start_compile_servers, stop_compile_servers
+from execution.cleanup import get_cleanup_reaper, start_cleanup_reaper, stop_cleanup_reaper
+from execution.orphans import start_orphan_reaper, stop_orphan_reaper
+from execution.ownership import WORKER_ID, current_job
+from config.limits import (
+    WORKER_CONCURRENCY as _DEFAULT_CONCURRENCY,
+    WORKER_WARM_AFFINITY,
+    WORKER_WARM_WINDOW_SECONDS,
+    CONTAINER_POOL_SIZES,
+    CLEANUP_MAX_BACKLOG,
+)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -30,8 +97,22 @@ log = logging.getLogger(__name__)
 
 WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", str(_DEFAULT_CONCURRENCY)))
 BRPOP_TIMEOUT = 2   # seconds; short so shutdown is responsive
+CONTAINER_POOL_ENABLED = os.getenv("CONTAINER_POOL_ENABLED", "1") == "1"
+COMPILE_SERVER_ENABLED = os.getenv("COMPILE_SERVER_ENABLED", "1") == "1"
+BACKGROUND_CLEANUP_ENABLED = os.getenv("BACKGROUND_CLEANUP_ENABLED", "1") == "1"
+ORPHAN_REAPER_ENABLED = os.getenv("ORPHAN_REAPER_ENABLED", "1") == "1"
+POOL_STATS_INTERVAL = 60  # seconds
+WORKER_LANGUAGES = [
+    language.strip()
+    for language in os.getenv("WORKER_LANGUAGES", ",".join(ExecutorFactory.languages())).split(",")
+    if language.strip()
+]
+STREAM_BLOCK_MS = 2000    # short so shutdown is responsive
+STREAM_SWEEP_INTERVAL = 5  # seconds between stalled-job / list-queue sweeps
+STREAM_CONSUMER = WORKER_ID
 
 _shutdown = False
+_last_used: dict[str, float] = {}  # image -> monotonic time of the last job started here
 
 
 def _on_signal(signum, frame):
@@ -47,35 +128,90 @@ async def _process(job_data: str) -> None:
         log.error("Received malformed job JSON — discarding")
         return
 
-    job_id: str = job.get("job_id", "unknown")
+    job_id: str = job.setdefault("job_id", "unknown")
     payload: dict = job.get("payload", {})
     age: float = time.time() - job.get("enqueued_at", 0.0)
 
     if age > JOB_MAX_AGE:
         log.warning(f"job={job_id} sat in queue {age:.0f}s > {JOB_MAX_AGE}s limit, skipping")
-        await mark_done(job_id, {
+        await mark_done(job, {
             "verdict": "error",
             "error_message": f"Job expired after {age:.0f}s in queue",
         })
         return
 
-    await mark_running(job_id)
+    language = payload.get("language")
+    if language in WORKER_LANGUAGES:
+        _last_used[ExecutorFactory.image_for(language)] = time.monotonic()
+
+    await mark_running(job)
     log.info(f"job={job_id} started (waited {age:.1f}s in queue)")
 
+    # Containers started for the job carry its id (see execution/ownership.py).
+    token = current_job.set(job_id)
+    renew = asyncio.create_task(_keep_dedup(job))
     try:
         pipeline = ExecutionPipeline(payload)
         result = await pipeline.execute()
-        await mark_done(job_id, result)
+        await mark_done(job, result)
         log.info(f"job={job_id} done verdict={result.get('verdict')}")
     except ValueError as e:
-        await mark_done(job_id, {"verdict": "error", "error_message": str(e)})
+        await mark_done(job, {"verdict": "error", "error_message": str(e)})
         log.warning(f"job={job_id} rejected: {e}")
     except Exception:
         log.exception(f"job={job_id} unexpected error")
-        await mark_done(job_id, {
+        await mark_done(job, {
             "verdict": "error",
             "error_message": "Internal execution error",
         })
+    finally:
+        renew.cancel()
+        current_job.reset(token)
+
+
+async def _keep_dedup(job: dict) -> None:
+    # Identical submissions only coalesce onto the job while this runs.
+    while True:
+        await asyncio.sleep(WORKER_HEARTBEAT_SECONDS)
+        try:
+            await renew_dedup(job)
+        except Exception as e:
+            log.error(f"Dedup lease renewal for job={job['job_id']} failed: {e!r}")
+
+
+def _preferred_languages() -> list[str]:
+    """WORKER_LANGUAGES in a random order weighted towards warm images."""
+    pool = get_container_pool()
+    now = time.monotonic()
+    keyed = []
+
+    for language in WORKER_LANGUAGES:
+        image = ExecutorFactory.image_for(language)
+        warmth = pool.idle_count(image) if pool else 0
+        if now - _last_used.get(image, float("-inf")) < WORKER_WARM_WINDOW_SECONDS:
+            warmth += 1
+        weight = 1 + WORKER_WARM_AFFINITY * warmth
+        # Weighted random permutation: sort by u ** (1 / weight).
+        keyed.append((random.random() ** (1 / weight), language))
+
+    return [language for _, language in sorted(keyed, reverse=True)]
+
+
+async def _cleanup_caught_up() -> bool:
+    """
+    False while the cleanup reaper is too far behind to take another job
+    (after waiting up to BRPOP_TIMEOUT for it to catch up).
+    """
+    reaper = get_cleanup_reaper()
+    if reaper is None or reaper.backlog() <= CLEANUP_MAX_BACKLOG:
+        return True
+
+    try:
+        await asyncio.wait_for(reaper.wait_for_backlog(CLEANUP_MAX_BACKLOG), timeout=BRPOP_TIMEOUT)
+        return True
+    except asyncio.TimeoutError:
+        log.warning(f"Cleanup backlog at {reaper.backlog()} sandboxes — not taking new jobs")
+        return False
 
 
 async def _slot(slot_id: int) -> None:
@@ -87,8 +223,14 @@ async def _slot(slot_id: int) -> None:
     log.info(f"Slot {slot_id} ready")
 
     while not _shutdown:
+        if not await _cleanup_caught_up():
+            continue
+
         try:
-            item = await r.brpop(QUEUE_KEY, timeout=BRPOP_TIMEOUT)
+            # BRPOP takes from the first non-empty key; the pre-routing
+            # queue comes last.
+            keys = [list_queue_key(language) for language in _preferred_languages()]
+            item = await r.brpop(keys + [QUEUE_KEY], timeout=BRPOP_TIMEOUT)
         except Exception as e:
             log.error(f"Slot {slot_id} Redis error: {e!r} — retrying in 1s")
             await asyncio.sleep(1)
@@ -104,15 +246,223 @@ async def _slot(slot_id: int) -> None:
     log.info(f"Slot {slot_id} exited")
 
 
+def _served_streams() -> list[str]:
+    return [stream_key(language) for language in WORKER_LANGUAGES] + [STREAM_KEY]
+
+
+async def _keep_lease(entry: tuple[str, str]) -> None:
+    while True:
+        await asyncio.sleep(STREAM_LEASE_SECONDS / 3)
+        try:
+            await renew_lease(STREAM_CONSUMER, entry)
+        except Exception as e:
+            log.error(f"Lease renewal for {entry[1]} failed: {e!r}")
+
+
+async def _run_stream_job(
+    entry: tuple[str, str] | None,
+    job_data: str,
+    capacity: asyncio.Semaphore,
+    has_slot: bool,
+) -> None:
+    """Run one job; stream entries are acked only once their result is stored."""
+    renew = asyncio.create_task(_keep_lease(entry)) if entry else None
+    try:
+        if not has_slot:
+            await capacity.acquire()
+        await _process(job_data)
+        if entry:
+            await ack_job(entry)
+    except Exception as e:
+        log.error(f"Stream entry {entry} left pending for reclaim: {e!r}")
+    finally:
+        if renew:
+            renew.cancel()
+        capacity.release()
+
+
+async def _take_over(entry: tuple[str, str], job_data: str, deliveries: int) -> bool:
+    """Decide whether a reclaimed job should run again; settle it otherwise."""
+    try:
+        job = json.loads(job_data)
+        job_id = job["job_id"]
+    except Exception:
+        return True  # _process discards it
+
+    status = await get_job_status(job_id)
+    if status is not None and status["status"] == "done":
+        # Its worker stored the result but died before acking.
+        await ack_job(entry)
+        return False
+
+    if deliveries > STREAM_MAX_DELIVERIES:
+        log.error(f"job={job_id} abandoned after {deliveries - 1} deliveries")
+        await mark_done(job, {
+            "verdict": "error",
+            "error_message": "Internal execution error",
+        })
+        await ack_job(entry)
+        return False
+
+    log.warning(f"job={job_id} reclaimed from a stalled worker (delivery {deliveries})")
+    return True
+
+
+async def _sweep(free: int) -> list[tuple[tuple[str, str] | None, str]]:
+    await prune_consumers(_served_streams(), max_idle_seconds=JOB_MAX_AGE)
+
+    jobs = []
+    for entry, job_data, deliveries in await claim_stalled_jobs(STREAM_CONSUMER, _served_streams(), free):
+        if await _take_over(entry, job_data, deliveries):
+            jobs.append((entry, job_data))
+
+    # Jobs still queued by list-mode API processes during a migration.
+    if len(jobs) < free:
+        keys = [list_queue_key(language) for language in WORKER_LANGUAGES] + [QUEUE_KEY]
+        jobs += [(None, job_data) for job_data in await pop_list_jobs(keys, free - len(jobs))]
+
+    return jobs
+
+
+async def _stream_reader() -> None:
+    """
+    Stream-mode replacement for the slots: lease as many jobs per round trip
+    as there are idle slots and run each in its own task.
+    """
+    capacity = asyncio.Semaphore(WORKER_CONCURRENCY)
+    running: set[asyncio.Task] = set()
+    groups_ready = False
+    last_sweep = 0.0
+    log.info(f"Stream reader {STREAM_CONSUMER} ready")
+
+    while not _shutdown:
+        if not await _cleanup_caught_up():
+            continue
+
+        await capacity.acquire()
+        free = 1
+        while not capacity.locked():
+            await capacity.acquire()
+            free += 1
+
+        jobs = []
+        try:
+            if not groups_ready:
+                await ensure_stream_groups(_served_streams())
+                groups_ready = True
+            if time.monotonic() - last_sweep >= STREAM_SWEEP_INTERVAL:
+                last_sweep = time.monotonic()
+                jobs = await _sweep(free)
+            if not jobs:
+                streams = [stream_key(language) for language in _preferred_languages()]
+                jobs = await read_jobs(STREAM_CONSUMER, streams + [STREAM_KEY], free, STREAM_BLOCK_MS)
+        except Exception as e:
+            log.error(f"Stream reader Redis error: {e!r} — retrying in 1s")
+            # The streams (and their group) may be gone after a Redis restart.
+            groups_ready = False
+            await asyncio.sleep(1)
+
+        # A blocking read can return more jobs than there are free slots;
+        # the extra ones wait here for a slot, with their lease kept alive.
+        for index, (entry, job_data) in enumerate(jobs):
+            task = asyncio.create_task(_run_stream_job(entry, job_data, capacity, index < free))
+            running.add(task)
+            task.add_done_callback(running.discard)
+
+        for _ in range(free - len(jobs)):
+            capacity.release()
+
+    await asyncio.gather(*running, return_exceptions=True)
+    log.info("Stream reader exited")
+
+
+async def _report_pool(pool) -> None:
+    while not _shutdown:
+        await asyncio.sleep(POOL_STATS_INTERVAL)
+        log.info(f"Container pool stats: {json.dumps(pool.stats())}")
+
+
+async def _report_cleanup(reaper) -> None:
+    while not _shutdown:
+        await asyncio.sleep(POOL_STATS_INTERVAL)
+        log.info(f"Cleanup reaper stats: {json.dumps(reaper.stats())}")
+
+
+async def _heartbeat() -> None:
+    # Runs until cancelled, so the orphan reaper leaves our containers alone
+    # for as long as we may still remove them ourselves.
+    while True:
+        try:
+            await heartbeat_worker(WORKER_ID)
+            pool = get_container_pool()
+            if pool:
+                await publish_pool_stats(WORKER_ID, pool.stats())
+        except Exception as e:
+            log.error(f"Worker heartbeat failed: {e!r}")
+        await asyncio.sleep(WORKER_HEARTBEAT_SECONDS)
+
+
 async def _main() -> None:
     signal.signal(signal.SIGTERM, _on_signal)
     signal.signal(signal.SIGINT, _on_signal)
 
-    log.info(f"Starting worker with {WORKER_CONCURRENCY} concurrent slots")
-    await asyncio.gather(
-        *[_slot(i) for i in range(WORKER_CONCURRENCY)],
-        return_exceptions=True,
+    unknown = set(WORKER_LANGUAGES) - set(ExecutorFactory.languages())
+    if unknown:
+        raise SystemExit(f"Unknown WORKER_LANGUAGES: {', '.join(sorted(unknown))}")
+
+    background = [asyncio.create_task(_heartbeat())]
+    if CONTAINER_POOL_ENABLED:
+        # Only keep containers warm for images this worker serves.
+        images = {ExecutorFactory.image_for(language) for language in WORKER_LANGUAGES}
+        pool = await start_container_pool(
+            {image: size for image, size in CONTAINER_POOL_SIZES.items() if image in images}
+        )
+        background.append(asyncio.create_task(_report_pool(pool)))
+        log.info(f"Container pool started: {pool.sizes}")
+
+    if BACKGROUND_CLEANUP_ENABLED:
+        reaper = await start_cleanup_reaper()
+        background.append(asyncio.create_task(_report_cleanup(reaper)))
+        log.info(f"Cleanup reaper started with {reaper.concurrency} concurrent removals")
+
+    if ORPHAN_REAPER_ENABLED:
+        await start_orphan_reaper()
+
+    if COMPILE_SERVER_ENABLED:
+        servers = await start_compile_servers({
+            language: (ExecutorFactory.image_for(language), command)
+            for language in WORKER_LANGUAGES
+            if (command := ExecutorFactory.compile_server_command(language))
+        })
+        if servers:
+            log.info(f"Compile servers started: {', '.join(servers)}")
+
+    log.info(
+        f"Starting worker with {WORKER_CONCURRENCY} concurrent slots"
+        f" ({'stream' if STREAM_TRANSPORT else 'list'} transport)"
+        f" for {', '.join(WORKER_LANGUAGES)}"
     )
+    try:
+        if STREAM_TRANSPORT:
+            await _stream_reader()
+        else:
+            await asyncio.gather(
+                *[_slot(i) for i in range(WORKER_CONCURRENCY)],
+                return_exceptions=True,
+            )
+    finally:
+        await stop_orphan_reaper()
+        # Drain the cleanup backlog first; the pool's idle containers go last.
+        await stop_cleanup_reaper()
+        await stop_container_pool()
+        await stop_compile_servers()
+        for task in background:
+            task.cancel()
+        if CONTAINER_POOL_ENABLED:
+            try:
+                await withdraw_pool_stats(WORKER_ID)
+            except Exception as e:
+                log.error(f"Withdrawing pool stats failed: {e!r}")
     log.info("Worker shutdown complete")
 
 